@@ -1,5 +1,6 @@
-from sqlalchemy.orm import Session
-import models, schemas
+from sqlalchemy.orm import Session, selectinload, defer
+import models, schemas, crud_votes
+from services import analytics_cache, news_rollups, duplicate_index
 
 def get_user(db: Session, user_id: int):
     return db.query(models.User).filter(models.User.id == user_id).first()
@@ -13,28 +14,138 @@ def get_user_by_name(db: Session, name: str):
 def create_user(db: Session, user: schemas.UserCreate):
     db_user = models.User(name=user.name, role=user.role, active=user.active, password=user.password)
     db.add(db_user)
+    analytics_cache.bump(db, analytics_cache.USER_STATS)
     db.commit()
     db.refresh(db_user)
     return db_user
 
-from sqlalchemy import or_
+import base64
+import json
+from datetime import date
+from sqlalchemy import func, tuple_
 
-def get_news(db: Session, skip: int = 0, limit: int = 100, search_query: str = None):
+SEARCH_CONFIG = "es_unaccent"
+HEADLINE_OPTIONS = "MaxWords=35, MinWords=15, MaxFragments=2, FragmentDelimiter=\" … \", StartSel=<mark>, StopSel=</mark>"
+
+def encode_cursor(news: models.News) -> str:
+    """Opaque position after `news` in the (detection_date, id) listing order."""
+    payload = json.dumps({"d": news.detection_date.isoformat(), "i": news.id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    """Returns (detection_date, id). Raises ValueError for a malformed cursor."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return date.fromisoformat(payload["d"]), int(payload["i"])
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+def filter_news(db: Session, search_query: str = None, include_archived: bool = False, status: str = None):
     query = db.query(models.News)
-    
+    if not include_archived:
+        query = query.filter(models.News.status != "Archivado")
+    if status:
+        query = query.filter(models.News.status == status)
     if search_query:
-        search = f"%{search_query}%"
-        query = query.filter(
-            or_(
-                models.News.title.ilike(search),
-                models.News.summary.ilike(search),
-                models.News.content_processed.ilike(search)
-            )
+        query = query.filter(models.News.search_vector.op("@@")(func.websearch_to_tsquery(SEARCH_CONFIG, search_query)))
+    return query
+
+def count_news(db: Session, estimated: bool = False, **filters) -> int:
+    """
+    Total of the listing for `filters` (see filter_news). estimated=True reads the
+    planner's row estimate instead of counting, so it costs the same on any archive size.
+    """
+    query = filter_news(db, **filters).order_by(None)
+    if not estimated:
+        return query.count()
+    # Compiled with placeholders and run with its own bound parameters (q and status
+    # are user input); EXPLAIN cannot be expressed as a SQLAlchemy construct
+    statement = query.with_entities(models.News.id).statement.compile(dialect=db.get_bind().dialect)
+    plan = db.connection().exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", statement.params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+def get_news(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    search_query: str = None,
+    include_archived: bool = False,
+    status: str = None,
+    cursor: str = None,
+    summary_view: bool = False
+):
+    """
+    Lists news. Without search_query, newest first in a stable (detection_date, id)
+    order; `cursor` (from encode_cursor on the last item of a page) continues after
+    that item with an index seek, so every page costs the same and no item repeats
+    or is skipped when news are added meanwhile.
+    With search_query, uses the full-text index (Spanish stemming,
+    accent-insensitive, web-search syntax: "exact phrase", -exclude, OR), orders by
+    relevance and sets `headline` on each item: the matching fragments of the
+    summary or body, with the terms wrapped in <mark>.
+    summary_view skips the body and the vote rows and sets `vote_count`,
+    `impact_mean` and `relevance_mean` instead (schemas.NewsSummary). Either way
+    relationships are loaded with one query each for the whole page.
+    """
+    query = filter_news(db, include_archived=include_archived, status=status)
+    extra_columns = {}
+
+    if summary_view:
+        query = query.outerjoin(
+            models.VoteAggregate, models.VoteAggregate.news_id == models.News.id
+        ).options(
+            defer(models.News.content_processed),
+            defer(models.News.summary),
+            selectinload(models.News.postulator),
+            selectinload(models.News.assignees)
         )
-        
-    return query.order_by(models.News.detection_date.desc()).offset(skip).limit(limit).all()
+        vote_columns = crud_votes.vote_aggregate_columns()
+        for name in ("vote_count", "impact_mean", "relevance_mean"):
+            extra_columns[name] = vote_columns[name]
+    else:
+        query = query.options(
+            selectinload(models.News.postulator),
+            selectinload(models.News.assignees),
+            selectinload(models.News.votes)
+        )
+
+    if not search_query:
+        if cursor:
+            last_date, last_id = decode_cursor(cursor)
+            query = query.filter(tuple_(models.News.detection_date, models.News.id) < tuple_(last_date, last_id))
+        query = query.order_by(models.News.detection_date.desc(), models.News.id.desc())
+    else:
+        ts_query = func.websearch_to_tsquery(SEARCH_CONFIG, search_query)
+        rank = func.ts_rank(models.News.search_vector, ts_query)
+        # Only evaluated for the rows of the page (expensive select items run after LIMIT)
+        extra_columns["headline"] = func.ts_headline(
+            SEARCH_CONFIG,
+            func.coalesce(models.News.summary, "") + " " + func.coalesce(models.News.content_processed, ""),
+            ts_query,
+            HEADLINE_OPTIONS
+        )
+        query = query.filter(
+            models.News.search_vector.op("@@")(ts_query)
+        ).order_by(rank.desc(), models.News.id.desc())
+
+    if not extra_columns:
+        return query.offset(skip).limit(limit).all()
+
+    rows = query.add_columns(
+        *(column.label(name) for name, column in extra_columns.items())
+    ).offset(skip).limit(limit).all()
+    results = []
+    for row in rows:
+        news = row[0]
+        for name in extra_columns:
+            setattr(news, name, getattr(row, name))
+        results.append(news)
+    return results
 
-def create_news(db: Session, news: schemas.NewsCreate):
+def create_news(db: Session, news: schemas.NewsCreate, signature: bytes = None):
+    """Saves the news item with its rollup and duplicate-index rows, in one transaction."""
     db_news = models.News(
         title=news.title,
         content_processed=news.content_processed,
@@ -46,6 +157,10 @@ def create_news(db: Session, news: schemas.NewsCreate):
         category=news.category
     )
     db.add(db_news)
+    db.flush()
+    news_rollups.refresh(db, [db_news.id])
+    duplicate_index.index_news(db, db_news.id, news.content_processed, signature)
+    analytics_cache.bump(db, analytics_cache.USER_STATS)
     db.commit()
     db.refresh(db_news)
     return db_news
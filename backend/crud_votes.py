@@ -1,38 +1,214 @@
-from sqlalchemy.orm import Session
+from typing import List
+from sqlalchemy import func, case, and_, cast, Float, tuple_, select, insert, literal, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session, selectinload, defer
 import models, schemas
+from services import analytics_cache
 
-def create_vote(db: Session, vote: schemas.VoteCreate):
-    # Check if vote exists for this user/news pair
-    existing_vote = db.query(models.Vote).filter(
-        models.Vote.user_id == vote.user_id,
-        models.Vote.news_id == vote.news_id
-    ).first()
-
-    if existing_vote:
-        # Update
-        existing_vote.impact_score = vote.impact_score
-        existing_vote.relevance_score = vote.relevance_score
-        existing_vote.category_suggestion = vote.category_suggestion
-        db.commit()
-        db.refresh(existing_vote)
-        return existing_vote
-    else:
-        # Create
-        db_vote = models.Vote(
-            user_id=vote.user_id,
-            news_id=vote.news_id,
-            impact_score=vote.impact_score,
-            relevance_score=vote.relevance_score,
-            category_suggestion=vote.category_suggestion
+# Mean score from which a news item counts as high impact / high relevance on the matrix
+QUADRANT_THRESHOLD = 3
+
+def _vote_key(impact_score, relevance_score, category_suggestion):
+    return impact_score or 0, relevance_score or 0, category_suggestion
+
+def _lock_aggregates(db: Session, news_ids) -> dict:
+    """
+    {news_id: VoteAggregate}, created empty where missing and locked until the
+    caller commits, so concurrent votes on the same news serialize. One statement:
+    the no-op DO UPDATE locks existing rows and RETURNING loads them.
+    """
+    statement = pg_insert(models.VoteAggregate).values([
+        {
+            "news_id": news_id, "vote_count": 0, "impact_sum": 0, "impact_sum_sq": 0,
+            "relevance_sum": 0, "relevance_sum_sq": 0, "category_counts": {}
+        }
+        for news_id in sorted(news_ids) # fixed lock order: no deadlocks between bulk submissions
+    ])
+    statement = statement.on_conflict_do_update(
+        index_elements=[models.VoteAggregate.news_id],
+        set_={"news_id": statement.excluded.news_id}
+    ).returning(models.VoteAggregate)
+    aggregates = db.scalars(statement, execution_options={"populate_existing": True}).all()
+    return {aggregate.news_id: aggregate for aggregate in aggregates}
+
+def _update_aggregate(aggregate: models.VoteAggregate, removed=None, added=None):
+    """
+    Moves one vote out of (removed) and/or into (added) the running totals of a
+    news item; both are (impact, relevance, category) or None.
+    """
+    categories = dict(aggregate.category_counts or {})
+    for vote, sign in ((removed, -1), (added, 1)):
+        if vote is None:
+            continue
+        impact, relevance, category = vote
+        aggregate.vote_count += sign
+        aggregate.impact_sum += sign * impact
+        aggregate.impact_sum_sq += sign * impact * impact
+        aggregate.relevance_sum += sign * relevance
+        aggregate.relevance_sum_sq += sign * relevance * relevance
+        if category:
+            categories[category] = categories.get(category, 0) + sign
+            if categories[category] <= 0:
+                del categories[category]
+    aggregate.category_counts = categories # reassigned: JSON columns do not track in-place changes
+
+def upsert_votes(db: Session, votes: List[schemas.VoteCreate]) -> List[schemas.Vote]:
+    """
+    Creates or updates the active vote of each (user, news) pair, with the vote
+    aggregates, in one transaction: lock the aggregates, read the previous scores,
+    one INSERT ... ON CONFLICT DO UPDATE ... RETURNING, then the aggregate updates.
+    A pair listed twice keeps its last scores.
+    """
+    latest = {(vote.user_id, vote.news_id): vote for vote in votes}
+    if not latest:
+        return []
+
+    aggregates = _lock_aggregates(db, {news_id for _, news_id in latest})
+    previous = {
+        (user_id, news_id): _vote_key(impact, relevance, category)
+        for user_id, news_id, impact, relevance, category in db.query(
+            models.Vote.user_id, models.Vote.news_id, models.Vote.impact_score,
+            models.Vote.relevance_score, models.Vote.category_suggestion
+        ).filter(
+            models.Vote.is_active == True,
+            tuple_(models.Vote.user_id, models.Vote.news_id).in_(list(latest))
         )
-        db.add(db_vote)
-        db.commit()
-        db.refresh(db_vote)
-        return db_vote
+    }
+
+    statement = pg_insert(models.Vote).values([
+        {
+            "user_id": vote.user_id,
+            "news_id": vote.news_id,
+            "impact_score": vote.impact_score,
+            "relevance_score": vote.relevance_score,
+            "category_suggestion": vote.category_suggestion,
+            "is_active": True
+        }
+        for vote in latest.values()
+    ])
+    statement = statement.on_conflict_do_update(
+        # uq_votes_active_user_news: one active vote per user and news, archived votes are history
+        index_elements=[models.Vote.user_id, models.Vote.news_id],
+        index_where=models.Vote.is_active, # same predicate as the index
+        set_={
+            "impact_score": statement.excluded.impact_score,
+            "relevance_score": statement.excluded.relevance_score,
+            "category_suggestion": statement.excluded.category_suggestion
+        }
+    ).returning(models.Vote)
+    saved = db.scalars(statement, execution_options={"populate_existing": True}).all()
+
+    for (user_id, news_id), vote in latest.items():
+        _update_aggregate(
+            aggregates[news_id],
+            removed=previous.get((user_id, news_id)),
+            added=_vote_key(vote.impact_score, vote.relevance_score, vote.category_suggestion)
+        )
+    analytics_cache.bump(db, analytics_cache.COUNCIL_VOTES)
+    # Serialized before the commit expires the rows (no refresh round trip)
+    results = [schemas.Vote.model_validate(vote) for vote in saved]
+    db.commit()
+    return results
+
+def create_vote(db: Session, vote: schemas.VoteCreate) -> schemas.Vote:
+    return upsert_votes(db, [vote])[0]
 
 def get_votes_by_news(db: Session, news_id: int):
     return db.query(models.Vote).filter(models.Vote.news_id == news_id).all()
 
+def reset_aggregates(db: Session, news_ids):
+    """Drops the running totals of news whose active votes were archived (no commit)."""
+    db.query(models.VoteAggregate).filter(
+        models.VoteAggregate.news_id.in_(news_ids)
+    ).delete(synchronize_session=False)
+    analytics_cache.bump(db, analytics_cache.COUNCIL_VOTES)
+
+def vote_aggregate_columns() -> dict:
+    """
+    Labeled SQL expressions over models.VoteAggregate (to outer join on news_id):
+    vote_count, score means, population stddevs and matrix quadrant. Means and
+    stddevs are NULL without votes.
+    """
+    aggregate = models.VoteAggregate
+    count = func.nullif(aggregate.vote_count, 0)
+    impact_mean = cast(aggregate.impact_sum, Float) / count
+    relevance_mean = cast(aggregate.relevance_sum, Float) / count
+    # Var = E[x^2] - E[x]^2, clamped at 0 against rounding
+    impact_stddev = func.sqrt(func.greatest(cast(aggregate.impact_sum_sq, Float) / count - impact_mean * impact_mean, 0.0))
+    relevance_stddev = func.sqrt(func.greatest(cast(aggregate.relevance_sum_sq, Float) / count - relevance_mean * relevance_mean, 0.0))
+    quadrant = case(
+        (count.is_(None), None),
+        (and_(impact_mean >= QUADRANT_THRESHOLD, relevance_mean >= QUADRANT_THRESHOLD), "Urgente"),
+        (relevance_mean >= QUADRANT_THRESHOLD, "Semana"),
+        (impact_mean >= QUADRANT_THRESHOLD, "Estrategico"),
+        else_="Luego"
+    )
+    return {
+        "vote_count": func.coalesce(aggregate.vote_count, 0).label("vote_count"),
+        "impact_mean": impact_mean.label("impact_mean"),
+        "relevance_mean": relevance_mean.label("relevance_mean"),
+        "impact_stddev": impact_stddev.label("impact_stddev"),
+        "relevance_stddev": relevance_stddev.label("relevance_stddev"),
+        "quadrant": quadrant.label("quadrant"),
+        "category_counts": aggregate.category_counts.label("category_counts")
+    }
+
+def snapshot_council(db: Session, session_id: int) -> dict:
+    """
+    Freezes the board into the session: one council_session_items row per news in
+    council (vote aggregates, prioritization, assignees) and one
+    council_session_participants row per voter, each with a single INSERT ... SELECT.
+    Run before the votes are archived; no commit. Returns the session totals.
+    First locks the board (its news rows and vote aggregates, as upsert_votes
+    does) until the caller commits: a vote arriving meanwhile waits for the close
+    instead of being archived into the session without being counted.
+    """
+    board_ids = [news_id for (news_id,) in db.query(models.News.id).filter(
+        models.News.in_council == True
+    ).order_by(models.News.id).with_for_update()]
+    if board_ids:
+        _lock_aggregates(db, board_ids)
+
+    columns = vote_aggregate_columns()
+    assignee_ids = select(
+        func.coalesce(func.json_agg(models.news_assignments.c.user_id), text("'[]'::json"))
+    ).where(models.news_assignments.c.news_id == models.News.id).scalar_subquery()
+    board = select(
+        literal(session_id), models.News.id, models.News.title, models.News.category, models.News.status,
+        func.coalesce(models.News.is_prioritized, False), models.News.editorial_focus, assignee_ids,
+        columns["vote_count"], columns["impact_mean"], columns["relevance_mean"],
+        columns["impact_stddev"], columns["relevance_stddev"], columns["quadrant"],
+        func.coalesce(models.VoteAggregate.category_counts, text("'{}'::json"))
+    ).outerjoin(
+        models.VoteAggregate, models.VoteAggregate.news_id == models.News.id
+    ).where(models.News.in_council == True)
+    items = db.execute(insert(models.CouncilSessionItem).from_select([
+        "session_id", "news_id", "title", "category", "status", "is_prioritized", "editorial_focus", "assignee_ids",
+        "vote_count", "impact_mean", "relevance_mean", "impact_stddev", "relevance_stddev", "quadrant", "category_counts"
+    ], board))
+
+    voters = select(
+        literal(session_id), models.Vote.user_id, models.User.name, func.count(models.Vote.id)
+    ).join(models.User, models.User.id == models.Vote.user_id).join(
+        models.News, models.News.id == models.Vote.news_id
+    ).where(
+        models.Vote.is_active == True, models.News.in_council == True
+    ).group_by(models.Vote.user_id, models.User.name)
+    participants = db.execute(insert(models.CouncilSessionParticipant).from_select(
+        ["session_id", "user_id", "user_name", "vote_count"], voters
+    ))
+
+    vote_count, prioritized_count = db.query(
+        func.coalesce(func.sum(models.CouncilSessionItem.vote_count), 0),
+        func.count().filter(models.CouncilSessionItem.is_prioritized == True)
+    ).filter(models.CouncilSessionItem.session_id == session_id).one()
+    return {
+        "news_count": items.rowcount,
+        "vote_count": int(vote_count),
+        "participant_count": participants.rowcount,
+        "prioritized_count": prioritized_count
+    }
+
 def toggle_council_status(db: Session, news_id: int, in_council: bool):
     news = db.query(models.News).filter(models.News.id == news_id).first()
     if news:
@@ -40,3 +216,28 @@ def toggle_council_status(db: Session, news_id: int, in_council: bool):
         db.commit()
         db.refresh(news)
     return news
+
+def get_council_board(db: Session):
+    """
+    News in council with their active votes and vote aggregates (count, mean and
+    population stddev of each score, matrix quadrant, category tallies), read
+    from vote_aggregates. Votes and assignees are loaded with one query each.
+    """
+    columns = vote_aggregate_columns()
+    rows = db.query(models.News, *columns.values()).outerjoin(
+        models.VoteAggregate, models.VoteAggregate.news_id == models.News.id
+    ).filter(models.News.in_council == True).options(
+        defer(models.News.content_processed),
+        defer(models.News.summary),
+        selectinload(models.News.assignees),
+        selectinload(models.News.votes.and_(models.Vote.is_active == True))
+    ).order_by(models.News.id).all()
+
+    board = []
+    for row in rows:
+        news = row[0]
+        for name in columns:
+            setattr(news, name, getattr(row, name))
+        news.category_counts = news.category_counts or {}
+        board.append(news)
+    return board
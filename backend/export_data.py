@@ -0,0 +1,56 @@
+"""
+Bulk export from the command line (same files as GET /export/{dataset}):
+
+    python export_data.py news --format xlsx --output noticias.xlsx --start 2026-01-01
+    python export_data.py votes --session-id 12 > votos.csv
+    python export_data.py products --format parquet --output productos.parquet --include-archived
+
+Needs DATABASE_URL. CSV goes to stdout unless --output is given; XLSX and Parquet
+need --output.
+"""
+import argparse
+import sys
+import time
+from datetime import date
+
+from services import export_service
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streams news, votes or products to CSV, XLSX or Parquet.")
+    parser.add_argument("dataset", choices=sorted(export_service.DATASETS))
+    parser.add_argument("--format", choices=sorted(export_service.FORMATS), default="csv")
+    parser.add_argument("--output", help="File to write (default: stdout, CSV only)")
+    parser.add_argument("--start", type=date.fromisoformat, help="From this detection date (YYYY-MM-DD)")
+    parser.add_argument("--end", type=date.fromisoformat, help="Up to this detection date, inclusive")
+    parser.add_argument("--status", help="Only news in this status")
+    parser.add_argument("--session-id", type=int, help="Only this council session")
+    parser.add_argument("--include-archived", action="store_true")
+    args = parser.parse_args()
+
+    if args.output is None and args.format != "csv":
+        parser.error(f"--output is required for {args.format}")
+    try:
+        export_service.check_format(args.format)
+    except export_service.ExportFormatUnavailable as e:
+        parser.error(str(e))
+
+    chunks = export_service.stream(
+        args.dataset, args.format, start=args.start, end=args.end, status=args.status,
+        session_id=args.session_id, include_archived=args.include_archived
+    )
+    started = time.perf_counter()
+    written = 0
+    output = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        for chunk in chunks:
+            output.write(chunk)
+            written += len(chunk)
+    finally:
+        if args.output:
+            output.close()
+    print(f"{args.dataset}: {written / 1e6:.1f} MB in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+Load test for the AI analysis path, without spending Gemini quota.
+
+In-process (default): drives ai_service.analyze_text concurrently against the stub
+backend, with a local quota and the analysis cache off, so no database or API key
+is needed:
+
+    python loadtest_ai.py --requests 200 --concurrency 20 --rpm 600 --rate-limit-rate 0.05
+
+HTTP: drives POST /news/analyze on a running API (start it with AI_BACKEND=stub).
+The script serves the synthetic articles itself, so extraction is exercised too:
+
+    python loadtest_ai.py --mode http --api http://localhost:8001 --requests 100
+
+Reports throughput, p50/p95/p99 latency, retries and limiter queue wait.
+"""
+import argparse
+import asyncio
+import os
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+WORDS = (
+    "innovación tecnología ecosistema empresas talento ciudad Medellín inteligencia artificial "
+    "investigación universidad startups inversión energía datos salud biotecnología política "
+    "pública gobierno laboratorio programa convocatoria financiación digital transformación "
+    "industria manufactura semiconductores robótica clima agua movilidad educación"
+).split()
+
+FALLBACK_TITLE = "Error de Conexión (IA Sobrecargada)"
+
+
+def make_article(number: int, seed: int, min_words: int, max_words: int) -> str:
+    rng = random.Random(seed * 100003 + number)
+    sentences = []
+    remaining = rng.randint(min_words, max_words)
+    while remaining > 0:
+        length = min(remaining, rng.randint(8, 25))
+        sentences.append(" ".join(rng.choice(WORDS) for _ in range(length)).capitalize() + ".")
+        remaining -= length
+    return f"Artículo {number}. " + " ".join(sentences)
+
+
+def percentile(values: list, fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def report(title: str, latencies: list, failures: int, elapsed: float, calls: dict, limiter: dict):
+    completed = len(latencies)
+    print(f"\n=== {title} ===")
+    print(f"Requests:      {completed} ({failures} failed or fallback)")
+    print(f"Elapsed:       {elapsed:.2f}s")
+    print(f"Throughput:    {completed / elapsed if elapsed else 0:.2f} req/s")
+    print(
+        f"Latency:       p50 {percentile(latencies, 0.50):.3f}s  p95 {percentile(latencies, 0.95):.3f}s  "
+        f"p99 {percentile(latencies, 0.99):.3f}s  max {max(latencies, default=0):.3f}s"
+    )
+    print(
+        f"Model calls:   {calls.get('calls', 0)} calls, {calls.get('attempts', 0)} attempts, "
+        f"{calls.get('retries', 0)} retries, {calls.get('failed', 0)} failed"
+    )
+    print(
+        f"Failures:      {calls.get('quota_errors', 0)} quota, {calls.get('parse_errors', 0)} parse, "
+        f"{calls.get('network_errors', 0)} network  ({calls.get('repaired_replies', 0)} replies repaired)"
+    )
+    acquired = limiter.get("acquired", 0)
+    print(
+        f"Queue wait:    avg {limiter.get('total_wait_seconds', 0) / acquired if acquired else 0:.3f}s  "
+        f"max {limiter.get('max_wait_seconds', 0):.3f}s  ({limiter.get('rate_limited', 0)} limiter pauses)"
+    )
+
+
+async def run_in_process(args):
+    # Must be set before ai_service is imported: it builds the backend and limiter at import
+    os.environ["AI_BACKEND"] = "stub"
+    os.environ["GEMINI_QUOTA_BACKEND"] = "local"
+    os.environ["ANALYSIS_CACHE_ENABLED"] = "false"
+    os.environ.setdefault("DATABASE_URL", "sqlite://") # never queried with the cache off
+
+    from services import ai_service, extraction_service
+
+    texts = [make_article(number, args.seed, args.min_words, args.max_words) for number in range(args.requests)]
+    slots = asyncio.Semaphore(args.concurrency)
+    latencies = []
+    failures = 0
+
+    async def one(text: str):
+        nonlocal failures
+        async with slots:
+            started = time.monotonic()
+            result = await ai_service.analyze_text(text)
+            latencies.append(time.monotonic() - started)
+            if result.get("title") == FALLBACK_TITLE:
+                failures += 1
+
+    started = time.monotonic()
+    try:
+        await asyncio.gather(*(one(text) for text in texts))
+    finally:
+        extraction_service.shutdown_parser_pool()
+    elapsed = time.monotonic() - started
+
+    report("In-process (stub backend)", latencies, failures, elapsed, ai_service.call_stats, ai_service.limiter.stats)
+    print(f"Stub:          {ai_service.backend.stats}")
+
+
+class ArticleHandler(BaseHTTPRequestHandler):
+    seed = 0
+    min_words = 300
+    max_words = 1200
+
+    def do_GET(self):
+        try:
+            number = int(self.path.rstrip("/").rsplit("/", 1)[-1])
+        except ValueError:
+            self.send_error(404)
+            return
+        paragraphs = make_article(number, self.seed, self.min_words, self.max_words).split(". ")
+        body = "<html><head><title>Artículo {0}</title></head><body><article><h1>Artículo {0}</h1>{1}</article></body></html>".format(
+            number, "".join(f"<p>{paragraph}.</p>" for paragraph in paragraphs)
+        ).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+async def run_http(args):
+    import httpx
+
+    ArticleHandler.seed = args.seed
+    ArticleHandler.min_words = args.min_words
+    ArticleHandler.max_words = args.max_words
+    server = ThreadingHTTPServer(("0.0.0.0", args.article_port), ArticleHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    article_base = f"http://{args.article_host}:{server.server_address[1]}/article"
+
+    slots = asyncio.Semaphore(args.concurrency)
+    latencies = []
+    failures = 0
+
+    async with httpx.AsyncClient(base_url=args.api, timeout=args.timeout) as client:
+        before = (await client.get("/news/analyze/stats")).json()
+        if before.get("ai_calls", {}).get("backend") != "stub":
+            print("Warning: the API is not running the stub backend; this run spends real quota.")
+
+        async def one(number: int):
+            nonlocal failures
+            async with slots:
+                started = time.monotonic()
+                try:
+                    response = await client.post(
+                        "/news/analyze", data={"url": f"{article_base}/{number}", "refresh": "true"}
+                    )
+                    ok = response.status_code == 200 and response.json().get("title") != FALLBACK_TITLE
+                except httpx.HTTPError as e:
+                    print(f"Request {number} failed: {e}")
+                    ok = False
+                latencies.append(time.monotonic() - started)
+                if not ok:
+                    failures += 1
+
+        started = time.monotonic()
+        await asyncio.gather(*(one(number) for number in range(args.requests)))
+        elapsed = time.monotonic() - started
+
+        after = (await client.get("/news/analyze/stats")).json()
+
+    server.shutdown()
+
+    def delta(section: str) -> dict:
+        return {
+            key: value - before.get(section, {}).get(key, 0)
+            for key, value in after.get(section, {}).items()
+            if isinstance(value, (int, float)) and key != "max_wait_seconds"
+        }
+
+    limiter = {**delta("ai_limiter"), "max_wait_seconds": after.get("ai_limiter", {}).get("max_wait_seconds", 0)}
+    report(f"HTTP ({args.api})", latencies, failures, elapsed, delta("ai_calls"), limiter)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test for the AI analysis path.")
+    parser.add_argument("--mode", choices=("inprocess", "http"), default="inprocess")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10, help="Requests in flight at once")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--min-words", type=int, default=300)
+    parser.add_argument("--max-words", type=int, default=1200)
+
+    stub = parser.add_argument_group("stub backend and limiter (in-process mode)")
+    stub.add_argument("--latency-ms", type=float)
+    stub.add_argument("--jitter-ms", type=float)
+    stub.add_argument("--error-rate", type=float)
+    stub.add_argument("--rate-limit-rate", type=float)
+    stub.add_argument("--malformed-rate", type=float)
+    stub.add_argument("--retry-after", type=float)
+    stub.add_argument("--rpm", type=int)
+    stub.add_argument("--tpm", type=int)
+    stub.add_argument("--max-concurrency", type=int, help="Limiter cap on concurrent model calls")
+
+    http = parser.add_argument_group("http mode")
+    http.add_argument("--api", default="http://localhost:8001")
+    http.add_argument("--article-host", default="127.0.0.1", help="Host the API uses to reach this script")
+    http.add_argument("--article-port", type=int, default=0)
+    http.add_argument("--timeout", type=float, default=300)
+
+    args = parser.parse_args()
+
+    overrides = {
+        "STUB_LLM_LATENCY_MS": args.latency_ms,
+        "STUB_LLM_JITTER_MS": args.jitter_ms,
+        "STUB_LLM_ERROR_RATE": args.error_rate,
+        "STUB_LLM_RATE_LIMIT_RATE": args.rate_limit_rate,
+        "STUB_LLM_MALFORMED_RATE": args.malformed_rate,
+        "STUB_LLM_RETRY_AFTER": args.retry_after,
+        "STUB_LLM_SEED": args.seed,
+        "GEMINI_RPM": args.rpm,
+        "GEMINI_TPM": args.tpm,
+        "GEMINI_MAX_CONCURRENCY": args.max_concurrency,
+    }
+    for name, value in overrides.items():
+        if value is not None:
+            os.environ[name] = str(value)
+
+    if args.mode == "http":
+        asyncio.run(run_http(args))
+    else:
+        asyncio.run(run_in_process(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,16 @@
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from database import engine
 import models
-from routers import users, news, votes, analytics, products
+import migrations
+from routers import users, news, votes, analytics, products, council, export
+from services import extraction_service, analysis_cache, ai_service, job_queue, duplicate_index, vector_index, news_rollups
 
-# Create database tables
+# Create database tables (plus the changes create_all cannot make, see migrations.py)
+migrations.before_create_all(engine)
 models.Base.metadata.create_all(bind=engine)
+migrations.after_create_all(engine)
 
 app = FastAPI(title="Consejo de Redacción CTi API", version="0.1.0")
 
@@ -16,6 +21,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count"],  # pagination headers of GET /news/
 )
 
 app.include_router(users.router)
@@ -23,6 +29,57 @@ app.include_router(news.router)
 app.include_router(votes.router)
 app.include_router(analytics.router)
 app.include_router(products.router)
+app.include_router(council.router)
+app.include_router(export.router)
+
+@app.on_event("startup")
+def purge_stale_analyses():
+    # Analyses produced by an older prompt version can never be hit again. Housekeeping
+    # only: a failure must not keep the API from starting
+    try:
+        deleted = analysis_cache.invalidate(ai_service.PROMPT_VERSION)
+    except Exception as e:
+        print(f"Could not purge stale cached analyses: {e}")
+        return
+    if deleted:
+        print(f"Removed {deleted} cached analyses from previous prompt versions")
+
+_background_tasks = set()
+
+def _backfill_indexes():
+    for name, backfill in (("duplicate", duplicate_index.backfill), ("related-news", vector_index.backfill)):
+        try:
+            indexed = backfill()
+            if indexed:
+                print(f"Added {indexed} news items to the {name} index")
+        except Exception as e:
+            print(f"{name.capitalize()} index backfill failed: {e}")
+
+@app.on_event("startup")
+async def backfill_indexes():
+    # In the background: indexing a large archive must not delay startup
+    task = asyncio.create_task(asyncio.to_thread(_backfill_indexes))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+@app.on_event("startup")
+async def start_analysis_workers():
+    # Background workers for queued /news/analyze/jobs
+    job_queue.start_workers()
+
+@app.on_event("startup")
+async def start_rollup_catch_up():
+    # Brings the analytics rollups up to date with news changed outside the API write paths
+    news_rollups.start_catch_up()
+
+@app.on_event("shutdown")
+async def shutdown_extraction():
+    # Stop job workers (in-flight jobs go back to pending), then close the pooled
+    # HTTP client and the parser processes used for extraction
+    await job_queue.stop_workers()
+    await news_rollups.stop_catch_up()
+    await extraction_service.close_http_client()
+    extraction_service.shutdown_parser_pool()
 
 @app.get("/")
 def read_root():
@@ -0,0 +1,156 @@
+"""
+Schema changes that create_all cannot make: extensions, functions and columns or
+indexes on tables that already exist. Every statement is idempotent and runs at
+startup, before (BEFORE_CREATE_ALL) and after (AFTER_CREATE_ALL) create_all.
+"""
+from sqlalchemy import text
+
+import models
+from crud_votes import QUADRANT_THRESHOLD
+
+# Full-text search (see models.NEWS_SEARCH_VECTOR): Spanish stemming over unaccented words.
+# unaccent runs as a dictionary of the text search configuration, so ts_headline
+# still highlights the original, accented text.
+NEWS_SEARCH_CONFIG = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    """
+    DO $$
+    BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'es_unaccent') THEN
+            CREATE TEXT SEARCH CONFIGURATION es_unaccent (COPY = spanish);
+            ALTER TEXT SEARCH CONFIGURATION es_unaccent
+                ALTER MAPPING FOR hword, hword_part, word WITH unaccent, spanish_stem;
+        END IF;
+    END
+    $$
+    """,
+]
+
+BEFORE_CREATE_ALL = NEWS_SEARCH_CONFIG
+
+AFTER_CREATE_ALL = [
+    f"""
+    ALTER TABLE news ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS ({models.NEWS_SEARCH_VECTOR}) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_news_search_vector ON news USING GIN (search_vector)",
+    # Keyset pagination on (detection_date, id): the order must be total, so no NULL dates
+    "UPDATE news SET detection_date = CURRENT_DATE WHERE detection_date IS NULL",
+    "CREATE INDEX IF NOT EXISTS ix_news_detection_date_id ON news (detection_date, id) INCLUDE (status)",
+    # Rollup catch-up watermark; existing rows get the migration time, so the first run counts them all
+    "ALTER TABLE news ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT (now() AT TIME ZONE 'utc')",
+    "CREATE INDEX IF NOT EXISTS ix_news_updated_at ON news (updated_at)",
+    # Striped cache versions (services/analytics_cache.py): existing counters become shard 0
+    """
+    DO $$
+    BEGIN
+        IF NOT EXISTS (
+            SELECT 1 FROM information_schema.columns WHERE table_name = 'cache_versions' AND column_name = 'shard'
+        ) THEN
+            ALTER TABLE cache_versions ADD COLUMN shard INTEGER NOT NULL DEFAULT 0;
+            ALTER TABLE cache_versions DROP CONSTRAINT cache_versions_pkey;
+            ALTER TABLE cache_versions ADD PRIMARY KEY (name, shard);
+        END IF;
+    END
+    $$
+    """,
+    # One active vote per (user, news): drop the older duplicates left by concurrent
+    # clicks (then rebuild the aggregates, which counted them), then enforce it
+    """
+    DO $$
+    BEGIN
+        DELETE FROM votes older USING votes newer
+        WHERE older.is_active AND newer.is_active
+            AND older.user_id = newer.user_id AND older.news_id = newer.news_id
+            AND older.id < newer.id;
+        IF FOUND THEN
+            DELETE FROM vote_aggregates;
+        END IF;
+    END
+    $$
+    """,
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_votes_active_user_news ON votes (user_id, news_id) WHERE is_active",
+    # Vote aggregates: built from the active votes when the table is new (or was emptied)
+    """
+    INSERT INTO vote_aggregates
+        (news_id, vote_count, impact_sum, impact_sum_sq, relevance_sum, relevance_sum_sq, category_counts)
+    SELECT v.news_id, count(*), sum(v.impact_score), sum(v.impact_score * v.impact_score),
+           sum(v.relevance_score), sum(v.relevance_score * v.relevance_score),
+           coalesce((
+               SELECT json_object_agg(c.category_suggestion, c.votes)
+               FROM (
+                   SELECT category_suggestion, count(*) AS votes FROM votes
+                   WHERE news_id = v.news_id AND is_active AND category_suggestion IS NOT NULL
+                   GROUP BY category_suggestion
+               ) c
+           ), '{}'::json)
+    FROM votes v
+    WHERE v.is_active AND NOT EXISTS (SELECT 1 FROM vote_aggregates)
+    GROUP BY v.news_id
+    """,
+] + [
+    f"ALTER TABLE council_sessions ADD COLUMN IF NOT EXISTS {column}"
+    for column in ("closed_at TIMESTAMP", "news_count INTEGER", "vote_count INTEGER", "participant_count INTEGER", "prioritized_count INTEGER")
+] + [
+    # Snapshots for sessions closed before they existed, rebuilt from their archived
+    # votes (the prioritization outcome was not recorded: is_prioritized stays NULL)
+    f"""
+    INSERT INTO council_session_items
+        (session_id, news_id, title, category, status, assignee_ids, vote_count, impact_mean, relevance_mean,
+         impact_stddev, relevance_stddev, quadrant, category_counts)
+    SELECT v.session_id, v.news_id, n.title, n.category, n.status, '[]'::json, count(*),
+           avg(v.impact_score), avg(v.relevance_score), stddev_pop(v.impact_score), stddev_pop(v.relevance_score),
+           CASE
+               WHEN avg(v.impact_score) >= {QUADRANT_THRESHOLD} AND avg(v.relevance_score) >= {QUADRANT_THRESHOLD} THEN 'Urgente'
+               WHEN avg(v.relevance_score) >= {QUADRANT_THRESHOLD} THEN 'Semana'
+               WHEN avg(v.impact_score) >= {QUADRANT_THRESHOLD} THEN 'Estrategico'
+               ELSE 'Luego'
+           END,
+           coalesce((
+               SELECT json_object_agg(c.category_suggestion, c.votes)
+               FROM (
+                   SELECT category_suggestion, count(*) AS votes FROM votes
+                   WHERE session_id = v.session_id AND news_id = v.news_id AND category_suggestion IS NOT NULL
+                   GROUP BY category_suggestion
+               ) c
+           ), '{{}}'::json)
+    FROM votes v LEFT JOIN news n ON n.id = v.news_id
+    WHERE v.session_id IS NOT NULL
+        AND NOT EXISTS (SELECT 1 FROM council_session_items i WHERE i.session_id = v.session_id)
+    GROUP BY v.session_id, v.news_id, n.title, n.category, n.status
+    """,
+    """
+    INSERT INTO council_session_participants (session_id, user_id, user_name, vote_count)
+    SELECT v.session_id, v.user_id, u.name, count(*)
+    FROM votes v JOIN users u ON u.id = v.user_id
+    WHERE v.session_id IS NOT NULL
+        AND NOT EXISTS (SELECT 1 FROM council_session_participants p WHERE p.session_id = v.session_id)
+    GROUP BY v.session_id, v.user_id, u.name
+    """,
+    """
+    UPDATE council_sessions s SET
+        news_count = (SELECT count(*) FROM council_session_items i WHERE i.session_id = s.id),
+        vote_count = (SELECT coalesce(sum(i.vote_count), 0) FROM council_session_items i WHERE i.session_id = s.id),
+        participant_count = (SELECT count(*) FROM council_session_participants p WHERE p.session_id = s.id),
+        prioritized_count = (SELECT count(*) FROM council_session_items i WHERE i.session_id = s.id AND i.is_prioritized)
+    WHERE s.news_count IS NULL
+    """,
+]
+
+
+# Serializes startup migrations when several API workers boot at once
+MIGRATION_LOCK_ID = 7301
+
+def _run(engine, statements):
+    with engine.begin() as connection:
+        connection.execute(text("SELECT pg_advisory_xact_lock(:lock_id)"), {"lock_id": MIGRATION_LOCK_ID})
+        for statement in statements:
+            connection.execute(text(statement))
+
+
+def before_create_all(engine):
+    _run(engine, BEFORE_CREATE_ALL)
+
+
+def after_create_all(engine):
+    _run(engine, AFTER_CREATE_ALL)
@@ -1,8 +1,9 @@
-from sqlalchemy import Column, Integer, String, Boolean, Text, Date, ForeignKey, JSON, Enum, Table
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, Text, Date, DateTime, Float, LargeBinary, ForeignKey, JSON, Enum, Table, Computed, Index, text
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import relationship, deferred
 from database import Base
 import enum
-from datetime import date
+from datetime import date, datetime
 
 # Association table for multiple assignees to a news item
 news_assignments = Table(
@@ -37,8 +38,23 @@ class User(Base):
     password = Column(String, nullable=True) # Simple plaintext for this MVP as requested ("all admins same pass")
     active = Column(Boolean, default=True)
 
+# Full-text search document: title and keywords weigh most, then summary, then body.
+# es_unaccent (Spanish stemming without accents) is created in migrations.py.
+NEWS_SEARCH_VECTOR = (
+    "setweight(to_tsvector('es_unaccent', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('es_unaccent', coalesce(classifications ->> 'keywords', '')), 'A') || "
+    "setweight(to_tsvector('es_unaccent', coalesce(summary, '')), 'B') || "
+    "setweight(to_tsvector('es_unaccent', coalesce(content_processed, '')), 'C')"
+)
+
 class News(Base):
     __tablename__ = "news"
+    __table_args__ = (
+        Index("ix_news_search_vector", "search_vector", postgresql_using="gin"),
+        # Keyset pagination order. status is included for count_news: COUNT(*) with the
+        # archived/status filters can be an index-only scan (listings still read the rows)
+        Index("ix_news_detection_date_id", "detection_date", "id", postgresql_include=["status"]),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True)
@@ -56,6 +72,12 @@ class News(Base):
     
     # AI Classifications stored as JSON for flexibility
     classifications = Column(JSON, nullable=True)
+
+    # Watermark of the rollup catch-up (services/news_rollups.py)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+    # Maintained by Postgres; deferred so listings never load it
+    search_vector = deferred(Column(TSVECTOR, Computed(NEWS_SEARCH_VECTOR, persisted=True)))
     
     # Foreign Keys
     postulator_id = Column(Integer, ForeignKey("users.id"), nullable=True)
@@ -74,8 +96,52 @@ class CouncilSession(Base):
     created_at = Column(Date, default=date.today)
     summary = Column(Text, nullable=True)
 
+    # Totals of the snapshot, written when the council closes
+    closed_at = Column(DateTime, nullable=True)
+    news_count = Column(Integer, nullable=True)
+    vote_count = Column(Integer, nullable=True)
+    participant_count = Column(Integer, nullable=True)
+    prioritized_count = Column(Integer, nullable=True)
+
+    items = relationship("CouncilSessionItem", order_by="CouncilSessionItem.news_id")
+    participants = relationship("CouncilSessionParticipant", order_by="CouncilSessionParticipant.user_id")
+
+# Immutable snapshot of each news item on the board when a council closed: its vote
+# aggregates and the prioritization outcome, frozen so history never re-reads the votes
+class CouncilSessionItem(Base):
+    __tablename__ = "council_session_items"
+
+    session_id = Column(Integer, ForeignKey("council_sessions.id", ondelete="CASCADE"), primary_key=True)
+    news_id = Column(Integer, primary_key=True, index=True) # no FK: the snapshot outlives deleted news
+    title = Column(String, nullable=True)
+    category = Column(String, nullable=True)
+    status = Column(String, nullable=True)
+    is_prioritized = Column(Boolean, nullable=True) # NULL for sessions closed before snapshots existed
+    editorial_focus = Column(Text, nullable=True)
+    assignee_ids = Column(JSON, nullable=True)
+
+    vote_count = Column(Integer, default=0)
+    impact_mean = Column(Float, nullable=True)
+    relevance_mean = Column(Float, nullable=True)
+    impact_stddev = Column(Float, nullable=True)
+    relevance_stddev = Column(Float, nullable=True)
+    quadrant = Column(String, nullable=True)
+    category_counts = Column(JSON, nullable=True)
+
+class CouncilSessionParticipant(Base):
+    __tablename__ = "council_session_participants"
+
+    session_id = Column(Integer, ForeignKey("council_sessions.id", ondelete="CASCADE"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True, index=True)
+    user_name = Column(String, nullable=True) # as it was at closing time
+    vote_count = Column(Integer, default=0)
+
 class Vote(Base):
     __tablename__ = "votes"
+    __table_args__ = (
+        # One active vote per user and news item (target of the upsert in crud_votes)
+        Index("uq_votes_active_user_news", "user_id", "news_id", unique=True, postgresql_where=text("is_active")),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -93,6 +159,19 @@ class Vote(Base):
     user = relationship("User")
     news = relationship("News", back_populates="votes")
 
+# Running totals of the active votes of each news item, kept in step with `votes` by
+# crud_votes, so means and dispersion are read without scanning the votes
+class VoteAggregate(Base):
+    __tablename__ = "vote_aggregates"
+
+    news_id = Column(Integer, ForeignKey("news.id", ondelete="CASCADE"), primary_key=True)
+    vote_count = Column(Integer, default=0)
+    impact_sum = Column(Integer, default=0)
+    impact_sum_sq = Column(Integer, default=0)
+    relevance_sum = Column(Integer, default=0)
+    relevance_sum_sq = Column(Integer, default=0)
+    category_counts = Column(JSON, default=dict) # {category_suggestion: votes}
+
 class ProductType(str, enum.Enum):
     BOLETIN = "Boletín"
     CAPSULA = "Cápsula"
@@ -120,3 +199,114 @@ class Product(Base):
     news = relationship("News", backref="products")
     user = relationship("User")
 
+
+
+# Extraction cache: text already extracted from a URL or an uploaded PDF
+class ExtractionCache(Base):
+    __tablename__ = "extraction_cache"
+
+    key = Column(String, primary_key=True) # "url:<normalized url>" or "pdf:<sha256>"
+    source = Column(String) # "url" | "pdf"
+    content = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_accessed_at = Column(DateTime, default=datetime.utcnow, index=True)
+    hit_count = Column(Integer, default=0)
+
+# AI analysis cache: Gemini results keyed by hash(prompt version, model, input text)
+class AnalysisCache(Base):
+    __tablename__ = "analysis_cache"
+
+    key = Column(String, primary_key=True) # sha256 hex
+    prompt_version = Column(String, index=True)
+    model_name = Column(String)
+    result = Column(JSON)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    hit_count = Column(Integer, default=0)
+
+# Shared Gemini quota: one token bucket row per (model, dimension), used by every API worker
+class AIQuotaBucket(Base):
+    __tablename__ = "ai_quota_buckets"
+
+    name = Column(String, primary_key=True) # "<model>:requests" | "<model>:tokens"
+    tokens = Column(Float)
+    updated_at = Column(DateTime(timezone=True))
+    blocked_until = Column(DateTime(timezone=True), nullable=True) # set after a 429
+
+class AnalysisJobStatus(str, enum.Enum):
+    PENDING = "pending"
+    EXTRACTING = "extracting"
+    ANALYZING = "analyzing"
+    DONE = "done"
+    FAILED = "failed"
+
+# Background /news/analyze requests, claimed by workers with FOR UPDATE SKIP LOCKED
+class AnalysisJob(Base):
+    __tablename__ = "analysis_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    status = Column(String, default=AnalysisJobStatus.PENDING.value, index=True)
+    source_url = Column(String, nullable=True)
+    file_content = Column(LargeBinary, nullable=True) # Uploaded PDF, dropped once the job finishes
+    refresh = Column(Boolean, default=False)
+
+    text_content = Column(Text, nullable=True)
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+
+    attempts = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    locked_at = Column(DateTime, nullable=True) # Heartbeat of the worker processing it
+
+# News counts per detection day and current (status, theme, geography, category);
+# "" stands for a missing value (see services/news_rollups.py)
+class NewsDailyRollup(Base):
+    __tablename__ = "news_daily_rollups"
+
+    day = Column(Date, primary_key=True)
+    status = Column(String, primary_key=True)
+    theme = Column(String, primary_key=True)
+    geography = Column(String, primary_key=True)
+    category = Column(String, primary_key=True)
+    news_count = Column(Integer, default=0)
+
+# The rollup key each news item is currently counted under
+class NewsRollupMember(Base):
+    __tablename__ = "news_rollup_members"
+
+    news_id = Column(Integer, primary_key=True) # no FK: deleted news are removed from the counts first
+    day = Column(Date)
+    status = Column(String)
+    theme = Column(String)
+    geography = Column(String)
+    category = Column(String)
+
+class RollupWatermark(Base):
+    __tablename__ = "rollup_watermarks"
+
+    name = Column(String, primary_key=True)
+    updated_through = Column(DateTime, nullable=True) # latest news.updated_at processed
+
+# Version counters of cached analytics results (see services/analytics_cache.py), striped
+# over shards: the version of a name is the sum of its rows
+class CacheVersion(Base):
+    __tablename__ = "cache_versions"
+
+    name = Column(String, primary_key=True)
+    shard = Column(Integer, primary_key=True, default=0)
+    version = Column(BigInteger, default=0)
+
+# Near-duplicate index over News.content_processed (see services/duplicate_index.py)
+class NewsSignature(Base):
+    __tablename__ = "news_signatures"
+
+    news_id = Column(Integer, ForeignKey("news.id", ondelete="CASCADE"), primary_key=True)
+    minhash = Column(LargeBinary) # NUM_PERM uint32 values
+
+class NewsLSHBand(Base):
+    __tablename__ = "news_lsh_bands"
+
+    # Primary key order makes (band, bucket) lookups an index scan
+    band = Column(Integer, primary_key=True)
+    bucket = Column(BigInteger, primary_key=True)
+    news_id = Column(Integer, ForeignKey("news.id", ondelete="CASCADE"), primary_key=True, index=True)
@@ -1,42 +1,124 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List
+from sqlalchemy import func, or_, select
+from typing import List, Optional, Literal
+from datetime import date, timedelta
 import models, schemas
 from database import get_db
+from services import analytics_cache, news_rollups, contrast_analytics
 
 router = APIRouter(
     prefix="/analytics",
     tags=["analytics"],
 )
 
+# Statuses a news item only reaches after the council prioritized it
+PRIORITIZED_STATUSES = [
+    models.NewsStatus.PRIORITIZED.value,
+    models.NewsStatus.IN_PROGRESS.value,
+    models.NewsStatus.PRODUCT_GENERATED.value,
+]
+
+def _compute_user_stats(db: Session) -> List[schemas.UserStats]:
+    """All the per-user metrics in one grouped query."""
+    # is_prioritized is reset when a council closes: past priorities come from the
+    # status and the session snapshots
+    was_prioritized = or_(
+        models.News.is_prioritized == True,
+        models.News.status.in_(PRIORITIZED_STATUSES),
+        models.News.id.in_(
+            select(models.CouncilSessionItem.news_id).where(models.CouncilSessionItem.is_prioritized == True)
+        )
+    )
+    postulations = db.query(
+        models.News.postulator_id.label("user_id"),
+        func.count(models.News.id).label("postulations"),
+        func.count(models.News.id).filter(was_prioritized).label("prioritized")
+    ).group_by(models.News.postulator_id).subquery()
+
+    first_products = db.query(
+        models.Product.news_id.label("news_id"),
+        func.min(models.Product.created_at).label("first_product")
+    ).group_by(models.Product.news_id).subquery()
+    assignments = db.query(
+        models.news_assignments.c.user_id.label("user_id"),
+        func.count().label("assigned"),
+        func.count(first_products.c.news_id).label("delivered"),
+        func.avg(first_products.c.first_product - models.News.detection_date).label("days_to_product")
+    ).select_from(models.news_assignments).join(
+        models.News, models.News.id == models.news_assignments.c.news_id
+    ).outerjoin(
+        first_products, first_products.c.news_id == models.news_assignments.c.news_id
+    ).group_by(models.news_assignments.c.user_id).subquery()
+
+    rows = db.query(
+        models.User.id,
+        models.User.name,
+        func.coalesce(postulations.c.postulations, 0).label("postulations"),
+        func.coalesce(postulations.c.prioritized, 0).label("prioritized"),
+        func.coalesce(assignments.c.assigned, 0).label("assigned"),
+        func.coalesce(assignments.c.delivered, 0).label("delivered"),
+        assignments.c.days_to_product
+    ).outerjoin(
+        postulations, postulations.c.user_id == models.User.id
+    ).outerjoin(
+        assignments, assignments.c.user_id == models.User.id
+    ).filter(models.User.active == True).order_by(models.User.id).all()
+
+    return [
+        schemas.UserStats(
+            id=row.id,
+            name=row.name,
+            postulations=row.postulations,
+            prioritized=row.prioritized,
+            assigned=row.assigned,
+            olfato_editorial=round(row.prioritized / row.postulations, 3) if row.postulations else None,
+            delivered=row.delivered,
+            avg_days_to_product=round(float(row.days_to_product), 1) if row.days_to_product is not None else None
+        )
+        for row in rows
+    ]
+
 @router.get("/users", response_model=List[schemas.UserStats])
 def get_user_stats(db: Session = Depends(get_db)):
-    users = db.query(models.User).filter(models.User.active == True).all()
-    stats = []
-    
-    for user in users:
-        # Count postulations
-        postulations = db.query(models.News).filter(models.News.postulator_id == user.id).count()
-        
-        # Count how many of their postulations were prioritized
-        prioritized = db.query(models.News).filter(
-            models.News.postulator_id == user.id,
-            models.News.is_prioritized == True
-        ).count()
-        
-        # Count how many news they are assigned to
-        # We check the association table news_assignments
-        assigned = db.query(models.news_assignments).filter(
-            models.news_assignments.c.user_id == user.id
-        ).count()
-        
-        stats.append(schemas.UserStats(
-            id=user.id,
-            name=user.name,
-            postulations=postulations,
-            prioritized=prioritized,
-            assigned=assigned
-        ))
-        
-    return stats
+    """
+    Per active user: postulations, prioritized, Olfato Editorial, assignments and
+    time-to-product. Cached until a write changes any of them.
+    """
+    return analytics_cache.get_or_compute(db, analytics_cache.USER_STATS, _compute_user_stats)
+
+@router.get("/timeseries", response_model=List[schemas.TimeseriesPoint])
+def get_timeseries(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    granularity: Literal["day", "week", "month"] = "week",
+    group_by: Optional[Literal["status", "theme", "geography", "category"]] = None,
+    status: Optional[str] = None,
+    theme: Optional[str] = None,
+    geography: Optional[str] = None,
+    category: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    News detected per day, week or month between start and end (default: the last
+    90 days), optionally split by a dimension and filtered by exact values. Served
+    from the daily rollups: the cost depends on the range, not on the archive size.
+    """
+    end = end or date.today()
+    start = start or end - timedelta(days=90)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    return news_rollups.timeseries(
+        db, start, end, granularity=granularity, group_by=group_by,
+        status=status, theme=theme, geography=geography, category=category
+    )
+
+@router.get("/contrast")
+def get_contrast(db: Session = Depends(get_db)):
+    """
+    AI vs council ("Análisis de Contraste"): the AI impact_score of each judged
+    news item against the council's impact mean, over closed sessions and the
+    current board. Overall agreement, blind spots both ways, and divergence per
+    theme and per postulator. Kept in memory and refreshed with what changed.
+    """
+    return contrast_analytics.report(db)
@@ -0,0 +1,41 @@
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy.orm import Session, selectinload
+from typing import List, Optional
+import crud_votes, schemas, models
+from database import get_db
+
+router = APIRouter(
+    prefix="/council",
+    tags=["council"],
+)
+
+@router.get("/board", response_model=List[schemas.CouncilBoardItem])
+def get_board(db: Session = Depends(get_db)):
+    """News in council with their active votes, score means, stddevs and matrix quadrant."""
+    return crud_votes.get_council_board(db)
+
+@router.get("/sessions", response_model=List[schemas.CouncilSessionSummary])
+def list_sessions(response: Response, limit: int = 20, cursor: Optional[int] = None, db: Session = Depends(get_db)):
+    """
+    Closed councils, newest first, with their snapshot totals. Pages are chained
+    with `cursor`: the X-Next-Cursor header of the previous page (absent on the last one).
+    """
+    limit = min(max(limit, 1), 100)
+    query = db.query(models.CouncilSession)
+    if cursor is not None:
+        query = query.filter(models.CouncilSession.id < cursor)
+    sessions = query.order_by(models.CouncilSession.id.desc()).limit(limit).all()
+    if len(sessions) == limit:
+        response.headers["X-Next-Cursor"] = str(sessions[-1].id)
+    return sessions
+
+@router.get("/sessions/{session_id}", response_model=schemas.CouncilSessionDetail)
+def get_session(session_id: int, db: Session = Depends(get_db)):
+    """A closed council as it was frozen: per-news aggregates and outcome, and participants."""
+    session = db.query(models.CouncilSession).options(
+        selectinload(models.CouncilSession.items),
+        selectinload(models.CouncilSession.participants)
+    ).filter(models.CouncilSession.id == session_id).first()
+    if session is None:
+        raise HTTPException(status_code=404, detail="Council session not found")
+    return session
@@ -0,0 +1,45 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import Optional, Literal
+from datetime import date
+from services import export_service
+
+router = APIRouter(
+    prefix="/export",
+    tags=["export"],
+    responses={404: {"description": "Not found"}},
+)
+
+@router.get("/{dataset}")
+def export_dataset(
+    dataset: Literal["news", "votes", "products"],
+    format: Literal["csv", "xlsx", "parquet"] = "csv",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    status: Optional[str] = None,
+    session_id: Optional[int] = Query(None, ge=1),
+    include_archived: bool = False
+):
+    """
+    Streams a whole table as a file (CSV, write-only XLSX or Parquet), read with a
+    server-side cursor so memory stays flat on any number of rows.
+    start/end: detection date of the news item (creation date for products).
+    status, include_archived: news status. session_id: votes cast in that council,
+    or the news on its board (and their products).
+    """
+    if start and end and start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    try:
+        export_service.check_format(format)
+    except export_service.ExportFormatUnavailable as e:
+        raise HTTPException(status_code=501, detail=str(e))
+
+    filename = f"{dataset}-{date.today().isoformat()}.{format}"
+    return StreamingResponse(
+        export_service.stream(
+            dataset, format, start=start, end=end, status=status,
+            session_id=session_id, include_archived=include_archived
+        ),
+        media_type=export_service.FORMATS[format]["media_type"],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
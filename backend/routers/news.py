@@ -1,9 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import Optional, List
+from typing import Optional, List, Literal
+import asyncio
+import json
 import crud, models, schemas
 from database import get_db
-from services import ai_service, extraction_service
+from services import ai_service, extraction_cache, analysis_cache, analysis_pipeline, job_queue, duplicate_index, minhash, vector_index, analytics_cache, news_rollups
 
 router = APIRouter(
     prefix="/news",
@@ -11,92 +14,209 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
-@router.post("/analyze", response_model=schemas.NewsBase)
+@router.post("/analyze", response_model=schemas.AnalysisResult)
 async def analyze_news(
     url: Optional[str] = Form(None),
-    file: Optional[UploadFile] = File(None)
+    file: Optional[UploadFile] = File(None),
+    refresh: bool = Form(False)
 ):
     """
     Analyzes content from a URL or PDF file using Gemini AI.
     Returns the analysis (title, summary, classifications) without saving to DB yet.
+    Known texts are served from the analysis cache unless refresh=true.
+    `duplicates` lists stored news with nearly the same text; a near-identical one
+    reuses its analysis instead of calling Gemini (unless refresh=true).
     """
     if not url and not file:
         raise HTTPException(status_code=400, detail="Must provide either URL or File")
 
-    text_content = ""
-    
-    if url:
-        text_content = extraction_service.extract_from_url(url)
-    elif file:
+    file_content = None
+    if not url:
         if file.content_type != "application/pdf":
              raise HTTPException(status_code=400, detail="Only PDF files are supported")
         file_content = await file.read()
-        text_content = extraction_service.extract_from_pdf(file_content)
-
-    if not text_content:
-        raise HTTPException(status_code=400, detail="Could not extract text content")
-
-    if text_content == "OCR_REQUIRED":
-         return schemas.NewsBase(
-            title="PDF No Procesable (Requiere OCR)",
-            original_url=url if url else "Archivo PDF",
-            status="Identificado",
-            classifications={
-                "summary": "El documento parece ser un PDF escaneado o una imagen sin capa de texto. El sistema actual no soporta OCR (Reconocimiento Óptico de Caracteres).",
-                "theme": "Error de Formato",
-                "geography": "N/A",
-                "impact": "N/A",
-                "keywords": []
-            }
-        )
 
-    # Call Gemini AI
-    # Now async and locked
-    analysis = await ai_service.analyze_text(text_content)
-    
-    # Return structured data for frontend preview
-    return schemas.NewsBase(
-        title=analysis.get("title", "Sin título"),
-        original_url=url if url else "Archivo PDF",
-        status="Identificado",
-        classifications={
-            "summary": analysis.get("summary", ""),
-            "theme": analysis.get("theme", ""),
-            "geography": analysis.get("geography", ""),
-            "impact": analysis.get("impact", ""),
-            "keywords": analysis.get("keywords", []),
-            "content_processed": text_content[:5000] # Return a snippet of processed text
-        }
+    try:
+        text_content = await analysis_pipeline.extract(url, file_content)
+    except analysis_pipeline.EmptyContentError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return await analysis_pipeline.analyze(url, text_content, refresh=refresh)
+
+@router.post("/analyze/batch")
+async def analyze_news_batch(
+    urls: Optional[str] = Form(None),
+    files: Optional[List[UploadFile]] = File(None),
+    refresh: bool = Form(False)
+):
+    """
+    Analyzes a list of URLs (one per line, as pasted after a monitoring session)
+    and/or several PDFs. Streams NDJSON: one line per item, in completion order,
+    with {"item_id", "source", "ok", "result" | "error"}.
+    """
+    items = []
+    for line in (urls or "").splitlines():
+        url = line.strip()
+        if url:
+            items.append({"item_id": len(items), "source": url, "url": url})
+
+    for upload in files or []:
+        item = {"item_id": len(items), "source": upload.filename}
+        if upload.content_type != "application/pdf":
+            item["error"] = "Only PDF files are supported"
+        else:
+            # Read now: uploads are closed once the streaming response starts
+            item["file_content"] = await upload.read()
+        items.append(item)
+
+    if not items:
+        raise HTTPException(status_code=400, detail="Must provide URLs or Files")
+    if len(items) > analysis_pipeline.BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {analysis_pipeline.BATCH_MAX_ITEMS} items per batch")
+
+    async def ndjson_rows():
+        async for row in analysis_pipeline.analyze_batch(items, refresh=refresh):
+            yield json.dumps(row, ensure_ascii=False, default=str) + "\n"
+
+    return StreamingResponse(ndjson_rows(), media_type="application/x-ndjson")
+
+@router.post("/analyze/jobs", response_model=schemas.AnalysisJob, status_code=202)
+async def submit_analysis_job(
+    url: Optional[str] = Form(None),
+    file: Optional[UploadFile] = File(None),
+    refresh: bool = Form(False),
+    db: Session = Depends(get_db)
+):
+    """
+    Queues an analysis and returns immediately with the job id.
+    Follow it with GET /news/analyze/jobs/{id} or the /events SSE stream.
+    """
+    if not url and not file:
+        raise HTTPException(status_code=400, detail="Must provide either URL or File")
+
+    file_content = None
+    if not url:
+        if file.content_type != "application/pdf":
+             raise HTTPException(status_code=400, detail="Only PDF files are supported")
+        file_content = await file.read()
+
+    return job_queue.enqueue(db, url, file_content, refresh=refresh)
+
+@router.get("/analyze/jobs/{job_id}", response_model=schemas.AnalysisJob)
+def read_analysis_job(job_id: int, db: Session = Depends(get_db)):
+    job = job_queue.get_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/analyze/jobs/{job_id}/events")
+def stream_analysis_job(job_id: int, db: Session = Depends(get_db)):
+    """
+    Server-Sent Events: `status` on every change, `extracted` with the processed text,
+    then `result` (NewsBase preview) or `error`.
+    """
+    if job_queue.get_job(db, job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return StreamingResponse(
+        job_queue.stream_events(job_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
-@router.post("/", response_model=schemas.News)
+@router.get("/analyze/stats")
+async def analyze_stats():
+    """
+    Operational counters for the analyze pipeline (extraction cache hits/misses, etc).
+    """
+    return {
+        "extraction_cache": await asyncio.to_thread(extraction_cache.cache_stats),
+        "analysis_cache": await asyncio.to_thread(analysis_cache.cache_stats),
+        "ai_limiter": ai_service.limiter.snapshot(),
+        "input_compaction": ai_service.compaction_stats,
+        "ai_calls": {"backend": ai_service.backend.name, **ai_service.call_stats},
+        "duplicate_index": await asyncio.to_thread(duplicate_index.index_stats)
+    }
+
+@router.delete("/analyze/cache")
+async def invalidate_analysis_cache(stale_only: bool = True):
+    """
+    Drops cached AI analyses. By default only entries from previous prompt versions;
+    stale_only=false clears everything (e.g. after a model change).
+    """
+    prompt_version = ai_service.PROMPT_VERSION if stale_only else None
+    deleted = await asyncio.to_thread(analysis_cache.invalidate, prompt_version)
+    return {"message": f"{deleted} cached analyses removed"}
+
+@router.post("/", response_model=schemas.NewsCreated)
 def create_news(news: schemas.NewsCreate, db: Session = Depends(get_db)):
-    return crud.create_news(db=db, news=news)
+    """
+    Saves the news item and adds it to the duplicate index. The response lists
+    the stored news it nearly duplicates (checked before saving).
+    """
+    signature = minhash.signature(news.content_processed)
+    duplicates = duplicate_index.find_duplicates(db, signature)
+    db_news = crud.create_news(db=db, news=news, signature=signature)
+    vector_index.index_news(db_news)
+    db_news.duplicates = duplicates
+    return db_news
 
 @router.get("/", response_model=List[schemas.News])
 def read_news(
+    response: Response,
     skip: int = 0, 
     limit: int = 100, 
     q: Optional[str] = None, 
     include_archived: bool = False,
+    status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    count: Optional[Literal["exact", "estimated"]] = None,
     db: Session = Depends(get_db)
 ):
-    # Base query
-    query = db.query(models.News)
-    
-    # Filter out archived unless requested
-    if not include_archived:
-        query = query.filter(models.News.status != "Archivado")
-        
-    # Search logic (basic ILIKE for now, can be improved)
-    if q:
-        search = f"%{q}%"
-        query = query.filter(
-            (models.News.title.ilike(search)) | 
-            (models.News.status.ilike(search))
+    """
+    Lists news, newest first. `q` is a full-text search over title, keywords,
+    summary and content (ordered by relevance, with a highlighted `headline`).
+    Without `q`, pages are chained with `cursor`: pass the X-Next-Cursor header of
+    the previous page (absent on the last one). `count` adds X-Total-Count, exact
+    or the planner's estimate.
+    """
+    return _list_news(response, db, skip, limit, q, include_archived, status, cursor, count, summary_view=False)
+
+@router.get("/summary", response_model=List[schemas.NewsSummary])
+def read_news_summary(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    q: Optional[str] = None,
+    include_archived: bool = False,
+    status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    count: Optional[Literal["exact", "estimated"]] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Same listing as GET /news/ (same parameters and headers) in the slim list
+    shape: no content_processed, and vote_count / impact_mean / relevance_mean of
+    the active votes instead of the vote rows.
+    """
+    return _list_news(response, db, skip, limit, q, include_archived, status, cursor, count, summary_view=True)
+
+def _list_news(response: Response, db: Session, skip, limit, q, include_archived, status, cursor, count, summary_view: bool):
+    limit = min(max(limit, 1), 500)
+    try:
+        items = crud.get_news(
+            db, skip=skip, limit=limit, search_query=q, include_archived=include_archived, status=status,
+            cursor=cursor, summary_view=summary_view
         )
-        
-    return query.offset(skip).limit(limit).all()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if not q and len(items) == limit:
+        response.headers["X-Next-Cursor"] = crud.encode_cursor(items[-1])
+    if count:
+        response.headers["X-Total-Count"] = str(crud.count_news(
+            db, estimated=count == "estimated", search_query=q, include_archived=include_archived, status=status
+        ))
+    return items
 
 @router.patch("/{news_id}/archive")
 def archive_news(news_id: int, db: Session = Depends(get_db)):
@@ -106,6 +226,8 @@ def archive_news(news_id: int, db: Session = Depends(get_db)):
     
     db_news.status = "Archivado"
     db_news.in_council = False # Remove from council if it was there
+    news_rollups.refresh(db, [news_id])
+    analytics_cache.bump(db, analytics_cache.USER_STATS)
     db.commit()
     return db_news
 
@@ -116,6 +238,8 @@ def reactivate_news(news_id: int, db: Session = Depends(get_db)):
          raise HTTPException(status_code=404, detail="News not found")
     
     db_news.status = "Identificado" # Reset to initial status
+    news_rollups.refresh(db, [news_id])
+    analytics_cache.bump(db, analytics_cache.USER_STATS)
     db.commit()
     return db_news
 
@@ -126,6 +250,30 @@ def read_news_item(news_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="News not found")
     return db_news
 
+@router.get("/{news_id}/related", response_model=List[schemas.RelatedNews])
+def read_related_news(news_id: int, limit: int = 10, include_archived: bool = False, db: Session = Depends(get_db)):
+    """
+    Most similar news by title, summary, keywords and theme ("noticias relacionadas"),
+    from the local vector index. Archived news are left out unless include_archived,
+    as in the listing.
+    """
+    if crud.get_news_by_id(db, news_id=news_id) is None:
+        raise HTTPException(status_code=404, detail="News not found")
+
+    limit = min(max(limit, 1), 50)
+    # Extra candidates, so the page stays full after dropping archived ones
+    scores = dict(vector_index.related(news_id, k=limit if include_archived else limit * 3))
+    if not scores:
+        return []
+    query = db.query(models.News.id, models.News.title, models.News.status, models.News.detection_date).filter(
+        models.News.id.in_(scores.keys())
+    )
+    if not include_archived:
+        query = query.filter(models.News.status != "Archivado")
+    related = [{**row._asdict(), "similarity": round(scores[row.id], 3)} for row in query.all()]
+    related.sort(key=lambda item: item["similarity"], reverse=True)
+    return related[:limit]
+
 @router.patch("/{news_id}", response_model=schemas.News)
 def update_news_item(news_id: int, news_update: schemas.NewsUpdate, db: Session = Depends(get_db)):
     db_news = crud.get_news_by_id(db, news_id=news_id)
@@ -148,8 +296,11 @@ def update_news_item(news_id: int, news_update: schemas.NewsUpdate, db: Session
         users = db.query(models.User).filter(models.User.id.in_(news_update.assignee_ids)).all()
         db_news.assignees = users
         
+    news_rollups.refresh(db, [news_id])
+    analytics_cache.bump(db, analytics_cache.USER_STATS)
     db.commit()
     db.refresh(db_news)
+    vector_index.index_news(db_news)
     return db_news
 
 @router.delete("/{news_id}")
@@ -160,5 +311,9 @@ def delete_news_item(news_id: int, db: Session = Depends(get_db)):
     
     # Optional: Delete associated votes or let database cascade
     db.delete(db_news)
+    news_rollups.refresh(db, [news_id])
+    # Its vote aggregates go with it (ON DELETE CASCADE)
+    analytics_cache.bump(db, analytics_cache.USER_STATS, analytics_cache.COUNCIL_VOTES)
     db.commit()
+    vector_index.remove_news(news_id)
     return {"message": "News deleted successfully"}
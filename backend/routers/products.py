@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 from typing import List, Optional
 import models, schemas
 from database import get_db
+from services import analytics_cache
 import shutil
 import os
 from datetime import datetime
@@ -66,6 +67,7 @@ async def create_product(
     )
     
     db.add(db_product)
+    analytics_cache.bump(db, analytics_cache.USER_STATS)
     db.commit()
     db.refresh(db_product)
     return db_product
@@ -94,5 +96,6 @@ def delete_product(product_id: int, db: Session = Depends(get_db)):
         os.remove(product.file_path)
         
     db.delete(product)
+    analytics_cache.bump(db, analytics_cache.USER_STATS)
     db.commit()
     return {"ok": True}
@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 from typing import List
 import crud, models, schemas
 from database import get_db
+from services import analytics_cache
 
 router = APIRouter(
     prefix="/users",
@@ -81,6 +82,7 @@ def update_user(user_id: int, user_update: schemas.UserUpdate, db: Session = Dep
     if user_update.password is not None:
         db_user.password = user_update.password
         
+    analytics_cache.bump(db, analytics_cache.USER_STATS)
     db.commit()
     db.refresh(db_user)
     return db_user
@@ -102,6 +104,7 @@ def delete_user(user_id: int, db: Session = Depends(get_db)):
 
     try:
         db.delete(db_user)
+        analytics_cache.bump(db, analytics_cache.USER_STATS)
         db.commit()
     except Exception as e:
         db.rollback()
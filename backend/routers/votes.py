@@ -2,8 +2,9 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from typing import List
 import crud_votes, schemas, models
-from datetime import date
+from datetime import date, datetime
 from database import get_db
+from services import analytics_cache
 
 router = APIRouter(
     prefix="/votes",
@@ -15,6 +16,13 @@ router = APIRouter(
 def cast_vote(vote: schemas.VoteCreate, db: Session = Depends(get_db)):
     return crud_votes.create_vote(db=db, vote=vote)
 
+@router.post("/bulk", response_model=List[schemas.Vote])
+def cast_votes(ballot: schemas.VoteBulkCreate, db: Session = Depends(get_db)):
+    """Creates or updates the user's votes on every listed news item, all or nothing."""
+    return crud_votes.upsert_votes(db, [
+        schemas.VoteCreate(user_id=ballot.user_id, **score.model_dump()) for score in ballot.votes
+    ])
+
 @router.get("/news/{news_id}", response_model=List[schemas.Vote])
 def get_news_votes(news_id: int, db: Session = Depends(get_db)):
     return db.query(models.Vote).filter(models.Vote.news_id == news_id, models.Vote.is_active == True).all()
@@ -28,12 +36,15 @@ def set_council_status(news_id: int, in_council: bool, db: Session = Depends(get
 
 @router.post("/council/close")
 def close_council(db: Session = Depends(get_db)):
-    # 1. Create a new Council Session snapshot
+    # Everything below is one transaction: the snapshot, the archive and the resets
+    # 1. Create a new Council Session and freeze the board into it (aggregates, priorities, participants)
     today = date.today()
-    session = models.CouncilSession(summary=f"Consejo cerrado el {today}")
+    session = models.CouncilSession(summary=f"Consejo cerrado el {today}", closed_at=datetime.utcnow())
     db.add(session)
-    db.commit()
-    db.refresh(session)
+    db.flush()
+    totals = crud_votes.snapshot_council(db, session.id)
+    for name, value in totals.items():
+        setattr(session, name, value)
     
     # 2. Archive current votes: Set is_active=False and link to session
     # We only archive votes for news currently IN council
@@ -46,6 +57,8 @@ def close_council(db: Session = Depends(get_db)):
         models.Vote.is_active: False,
         models.Vote.session_id: session.id
     }, synchronize_session=False)
+    # Their running totals go with them (same transaction)
+    crud_votes.reset_aggregates(db, subquery_news_in_council)
 
     # 3. Reset news status
     # Remove from council. If not prioritized, they go back to backlog (Identificado) implicitly by just removing from council.
@@ -55,5 +68,6 @@ def close_council(db: Session = Depends(get_db)):
     # 4. Reset executive priorities for all news (new cycle starts)
     priority_count = db.query(models.News).filter(models.News.is_prioritized == True).update({models.News.is_prioritized: False})
     
+    analytics_cache.bump(db, analytics_cache.USER_STATS)
     db.commit()
     return {"message": f"Council closed. Session {session.id} created. {count} news items removed from the active board. {priority_count} executive priorities reset."}
@@ -1,6 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 from typing import Optional, List, Dict
-from datetime import date
+from datetime import date, datetime
 
 class UserBase(BaseModel):
     name: str
@@ -34,6 +34,15 @@ class NewsBase(BaseModel):
     category: Optional[str] = None # Nerd, Geek, Trend
     classifications: Optional[Dict] = None
 
+class DuplicateMatch(BaseModel):
+    news_id: int
+    title: Optional[str] = None
+    status: Optional[str] = None
+    similarity: float # estimated Jaccard similarity of the processed texts
+
+class AnalysisResult(NewsBase):
+    duplicates: List[DuplicateMatch] = [] # existing news with nearly the same text
+
 class NewsCreate(NewsBase):
     content_processed: str
     summary: str
@@ -53,10 +62,54 @@ class News(NewsBase):
     editorial_focus: Optional[str] = None
     assignees: List[User] = []
     votes: List["Vote"] = [] 
+    headline: Optional[str] = None # search matches, only in GET /news/?q=...
 
     class Config:
         from_attributes = True
 
+class NewsCreated(News):
+    duplicates: List[DuplicateMatch] = [] # near-duplicates found before saving
+
+def _without_processed_text(classifications: Optional[Dict]) -> Optional[Dict]:
+    # /news/analyze previews carry the article text inside classifications
+    if classifications and "content_processed" in classifications:
+        return {key: item for key, item in classifications.items() if key != "content_processed"}
+    return classifications
+
+class NewsSummary(BaseModel):
+    """List projection of News: no body, vote aggregates instead of vote rows."""
+    id: int
+    title: str
+    original_url: Optional[str] = None
+    status: str
+    category: Optional[str] = None
+    classifications: Optional[Dict] = None
+    detection_date: date
+    postulator_id: Optional[int] = None
+    postulator: Optional[User] = None
+    in_council: bool = False
+    is_prioritized: bool = False
+    assignees: List[User] = []
+    vote_count: int = 0 # active (current council) votes
+    impact_mean: Optional[float] = None
+    relevance_mean: Optional[float] = None
+    headline: Optional[str] = None # search matches, only with q
+
+    @field_validator("classifications")
+    @classmethod
+    def drop_processed_text(cls, value):
+        return _without_processed_text(value)
+
+    class Config:
+        from_attributes = True
+
+class RelatedNews(BaseModel):
+    id: int
+    title: Optional[str] = None # e.g. PDFs that needed OCR
+    status: str
+    detection_date: date
+    similarity: float # cosine of the title/summary/keywords/theme vectors
+
 class NewsUpdate(BaseModel):
     is_prioritized: Optional[bool] = None
     editorial_focus: Optional[str] = None
@@ -68,8 +121,16 @@ class UserStats(BaseModel):
     id: int
     name: str
     postulations: int
-    prioritized: int
+    prioritized: int # postulated news that were ever prioritized
     assigned: int
+    olfato_editorial: Optional[float] = None # prioritized / postulations, None without postulations
+    delivered: int = 0 # assigned news with at least one product
+    avg_days_to_product: Optional[float] = None # first product date - detection date, over delivered news
+
+class TimeseriesPoint(BaseModel):
+    period: date # first day of the day/week/month
+    group: Optional[str] = None # value of group_by ("" = not set), None without group_by
+    count: int
 
 class VoteBase(BaseModel):
     impact_score: int
@@ -80,6 +141,14 @@ class VoteCreate(VoteBase):
     news_id: int
     user_id: int
 
+class VoteScore(VoteBase):
+    news_id: int
+
+class VoteBulkCreate(BaseModel):
+    """Scores of one council member for several news items, saved in one transaction."""
+    user_id: int
+    votes: List[VoteScore]
+
 class Vote(VoteBase):
     id: int
     news_id: int
@@ -88,6 +157,79 @@ class Vote(VoteBase):
     class Config:
         from_attributes = True
 
+class CouncilBoardItem(BaseModel):
+    """A news item on the council board with its active votes and their aggregates."""
+    id: int
+    title: str
+    status: str
+    category: Optional[str] = None
+    classifications: Optional[Dict] = None
+    in_council: bool = True
+    is_prioritized: bool = False
+    editorial_focus: Optional[str] = None
+    assignees: List[User] = []
+    votes: List[Vote] = []
+    vote_count: int = 0
+    impact_mean: Optional[float] = None # None until the first vote
+    relevance_mean: Optional[float] = None
+    impact_stddev: Optional[float] = None
+    relevance_stddev: Optional[float] = None
+    quadrant: Optional[str] = None # Urgente, Semana, Estrategico or Luego
+    category_counts: Dict[str, int] = {} # category_suggestion tallies
+
+    @field_validator("classifications")
+    @classmethod
+    def drop_processed_text(cls, value):
+        return _without_processed_text(value)
+
+    class Config:
+        from_attributes = True
+
+class CouncilSessionSummary(BaseModel):
+    id: int
+    created_at: date
+    closed_at: Optional[datetime] = None
+    summary: Optional[str] = None
+    news_count: Optional[int] = None
+    vote_count: Optional[int] = None
+    participant_count: Optional[int] = None
+    prioritized_count: Optional[int] = None
+
+    class Config:
+        from_attributes = True
+
+class CouncilSessionItem(BaseModel):
+    """A news item as it stood on the board when the session closed."""
+    news_id: int
+    title: Optional[str] = None
+    category: Optional[str] = None
+    status: Optional[str] = None
+    is_prioritized: Optional[bool] = None # None for sessions closed before snapshots existed
+    editorial_focus: Optional[str] = None
+    assignee_ids: List[int] = []
+    vote_count: int = 0
+    impact_mean: Optional[float] = None
+    relevance_mean: Optional[float] = None
+    impact_stddev: Optional[float] = None
+    relevance_stddev: Optional[float] = None
+    quadrant: Optional[str] = None
+    category_counts: Dict[str, int] = {}
+
+    class Config:
+        from_attributes = True
+
+class CouncilSessionParticipant(BaseModel):
+    user_id: int
+    user_name: Optional[str] = None
+    vote_count: int = 0
+
+    class Config:
+        from_attributes = True
+
+class CouncilSessionDetail(CouncilSessionSummary):
+    items: List[CouncilSessionItem] = []
+    participants: List[CouncilSessionParticipant] = []
+
 class ProductBase(BaseModel):
     product_type: str
     name: str
@@ -107,3 +249,17 @@ class Product(ProductBase):
 
     class Config:
         from_attributes = True
+
+class AnalysisJob(BaseModel):
+    id: int
+    status: str
+    source_url: Optional[str] = None
+    text_content: Optional[str] = None
+    result: Optional[AnalysisResult] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
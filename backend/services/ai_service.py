@@ -1,36 +1,36 @@
-from google import genai
 import os
 import json
 import asyncio
 from pydantic import BaseModel
-from typing import List
+from typing import List, Dict, Optional
 
-# Initialize the new Gemini Client
-client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+from services import analysis_cache, extraction_service, text_compaction, llm_backends, json_repair
+from services.llm_backends import QuotaExceededError
+from services.text_compaction import estimate_tokens
+from services.rate_limiter import RateLimiter, LocalQuota
+from services.quota_coordinator import PostgresQuota
+
+# Gemini client, or the offline stub with AI_BACKEND=stub (see llm_backends)
+backend = llm_backends.get_backend()
 
 # Using gemini-2.5-flash for the best balance of speed and reliability in 2026 Free Tier
 MODEL_NAME = "gemini-2.5-flash"
 
-# GLOBAL LOCK to prevent concurrent API calls
-analysis_lock = asyncio.Lock()
+# Bump whenever PROMPT_TEMPLATE or PACKED_PROMPT_TEMPLATE changes: cached analyses from other versions are never reused
+PROMPT_VERSION = "2026-02"
 
-async def analyze_text(text: str) -> dict:
-    """
-    Analyzes the provided text using the Gemini SDK.
-    Protected by a lock and includes basic retry logic for Free Tier stability.
-    """
-    async with analysis_lock:
-        print(f"Acquired lock. Analyzing text (length: {len(text)} characters) with {MODEL_NAME}...")
-        
-        prompt = f"""
+# Token budget for the article text in a prompt; longer inputs are compacted to fit
+INPUT_TOKEN_BUDGET = int(os.getenv("GEMINI_INPUT_TOKEN_BUDGET", "4000"))
+
+PROMPT_TEMPLATE = """
         Actúa como un analista experto en Ciencia, Tecnología e Innovación (CTi) para Ruta N Medellín.
         Ruta N es el centro de innovación y negocios de Medellín, cuya misión es articular el ecosistema de CTi para transformar la economía de la ciudad hacia una basada en el conocimiento. Sus ejes principales son: atraer talento y empresas, fomentar la innovación abierta, y fortalecer el tejido empresarial tecnológico.
 
         Analiza el siguiente texto extraído de una noticia o documento y genera un análisis estructurado.
 
         Texto a analizar:
-        "{text[:15000]}"
-        
+        "{text}"
+
         Salida requerida (SOLO JSON válido):
         {{
             "title": "Un título corto y descriptivo (máximo 15 palabras)",
@@ -38,40 +38,342 @@ async def analyze_text(text: str) -> dict:
             "theme": "Temática principal (ej: Inteligencia Artificial, Biotecnología, Política Pública, Smart Cities, etc.)",
             "geography": "Ámbito geográfico (ej: Medellín, Colombia, Latam, Global)",
             "impact": "Análisis detallado del impacto o relevancia específica para Ruta N y Medellín. Responde: ¿Cómo afecta esto a los planes de la ciudad o a las empresas del ecosistema? (3-4 líneas)",
+            "impact_score": "Entero de 1 (impacto marginal) a 5 (impacto transformador) para Ruta N y Medellín, coherente con el análisis de impacto",
             "keywords": ["tag1", "tag2", "tag3"]
         }}
         """
 
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                response = await asyncio.to_thread(
-                    client.models.generate_content,
-                    model=MODEL_NAME, 
-                    contents=prompt
-                )
-                
-                text_response = response.text
-                # Extraer JSON limpio
-                cleaned_response = text_response.replace("```json", "").replace("```", "").strip()
-                # A veces la respuesta trae texto extra antes o después del JSON
-                start_idx = cleaned_response.find('{')
-                end_idx = cleaned_response.rfind('}') + 1
-                if start_idx != -1 and end_idx != 0:
-                    cleaned_response = cleaned_response[start_idx:end_idx]
-                
-                analysis = json.loads(cleaned_response)
-                return analysis
-            except Exception as e:
-                print(f"Attempt {attempt + 1} failed for {MODEL_NAME}: {e}")
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(2 * (attempt + 1)) # Exponential backoff
-                else:
-                    return {
-                        "title": "Error de Conexión (IA Sobrecargada)",
-                        "summary": f"No se pudo generar el análisis tras {max_retries} intentos. Google reporta: {str(e)}",
-                        "theme": "Error de Sistema",
-                        "geography": "N/A",
-                        "impact": "N/A",
-                        "keywords": []
-                    }
+PACKED_PROMPT_TEMPLATE = """
+        Actúa como un analista experto en Ciencia, Tecnología e Innovación (CTi) para Ruta N Medellín.
+        Ruta N es el centro de innovación y negocios de Medellín, cuya misión es articular el ecosistema de CTi para transformar la economía de la ciudad hacia una basada en el conocimiento. Sus ejes principales son: atraer talento y empresas, fomentar la innovación abierta, y fortalecer el tejido empresarial tecnológico.
+
+        A continuación hay {count} textos independientes extraídos de noticias o documentos, cada uno delimitado por <<<ARTICULO id="...">>> y <<<FIN ARTICULO>>>.
+        Analiza cada texto por separado, sin mezclar información entre ellos.
+
+        {articles}
+
+        Salida requerida (SOLO un arreglo JSON válido, con exactamente un objeto por texto):
+        [
+            {{
+                "id": "el id del texto analizado, tal como aparece en su delimitador",
+                "title": "Un título corto y descriptivo (máximo 15 palabras)",
+                "summary": "Un resumen ejecutivo enfocado en por qué esta noticia es relevante para el ecosistema CTI (máximo 3 párrafos)",
+                "theme": "Temática principal (ej: Inteligencia Artificial, Biotecnología, Política Pública, Smart Cities, etc.)",
+                "geography": "Ámbito geográfico (ej: Medellín, Colombia, Latam, Global)",
+                "impact": "Análisis detallado del impacto o relevancia específica para Ruta N y Medellín. Responde: ¿Cómo afecta esto a los planes de la ciudad o a las empresas del ecosistema? (3-4 líneas)",
+                "impact_score": "Entero de 1 (impacto marginal) a 5 (impacto transformador) para Ruta N y Medellín, coherente con el análisis de impacto",
+                "keywords": ["tag1", "tag2", "tag3"]
+            }}
+        ]
+        """
+
+ANALYSIS_FIELDS = ("title", "summary", "theme", "geography", "impact", "impact_score", "keywords")
+IMPACT_SCORE_RANGE = (1, 5)
+# A reply missing other fields (e.g. cut off near the end) is completed instead of regenerated
+REQUIRED_FIELDS = ("title", "summary")
+
+class AnalysisOutput(BaseModel):
+    """Response schema for structured output mode (single text)."""
+    title: str
+    summary: str
+    theme: str
+    geography: str
+    impact: str
+    impact_score: int
+    keywords: List[str]
+
+class PackedAnalysisOutput(AnalysisOutput):
+    """Response schema for one entry of a packed reply."""
+    id: str
+
+# Ask Gemini for JSON constrained to the schemas above instead of free text
+STRUCTURED_OUTPUT = os.getenv("GEMINI_STRUCTURED_OUTPUT", "true").lower() != "false"
+
+# Packing: texts up to PACK_ITEM_MAX_CHARS are bundled, up to PACK_MAX_ITEMS / PACK_MAX_CHARS per request
+PACK_ITEM_MAX_CHARS = int(os.getenv("GEMINI_PACK_ITEM_MAX_CHARS", "6000"))
+PACK_MAX_ITEMS = int(os.getenv("GEMINI_PACK_MAX_ITEMS", "6"))
+PACK_MAX_CHARS = int(os.getenv("GEMINI_PACK_MAX_CHARS", "30000"))
+
+MAX_RETRIES = 3
+
+class AnalysisError(Exception):
+    """Raised when Gemini could not produce a valid analysis after all retries."""
+
+class ResponseFormatError(ValueError):
+    """The reply could not be turned into an analysis, even after repair."""
+
+# Free Tier quota for the model. Calls wait in the limiter instead of a global lock.
+# With GEMINI_QUOTA_BACKEND=postgres (default) the RPM/TPM budget is shared by all
+# uvicorn workers and background jobs; the concurrency cap applies per worker.
+GEMINI_RPM = int(os.getenv("GEMINI_RPM", "10"))
+GEMINI_TPM = int(os.getenv("GEMINI_TPM", "250000"))
+
+def _build_quota():
+    if os.getenv("GEMINI_QUOTA_BACKEND", "postgres") == "postgres":
+        return PostgresQuota(MODEL_NAME, GEMINI_RPM, GEMINI_TPM)
+    return LocalQuota(GEMINI_RPM, GEMINI_TPM)
+
+limiter = RateLimiter(
+    requests_per_minute=GEMINI_RPM,
+    tokens_per_minute=GEMINI_TPM,
+    max_concurrency=int(os.getenv("GEMINI_MAX_CONCURRENCY", "4")),
+    quota=_build_quota()
+)
+
+# Expected size of the JSON answer, used to reserve tokens before the call
+ESTIMATED_OUTPUT_TOKENS = 800
+# Pause applied on a 429 when the API does not say how long to wait
+DEFAULT_RATE_LIMIT_BACKOFF = float(os.getenv("GEMINI_RATE_LIMIT_BACKOFF", "15"))
+
+# Process-local counters for model calls, exposed through /news/analyze/stats
+# Failures are split by cause: quota (429), format (unparseable reply) and network/API errors
+call_stats = {
+    "calls": 0,
+    "attempts": 0,
+    "retries": 0,
+    "failed": 0,
+    "quota_errors": 0,
+    "parse_errors": 0,
+    "network_errors": 0,
+    "repaired_replies": 0
+}
+
+# Process-local counters for input compaction, exposed through /news/analyze/stats
+compaction_stats = {"requests": 0, "original_tokens": 0, "compacted_tokens": 0, "tokens_saved": 0}
+
+async def prepare_input(text: str) -> str:
+    """Compacts the text to INPUT_TOKEN_BUDGET (off the event loop) and records the savings."""
+    compaction = await extraction_service.run_in_parser(
+        text_compaction.compact_text, text, INPUT_TOKEN_BUDGET
+    )
+    compaction_stats["requests"] += 1
+    compaction_stats["original_tokens"] += compaction.original_tokens
+    compaction_stats["compacted_tokens"] += compaction.compacted_tokens
+    compaction_stats["tokens_saved"] += compaction.tokens_saved
+    print(f"Compacted input: {compaction.original_tokens} -> {compaction.compacted_tokens} tokens (saved {compaction.tokens_saved})")
+    return compaction.text
+
+async def analyze_text(text: str, force_refresh: bool = False) -> dict:
+    """
+    Analyzes the provided text with the configured model backend (Gemini by default).
+    The text is first compacted to the input token budget. Results are cached by
+    (prompt version, model, compacted input); force_refresh skips the cached copy
+    and replaces it. Calls go through the quota limiter and retry on failures,
+    honoring the delay the API reports on 429.
+    """
+    return await _analyze_prepared(await prepare_input(text), force_refresh)
+
+async def _analyze_prepared(input_text: str, force_refresh: bool) -> dict:
+    cache_key = analysis_cache.make_key(PROMPT_VERSION, MODEL_NAME, input_text)
+
+    if not force_refresh:
+        cached = await asyncio.to_thread(analysis_cache.get, cache_key)
+        if cached is not None:
+            print(f"Analysis cache hit ({cache_key[:12]})")
+            return cached
+
+    try:
+        analysis = await _generate_analysis(input_text)
+    except AnalysisError as e:
+        return {
+            "title": "Error de Conexión (IA Sobrecargada)",
+            "summary": f"No se pudo generar el análisis tras {MAX_RETRIES} intentos. Google reporta: {str(e)}",
+            "theme": "Error de Sistema",
+            "geography": "N/A",
+            "impact": "N/A",
+            "impact_score": None,
+            "keywords": []
+        }
+
+    await asyncio.to_thread(analysis_cache.put, cache_key, PROMPT_VERSION, MODEL_NAME, analysis)
+    return analysis
+
+async def _generate_analysis(input_text: str) -> dict:
+    """Calls Gemini with retries. Raises AnalysisError if every attempt failed."""
+    prompt = PROMPT_TEMPLATE.format(text=input_text)
+    estimated_tokens = estimate_tokens(prompt) + ESTIMATED_OUTPUT_TOKENS
+    schema = AnalysisOutput if STRUCTURED_OUTPUT else None
+    return await _call_model(prompt, estimated_tokens, _parse_object, f"text of {len(input_text)} characters", schema)
+
+def complete_analysis(entry) -> Optional[dict]:
+    """
+    Returns the analysis fields of a model reply, or None if it is unusable.
+    Only title and summary are required; missing or mistyped optional fields are
+    filled with neutral values, so a reply cut off near the end is still usable.
+    """
+    if not isinstance(entry, dict):
+        return None
+    analysis = {}
+    for field in ANALYSIS_FIELDS:
+        value = entry.get(field)
+        if field == "keywords":
+            if isinstance(value, str):
+                value = [keyword.strip() for keyword in value.split(",")]
+            analysis[field] = [str(keyword) for keyword in value if str(keyword).strip()] if isinstance(value, list) else []
+        elif field == "impact_score":
+            analysis[field] = _impact_score(value)
+        elif isinstance(value, str) and value.strip():
+            analysis[field] = value.strip()
+        elif field in REQUIRED_FIELDS:
+            return None
+        else:
+            analysis[field] = "N/A"
+    return analysis
+
+def _impact_score(value) -> Optional[int]:
+    """The reply's 1-5 impact score (numbers in strings accepted), or None."""
+    try:
+        score = round(float(value))
+    except (TypeError, ValueError, OverflowError):
+        return None
+    low, high = IMPACT_SCORE_RANGE
+    return score if low <= score <= high else None
+
+def _load_reply(text_response: str, open_char: str):
+    try:
+        value, repaired = json_repair.loads(text_response, open_char)
+    except json_repair.JSONRepairError as e:
+        raise ResponseFormatError(str(e)) from e
+    if repaired:
+        call_stats["repaired_replies"] += 1
+    return value
+
+def _parse_object(text_response: str) -> dict:
+    analysis = complete_analysis(_load_reply(text_response, "{"))
+    if analysis is None:
+        raise ResponseFormatError("Reply is missing the title or summary")
+    return analysis
+
+def _parse_array(text_response: str) -> list:
+    entries = _load_reply(text_response, "[")
+    if not isinstance(entries, list):
+        raise ResponseFormatError("Expected a JSON array")
+    return entries
+
+async def _call_model(prompt: str, estimated_tokens: int, parse, description: str, response_schema=None):
+    """
+    Sends a prompt through the quota limiter, with retries. `parse` turns the raw
+    reply into the result; a reply it cannot parse (even after repair) counts as a
+    failed attempt and is retried right away, since waiting does not fix formatting.
+    Raises AnalysisError if every attempt failed.
+    """
+    call_stats["calls"] += 1
+    for attempt in range(MAX_RETRIES):
+        call_stats["attempts"] += 1
+        if attempt:
+            call_stats["retries"] += 1
+        try:
+            async with limiter.acquire(estimated_tokens) as waited:
+                print(f"Analyzing {description} with {MODEL_NAME} after {waited:.1f}s in queue...")
+                response = await backend.generate(MODEL_NAME, prompt, response_schema)
+
+            await limiter.record_usage(estimated_tokens, response.total_tokens)
+
+            return parse(response.text)
+        except Exception as e:
+            print(f"Attempt {attempt + 1} failed for {MODEL_NAME}: {e}")
+            if isinstance(e, QuotaExceededError):
+                call_stats["quota_errors"] += 1
+            elif isinstance(e, ResponseFormatError):
+                call_stats["parse_errors"] += 1
+            else:
+                call_stats["network_errors"] += 1
+
+            if attempt == MAX_RETRIES - 1:
+                call_stats["failed"] += 1
+                raise AnalysisError(str(e)) from e
+            if isinstance(e, QuotaExceededError):
+                # The limiter holds every caller until the quota window reopens
+                await limiter.report_rate_limited(e.retry_after or DEFAULT_RATE_LIMIT_BACKOFF)
+            elif not isinstance(e, ResponseFormatError):
+                await asyncio.sleep(2 * (attempt + 1)) # Exponential backoff
+
+def _make_packs(item_ids: List[str], inputs: Dict[str, str]) -> List[List[str]]:
+    """Groups short texts greedily into packs bounded by item count and total characters."""
+    packs = []
+    current = []
+    current_chars = 0
+    for item_id in sorted(item_ids, key=lambda i: len(inputs[i])):
+        size = len(inputs[item_id])
+        if current and (len(current) >= PACK_MAX_ITEMS or current_chars + size > PACK_MAX_CHARS):
+            packs.append(current)
+            current, current_chars = [], 0
+        current.append(item_id)
+        current_chars += size
+    if current:
+        packs.append(current)
+    return packs
+
+async def _analyze_pack(pack: List[str], inputs: Dict[str, str]) -> Dict[str, dict]:
+    """One Gemini call for several articles. Returns only the entries that validated."""
+    articles = "\n\n".join(
+        f'<<<ARTICULO id="{item_id}">>>\n{inputs[item_id]}\n<<<FIN ARTICULO>>>'
+        for item_id in pack
+    )
+    prompt = PACKED_PROMPT_TEMPLATE.format(count=len(pack), articles=articles)
+    estimated_tokens = estimate_tokens(prompt) + ESTIMATED_OUTPUT_TOKENS * len(pack)
+
+    try:
+        entries = await _call_model(
+            prompt, estimated_tokens, _parse_array, f"pack of {len(pack)} texts",
+            List[PackedAnalysisOutput] if STRUCTURED_OUTPUT else None
+        )
+    except AnalysisError:
+        return {}
+
+    valid = {}
+    for entry in entries:
+        item_id = str(entry.get("id")) if isinstance(entry, dict) else None
+        analysis = complete_analysis(entry)
+        if item_id in pack and analysis is not None:
+            valid[item_id] = analysis
+    return valid
+
+async def analyze_many(texts: Dict[str, str], force_refresh: bool = False) -> Dict[str, dict]:
+    """
+    Analyzes several texts, keyed by item id. Cached texts are returned directly;
+    short texts are packed several per Gemini request (our binding limit is requests
+    per minute); long texts and any packed entry that is missing or invalid in the
+    reply fall back to one single-text call each.
+    """
+    prepared = await asyncio.gather(*(prepare_input(text) for text in texts.values()))
+    inputs = {str(item_id): input_text for item_id, input_text in zip(texts.keys(), prepared)}
+    results = {}
+
+    pending = []
+    for item_id, input_text in inputs.items():
+        cached = None
+        if not force_refresh:
+            cache_key = analysis_cache.make_key(PROMPT_VERSION, MODEL_NAME, input_text)
+            cached = await asyncio.to_thread(analysis_cache.get, cache_key)
+        if cached is not None:
+            results[item_id] = cached
+        else:
+            pending.append(item_id)
+
+    short_ids = [item_id for item_id in pending if len(inputs[item_id]) <= PACK_ITEM_MAX_CHARS]
+    single_ids = [item_id for item_id in pending if item_id not in short_ids]
+    packs = _make_packs(short_ids, inputs)
+    single_ids += [pack[0] for pack in packs if len(pack) == 1]
+    packs = [pack for pack in packs if len(pack) > 1]
+
+    async def run_pack(pack: List[str]):
+        packed = await _analyze_pack(pack, inputs)
+        for item_id, analysis in packed.items():
+            cache_key = analysis_cache.make_key(PROMPT_VERSION, MODEL_NAME, inputs[item_id])
+            await asyncio.to_thread(analysis_cache.put, cache_key, PROMPT_VERSION, MODEL_NAME, analysis)
+            results[item_id] = analysis
+
+        missing = [item_id for item_id in pack if item_id not in packed]
+        if missing:
+            print(f"Packed reply missing/invalid for {len(missing)} of {len(pack)} texts, retrying individually")
+        await asyncio.gather(*(run_single(item_id) for item_id in missing))
+
+    async def run_single(item_id: str):
+        results[item_id] = await _analyze_prepared(inputs[item_id], force_refresh)
+
+    await asyncio.gather(
+        *(run_pack(pack) for pack in packs),
+        *(run_single(item_id) for item_id in single_ids)
+    )
+    return results
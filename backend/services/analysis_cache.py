@@ -0,0 +1,109 @@
+import hashlib
+import os
+from typing import Optional
+
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from database import SessionLocal
+import models
+
+# Off for offline load tests, so every call reaches the model backend
+ENABLED = os.getenv("ANALYSIS_CACHE_ENABLED", "true").lower() != "false"
+
+# Process-local counters, exposed through /news/analyze/stats
+stats = {"hits": 0, "misses": 0, "stores": 0, "invalidated": 0, "errors": 0}
+
+
+def make_key(prompt_version: str, model_name: str, text: str) -> str:
+    """Key for an analysis: the exact prompt version, model and (already truncated) input."""
+    digest = hashlib.sha256()
+    for part in (prompt_version, model_name, text):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def get(key: str) -> Optional[dict]:
+    """
+    Returns the cached analysis for key, or None (also when the cache is
+    unavailable: the analysis then goes to the model). Blocking (DB).
+    """
+    if not ENABLED:
+        return None
+    db = SessionLocal()
+    try:
+        entry = db.query(models.AnalysisCache).filter(models.AnalysisCache.key == key).first()
+        if entry is None:
+            stats["misses"] += 1
+            return None
+
+        entry.hit_count = (entry.hit_count or 0) + 1
+        db.commit()
+        stats["hits"] += 1
+        return entry.result
+    except SQLAlchemyError as e:
+        db.rollback()
+        stats["errors"] += 1
+        print(f"Analysis cache read failed: {e}")
+        return None
+    finally:
+        db.close()
+
+
+def put(key: str, prompt_version: str, model_name: str, result: dict):
+    """Stores (or replaces, on forced refresh) an analysis. Errors are logged, not raised. Blocking (DB)."""
+    if not ENABLED:
+        return
+    db = SessionLocal()
+    try:
+        db.merge(models.AnalysisCache(
+            key=key,
+            prompt_version=prompt_version,
+            model_name=model_name,
+            result=result,
+            hit_count=0
+        ))
+        db.commit()
+        stats["stores"] += 1
+    except IntegrityError:
+        # Stored concurrently by another request
+        db.rollback()
+    except SQLAlchemyError as e:
+        db.rollback()
+        stats["errors"] += 1
+        print(f"Analysis cache write failed: {e}")
+    finally:
+        db.close()
+
+
+def invalidate(current_prompt_version: Optional[str] = None) -> int:
+    """
+    Deletes cached analyses. With current_prompt_version, only entries produced by
+    other prompt versions are removed (they can never be hit again); otherwise all.
+    """
+    db = SessionLocal()
+    try:
+        query = db.query(models.AnalysisCache)
+        if current_prompt_version is not None:
+            query = query.filter(models.AnalysisCache.prompt_version != current_prompt_version)
+        deleted = query.delete(synchronize_session=False)
+        db.commit()
+        stats["invalidated"] += deleted
+        return deleted
+    finally:
+        db.close()
+
+
+def cache_stats() -> dict:
+    db = SessionLocal()
+    try:
+        entries = db.query(models.AnalysisCache).count()
+    finally:
+        db.close()
+
+    lookups = stats["hits"] + stats["misses"]
+    return {
+        **stats,
+        "entries": entries,
+        "hit_rate": round(stats["hits"] / lookups, 3) if lookups else 0.0
+    }
@@ -0,0 +1,211 @@
+"""
+Extraction + AI analysis flow shared by /news/analyze and the background job worker.
+"""
+import asyncio
+import os
+from typing import Optional, List, Dict, Tuple, AsyncIterator
+
+from services import ai_service, extraction_service, duplicate_index, minhash
+
+OCR_REQUIRED = "OCR_REQUIRED"
+
+# Characters of processed text returned with the analysis preview
+PREVIEW_CHARS = 5000
+
+# Batch analysis limits: items per request and simultaneous downloads/parses
+BATCH_MAX_ITEMS = int(os.getenv("ANALYZE_BATCH_MAX_ITEMS", "100"))
+BATCH_EXTRACTION_CONCURRENCY = int(os.getenv("ANALYZE_BATCH_EXTRACTION_CONCURRENCY", "8"))
+
+
+class EmptyContentError(Exception):
+    """Raised when nothing could be extracted from the URL or file."""
+
+
+async def extract(url: Optional[str] = None, file_content: Optional[bytes] = None) -> str:
+    """
+    Processed text of the URL or PDF (OCR_REQUIRED for scanned PDFs). Raises
+    EmptyContentError when the download or parsing fails, so the failure is
+    reported instead of being sent to Gemini as if it were the article.
+    """
+    try:
+        if url:
+            text_content = await extraction_service.extract_from_url(url)
+        else:
+            text_content = await extraction_service.extract_from_pdf(file_content)
+    except extraction_service.ExtractionError as e:
+        raise EmptyContentError(str(e)) from e
+
+    if not text_content:
+        raise EmptyContentError("Could not extract text content")
+    return text_content
+
+
+def ocr_required_result(url: Optional[str]) -> dict:
+    return {
+        "title": "PDF No Procesable (Requiere OCR)",
+        "original_url": url if url else "Archivo PDF",
+        "status": "Identificado",
+        "classifications": {
+            "summary": "El documento parece ser un PDF escaneado o una imagen sin capa de texto. El sistema actual no soporta OCR (Reconocimiento Óptico de Caracteres).",
+            "theme": "Error de Formato",
+            "geography": "N/A",
+            "impact": "N/A",
+            "keywords": []
+        }
+    }
+
+
+async def find_duplicates(text_content: str) -> List[dict]:
+    """Existing news with nearly the same text (see duplicate_index). Never fails the analysis."""
+    if text_content == OCR_REQUIRED:
+        return []
+    try:
+        signature = await extraction_service.run_in_parser(minhash.signature, text_content)
+        return await asyncio.to_thread(duplicate_index.lookup, signature)
+    except Exception as e:
+        print(f"Duplicate lookup failed: {e}")
+        return []
+
+
+async def reuse_duplicate(duplicates: List[dict], refresh: bool) -> Optional[dict]:
+    """The stored analysis of a near-identical news item, so Gemini is not called again."""
+    if refresh or not duplicates or duplicates[0]["similarity"] < duplicate_index.DUPLICATE_REUSE_THRESHOLD:
+        return None
+    analysis = await asyncio.to_thread(duplicate_index.get_analysis, duplicates[0]["news_id"])
+    if analysis:
+        print(f"Reusing analysis of news {duplicates[0]['news_id']} (similarity {duplicates[0]['similarity']})")
+    return analysis
+
+
+def build_result(url: Optional[str], text_content: str, analysis: dict, duplicates: List[dict] = ()) -> dict:
+    """Structured data for the frontend preview (schemas.AnalysisResult fields)."""
+    return {
+        "title": analysis.get("title", "Sin título"),
+        "original_url": url if url else "Archivo PDF",
+        "status": "Identificado",
+        "classifications": {
+            "summary": analysis.get("summary", ""),
+            "theme": analysis.get("theme", ""),
+            "geography": analysis.get("geography", ""),
+            "impact": analysis.get("impact", ""),
+            "impact_score": analysis.get("impact_score"),
+            "keywords": analysis.get("keywords", []),
+            "content_processed": text_content[:PREVIEW_CHARS] # Return a snippet of processed text
+        },
+        "duplicates": list(duplicates)
+    }
+
+
+async def analyze(url: Optional[str], text_content: str, refresh: bool = False) -> dict:
+    if text_content == OCR_REQUIRED:
+        return ocr_required_result(url)
+
+    # Near-duplicates of stored news are reported, and a near-identical one skips the AI call
+    duplicates = await find_duplicates(text_content)
+    analysis = await reuse_duplicate(duplicates, refresh)
+    if analysis is None:
+        # Call Gemini AI (queued by the quota limiter)
+        analysis = await ai_service.analyze_text(text_content, force_refresh=refresh)
+    return build_result(url, text_content, analysis, duplicates)
+
+
+async def analyze_many(entries: Dict[str, Tuple[Optional[str], str]], refresh: bool = False) -> Dict[str, dict]:
+    """
+    Analyzes several extracted texts at once ({item_id: (url, text_content)}).
+    Near-identical copies of stored news reuse their analysis; the other short
+    texts are packed into shared Gemini requests by ai_service.analyze_many.
+    """
+    results = {}
+    candidates = {}
+    for item_id, (url, text_content) in entries.items():
+        if text_content == OCR_REQUIRED:
+            results[item_id] = ocr_required_result(url)
+        else:
+            candidates[item_id] = text_content
+
+    found = await asyncio.gather(*(find_duplicates(text_content) for text_content in candidates.values()))
+    duplicates = dict(zip(candidates.keys(), found))
+
+    texts = {}
+    for item_id, text_content in candidates.items():
+        analysis = await reuse_duplicate(duplicates[item_id], refresh)
+        if analysis is None:
+            texts[item_id] = text_content
+        else:
+            results[item_id] = build_result(entries[item_id][0], text_content, analysis, duplicates[item_id])
+
+    if texts:
+        analyses = await ai_service.analyze_many(texts, force_refresh=refresh)
+        for item_id, analysis in analyses.items():
+            url, text_content = entries[item_id]
+            results[item_id] = build_result(url, text_content, analysis, duplicates[item_id])
+    return results
+
+
+async def analyze_batch(items: List[dict], refresh: bool = False) -> AsyncIterator[dict]:
+    """
+    Analyzes many items concurrently and yields one row per item as soon as it
+    finishes. Items are {"item_id", "source", "url"} or {"item_id", "source",
+    "file_content"}; an item may carry a precomputed "error" instead.
+    Extraction runs BATCH_EXTRACTION_CONCURRENCY at a time. Short texts are
+    grouped (up to ai_service.PACK_MAX_ITEMS) so they share Gemini requests; long
+    ones go alone. The AI step is paced by the shared quota limiter. A failing
+    item yields an error row, never aborts the batch.
+    """
+    extraction_slots = asyncio.Semaphore(BATCH_EXTRACTION_CONCURRENCY)
+    rows = asyncio.Queue()
+    ready = {}
+    tasks = []
+
+    def row_for(item: dict, **fields) -> dict:
+        return {"item_id": item["item_id"], "source": item["source"], **fields}
+
+    async def analyze_group(group: Dict[str, dict]):
+        try:
+            results = await analyze_many(
+                {key: (item.get("url"), item["text_content"]) for key, item in group.items()},
+                refresh=refresh
+            )
+            for key, item in group.items():
+                await rows.put(row_for(item, ok=True, result=results[key]))
+        except Exception as e:
+            for item in group.values():
+                await rows.put(row_for(item, ok=False, error=str(e)))
+
+    def flush():
+        if ready:
+            tasks.append(asyncio.create_task(analyze_group(dict(ready))))
+            ready.clear()
+
+    async def extract_item(item: dict):
+        if item.get("error"):
+            await rows.put(row_for(item, ok=False, error=item["error"]))
+            return
+        try:
+            async with extraction_slots:
+                text_content = await extract(item.get("url"), item.get("file_content"))
+        except Exception as e:
+            await rows.put(row_for(item, ok=False, error=str(e)))
+            return
+
+        item = {**item, "text_content": text_content}
+        key = str(item["item_id"])
+        if text_content == OCR_REQUIRED or len(text_content) > ai_service.PACK_ITEM_MAX_CHARS:
+            tasks.append(asyncio.create_task(analyze_group({key: item})))
+        else:
+            ready[key] = item
+            if len(ready) >= ai_service.PACK_MAX_ITEMS:
+                flush()
+
+    async def extract_all():
+        await asyncio.gather(*(extract_item(item) for item in items))
+        flush() # last, partially filled pack
+
+    tasks.append(asyncio.create_task(extract_all()))
+    try:
+        for _ in range(len(items)):
+            yield await rows.get()
+    finally:
+        # Client went away (or generator closed early): stop pending work
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,70 @@
+"""
+Process-local cache of analytics results, invalidated by the writes that change them.
+
+Each cached result has a version counter in Postgres (cache_versions). Writes that
+change its inputs call bump() inside their own transaction, so the invalidation
+commits or rolls back with the write. A read is one primary-key range scan of the
+version: every API worker recomputes as soon as any of them commits a change,
+and otherwise serves its copy without touching the history tables.
+
+The counter is striped over VERSION_SHARDS rows and a bump increments a random
+one, so concurrent writers rarely wait on each other's row lock until commit;
+the version is the sum of the shards (it only grows, like a single counter).
+"""
+import random
+import threading
+from typing import Callable
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+import models
+
+# Cached results
+USER_STATS = "user_stats"
+# Active votes and their aggregates (no cached value here: contrast_analytics reads the version)
+COUNCIL_VOTES = "council_votes"
+
+VERSION_SHARDS = 16
+
+# Process-local counters
+stats = {"hits": 0, "misses": 0}
+
+_cache = {} # name -> (version, value)
+_lock = threading.Lock()
+
+
+def bump(db: Session, *names: str):
+    """Invalidates the named results. Joins the caller's transaction (no commit)."""
+    rows = sorted((name, random.randrange(VERSION_SHARDS)) for name in set(names)) # fixed lock order
+    statement = pg_insert(models.CacheVersion).values([
+        {"name": name, "shard": shard, "version": 1} for name, shard in rows
+    ])
+    db.execute(statement.on_conflict_do_update(
+        index_elements=[models.CacheVersion.name, models.CacheVersion.shard],
+        set_={"version": models.CacheVersion.version + 1}
+    ))
+
+
+def version(db: Session, name: str) -> int:
+    """Current version of name (0 until its first bump)."""
+    return int(db.query(func.sum(models.CacheVersion.version)).filter(models.CacheVersion.name == name).scalar() or 0)
+
+
+def get_or_compute(db: Session, name: str, compute: Callable[[Session], object]):
+    """The cached value of name if no write bumped it since; otherwise compute(db), cached."""
+    version_read = version(db, name)
+    with _lock:
+        cached = _cache.get(name)
+    if cached is not None and cached[0] == version_read:
+        stats["hits"] += 1
+        return cached[1]
+
+    # Tagged with the version read before computing: a write committed meanwhile
+    # bumps past it, so the next read recomputes instead of keeping a stale value
+    stats["misses"] += 1
+    value = compute(db)
+    with _lock:
+        _cache[name] = (version_read, value)
+    return value
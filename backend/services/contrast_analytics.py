@@ -0,0 +1,333 @@
+"""
+Contrast analysis (AI vs council): the AI's impact_score of a news item against
+the impact the council voted for it.
+
+Everything is held in NumPy columns and computed in vectorized form:
+- per news item (arrays indexed by news id, like the related-news index): AI
+  score, whether it was estimated, theme code and postulator;
+- per observation (a news item judged by a closed council, from the session
+  snapshots, or by the current board, from vote_aggregates): council impact and
+  relevance means and vote count.
+
+Refreshes are incremental: snapshots are append-only (only sessions after the
+last one loaded are read), news attributes are re-read only for news updated
+since the last refresh, and the current board (small) is re-read whole. A cheap
+state query decides whether anything changed at all; if not, the cached report
+is served as is.
+
+News analyzed before impact_score was part of the prompt only have the impact
+text; their score is a rough estimate from its wording (estimate_impact_score).
+Every figure of the report says how much of it rests on estimates: ai_estimated
+on each blind spot, estimated_count on each group.
+"""
+import re
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import func, cast, literal, Float
+from sqlalchemy.orm import Session
+
+import models
+from services import analytics_cache
+
+# A council impact mean from HIGH_IMPACT vs an AI score up to LOW_IMPACT (or the
+# reverse) is a blind spot
+HIGH_IMPACT = 3.5
+LOW_IMPACT = 2.5
+SCORE_SPAN = 4.0 # both scales are 1-5
+MAX_BLIND_SPOTS = 20
+# Themes/postulators with fewer judged news are left out: their means say nothing
+MIN_GROUP_SIZE = 5
+# News changes are re-read a little behind the last one seen (re-reading overwrites, so it is harmless)
+NEWS_WATERMARK_OVERLAP = timedelta(minutes=5)
+
+HIGH_MARKERS = re.compile(
+    r"\b(alt[oa]s?|significativ\w*|clave|estrat[ée]gic\w*|transforma\w*|crucial\w*|fundamental\w*|directo|directa|decisiv\w*|important\w*)\b",
+    re.IGNORECASE
+)
+LOW_MARKERS = re.compile(
+    r"\b(baj[oa]s?|limitad\w*|marginal\w*|indirect\w*|poc[oa]s?|escas\w*|menor|nul[oa]|irrelevante)\b",
+    re.IGNORECASE
+)
+
+
+def estimate_impact_score(impact_text: Optional[str]) -> float:
+    """
+    Rough 1-5 estimate from the wording of the impact analysis (NaN without one):
+    3, plus one per "high" marker and minus one per "low" marker, clipped.
+    """
+    if not impact_text or impact_text.strip().upper() in ("N/A", "NA", ""):
+        return np.nan
+    balance = len(HIGH_MARKERS.findall(impact_text)) - len(LOW_MARKERS.findall(impact_text))
+    return float(3 + np.clip(balance, -2, 2))
+
+
+class ContrastStore:
+    """Columnar copy of the data the contrast report needs, refreshed incrementally."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.ai_score = np.full(0, np.nan)
+        self.ai_estimated = np.zeros(0, dtype=bool)
+        self.theme = np.full(0, -1, dtype=np.int32)
+        self.postulator = np.full(0, -1, dtype=np.int64)
+        self.themes = [] # theme code -> name
+        self._theme_codes = {}
+
+        # Closed sessions (append-only) and current board (replaced on refresh)
+        self.session_obs = self._empty_observations()
+        self.board_obs = self._empty_observations()
+
+        self.last_session_id = 0
+        self.news_watermark: Optional[datetime] = None
+        self.state = None
+        self.report = None
+
+    @staticmethod
+    def _empty_observations() -> dict:
+        return {
+            "news_id": np.empty(0, dtype=np.int64),
+            "session_id": np.empty(0, dtype=np.int64),
+            "impact": np.empty(0),
+            "relevance": np.empty(0),
+            "votes": np.empty(0, dtype=np.int64)
+        }
+
+    def _grow(self, max_news_id: int):
+        size = len(self.ai_score)
+        if max_news_id < size:
+            return
+        extra = max(max_news_id + 1, size * 2, 1024) - size
+        self.ai_score = np.concatenate([self.ai_score, np.full(extra, np.nan)])
+        self.ai_estimated = np.concatenate([self.ai_estimated, np.zeros(extra, dtype=bool)])
+        self.theme = np.concatenate([self.theme, np.full(extra, -1, dtype=np.int32)])
+        self.postulator = np.concatenate([self.postulator, np.full(extra, -1, dtype=np.int64)])
+
+    def _theme_code(self, theme: Optional[str]) -> int:
+        theme = (theme or "").strip()
+        if not theme:
+            return -1
+        if theme not in self._theme_codes:
+            self._theme_codes[theme] = len(self.themes)
+            self.themes.append(theme)
+        return self._theme_codes[theme]
+
+    def _current_state(self, db: Session) -> tuple:
+        # Newest session, newest news change, and the write counter of the current
+        # board (bumped with every vote and aggregate change, see crud_votes)
+        return (
+            db.query(func.max(models.CouncilSession.id)).scalar() or 0,
+            db.query(func.max(models.News.updated_at)).scalar(),
+            analytics_cache.version(db, analytics_cache.COUNCIL_VOTES)
+        )
+
+    def _load_news(self, db: Session):
+        query = db.query(
+            models.News.id,
+            models.News.updated_at,
+            models.News.postulator_id,
+            models.News.classifications["impact_score"].as_string(),
+            models.News.classifications["impact"].as_string(),
+            models.News.classifications["theme"].as_string()
+        )
+        if self.news_watermark is not None:
+            query = query.filter(models.News.updated_at >= self.news_watermark - NEWS_WATERMARK_OVERLAP)
+        rows = query.all()
+        if not rows:
+            return
+
+        ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        self._grow(int(ids.max()))
+        scores = np.full(len(rows), np.nan)
+        estimated = np.zeros(len(rows), dtype=bool)
+        for position, (_, _, _, score, impact, _) in enumerate(rows):
+            try:
+                scores[position] = float(score)
+            except (TypeError, ValueError):
+                scores[position] = estimate_impact_score(impact)
+                estimated[position] = not np.isnan(scores[position])
+        self.ai_score[ids] = scores
+        self.ai_estimated[ids] = estimated
+        self.theme[ids] = [self._theme_code(row[5]) for row in rows]
+        self.postulator[ids] = [row[2] if row[2] is not None else -1 for row in rows]
+        updated = [row[1] for row in rows if row[1] is not None]
+        if updated:
+            self.news_watermark = max(updated + ([self.news_watermark] if self.news_watermark else []))
+
+    def _load_sessions(self, db: Session):
+        rows = db.query(
+            models.CouncilSessionItem.news_id,
+            models.CouncilSessionItem.session_id,
+            models.CouncilSessionItem.impact_mean,
+            models.CouncilSessionItem.relevance_mean,
+            models.CouncilSessionItem.vote_count
+        ).filter(
+            models.CouncilSessionItem.session_id > self.last_session_id,
+            models.CouncilSessionItem.vote_count > 0
+        ).all()
+        if rows:
+            new = self._observations(rows)
+            self.session_obs = {name: np.concatenate([self.session_obs[name], new[name]]) for name in new}
+            self.last_session_id = int(new["session_id"].max())
+
+    def _load_board(self, db: Session):
+        aggregate = models.VoteAggregate
+        count = func.nullif(aggregate.vote_count, 0)
+        rows = db.query(
+            aggregate.news_id,
+            literal(0), # session_id 0: current board
+            cast(aggregate.impact_sum, Float) / count,
+            cast(aggregate.relevance_sum, Float) / count,
+            aggregate.vote_count
+        ).filter(aggregate.vote_count > 0).all()
+        self.board_obs = self._observations(rows)
+
+    @staticmethod
+    def _observations(rows) -> dict:
+        columns = list(zip(*rows)) if rows else [()] * 5
+        return {
+            "news_id": np.array(columns[0], dtype=np.int64),
+            "session_id": np.array(columns[1], dtype=np.int64),
+            "impact": np.array(columns[2], dtype=float),
+            "relevance": np.array(columns[3], dtype=float),
+            "votes": np.array(columns[4], dtype=np.int64)
+        }
+
+    def refresh(self, db: Session) -> bool:
+        """Loads what changed since the last refresh. Returns False if nothing did."""
+        state = self._current_state(db)
+        if state == self.state and self.report is not None:
+            return False
+        self._load_news(db)
+        self._load_sessions(db)
+        self._load_board(db)
+        self.state = state
+        return True
+
+    def compute(self) -> dict:
+        """The contrast report over every observation with both an AI and a council score."""
+        observations = {
+            name: np.concatenate([self.session_obs[name], self.board_obs[name]]) for name in self.session_obs
+        }
+        news_ids = observations["news_id"]
+        self._grow(int(news_ids.max()) if len(news_ids) else 0)
+        ai = self.ai_score[news_ids]
+        council = observations["impact"]
+        usable = ~np.isnan(ai) & ~np.isnan(council)
+
+        news_ids, ai, council = news_ids[usable], ai[usable], council[usable]
+        sessions = observations["session_id"][usable]
+        relevance = observations["relevance"][usable]
+        votes = observations["votes"][usable]
+        estimated = self.ai_estimated[news_ids]
+        difference = council - ai # > 0: the council saw more impact than the AI
+        disagreement = np.abs(difference) / SCORE_SPAN
+
+        report = {
+            "observations": int(usable.sum()),
+            "without_ai_score": int((~usable & ~np.isnan(observations["impact"])).sum()),
+            "estimated_ai_scores": int(estimated.sum()),
+            "overall": self._summary(difference, disagreement, ai, council),
+            "ai_blind_spots": self._blind_spots(
+                (council >= HIGH_IMPACT) & (ai <= LOW_IMPACT), news_ids, sessions, ai, estimated, council, relevance, votes, difference
+            ),
+            "council_blind_spots": self._blind_spots(
+                (ai >= HIGH_IMPACT) & (council <= LOW_IMPACT), news_ids, sessions, ai, estimated, council, relevance, votes, difference
+            ),
+            "by_theme": self._by_group(self.theme[news_ids], difference, disagreement, ai, estimated, council),
+            "by_postulator": self._by_group(self.postulator[news_ids], difference, disagreement, ai, estimated, council)
+        }
+        for group in report["by_theme"]:
+            group["theme"] = self.themes[group.pop("key")]
+        for group in report["by_postulator"]:
+            group["user_id"] = group.pop("key")
+        return report
+
+    @staticmethod
+    def _summary(difference, disagreement, ai, council) -> dict:
+        if len(difference) == 0:
+            return {"mean_difference": None, "mean_disagreement": None, "correlation": None}
+        correlation = None
+        if len(difference) > 1 and ai.std() > 0 and council.std() > 0:
+            correlation = round(float(np.corrcoef(ai, council)[0, 1]), 3)
+        return {
+            "mean_difference": round(float(difference.mean()), 3),
+            "mean_disagreement": round(float(disagreement.mean()), 3),
+            "correlation": correlation
+        }
+
+    @staticmethod
+    def _blind_spots(mask, news_ids, sessions, ai, estimated, council, relevance, votes, difference) -> list:
+        positions = np.flatnonzero(mask)
+        positions = positions[np.argsort(-np.abs(difference[positions]), kind="stable")][:MAX_BLIND_SPOTS]
+        return [
+            {
+                "news_id": int(news_ids[i]),
+                "session_id": int(sessions[i]) or None, # None: current board
+                "ai_impact": float(ai[i]),
+                "ai_estimated": bool(estimated[i]), # guessed from the impact text, see estimate_impact_score
+                "council_impact": round(float(council[i]), 2),
+                "council_relevance": round(float(relevance[i]), 2),
+                "votes": int(votes[i]),
+                "difference": round(float(difference[i]), 2)
+            }
+            for i in positions
+        ]
+
+    @staticmethod
+    def _by_group(keys, difference, disagreement, ai, estimated, council) -> list:
+        """
+        Per key (>= 0) with at least MIN_GROUP_SIZE observations: count (and how many
+        have an estimated AI score), mean AI and council scores, mean signed
+        difference and disagreement.
+        """
+        known = keys >= 0
+        if not known.any():
+            return []
+        groups, codes = np.unique(keys[known], return_inverse=True)
+        counts = np.bincount(codes)
+        estimated_counts = np.bincount(codes, weights=estimated[known].astype(float))
+        sums = {
+            name: np.bincount(codes, weights=values[known])
+            for name, values in (("difference", difference), ("disagreement", disagreement), ("ai", ai), ("council", council))
+        }
+        order = np.argsort(-sums["disagreement"] / counts, kind="stable")
+        return [
+            {
+                "key": int(groups[i]),
+                "count": int(counts[i]),
+                "estimated_count": int(estimated_counts[i]),
+                "mean_ai_impact": round(float(sums["ai"][i] / counts[i]), 2),
+                "mean_council_impact": round(float(sums["council"][i] / counts[i]), 2),
+                "mean_difference": round(float(sums["difference"][i] / counts[i]), 3),
+                "mean_disagreement": round(float(sums["disagreement"][i] / counts[i]), 3)
+            }
+            for i in order if counts[i] >= MIN_GROUP_SIZE
+        ]
+
+    def get_report(self, db: Session) -> dict:
+        """The cached report, refreshed first if the data changed."""
+        with self._lock:
+            if self.refresh(db) or self.report is None:
+                self.report = self.compute()
+            return self.report
+
+
+store = ContrastStore()
+
+
+def report(db: Session) -> dict:
+    """Contrast report with titles and postulator names added to its entries. Blocking (DB)."""
+    result = store.get_report(db)
+    news_ids = {spot["news_id"] for key in ("ai_blind_spots", "council_blind_spots") for spot in result[key]}
+    user_ids = {group["user_id"] for group in result["by_postulator"]}
+    titles = dict(db.query(models.News.id, models.News.title).filter(models.News.id.in_(news_ids)).all()) if news_ids else {}
+    names = dict(db.query(models.User.id, models.User.name).filter(models.User.id.in_(user_ids)).all()) if user_ids else {}
+    return {
+        **result,
+        "ai_blind_spots": [{**spot, "title": titles.get(spot["news_id"])} for spot in result["ai_blind_spots"]],
+        "council_blind_spots": [{**spot, "title": titles.get(spot["news_id"])} for spot in result["council_blind_spots"]],
+        "by_postulator": [{**group, "name": names.get(group["user_id"])} for group in result["by_postulator"]]
+    }
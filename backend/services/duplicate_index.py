@@ -0,0 +1,122 @@
+"""
+Near-duplicate detection over News.content_processed.
+
+Every stored news item gets a MinHash signature (news_signatures) and one LSH
+bucket row per band (news_lsh_bands). A lookup only reads the news that share a
+bucket with the new text, through the (band, bucket) primary key, and ranks
+them by estimated similarity, so its cost does not grow with the archive.
+"""
+import os
+from typing import List, Optional
+
+from sqlalchemy import tuple_, func
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+import models
+from services import minhash
+
+# Estimated Jaccard similarity from which a news item is reported as a duplicate
+DUPLICATE_THRESHOLD = float(os.getenv("DUPLICATE_THRESHOLD", "0.6"))
+# Similarity from which /news/analyze reuses the existing analysis instead of calling Gemini
+DUPLICATE_REUSE_THRESHOLD = float(os.getenv("DUPLICATE_REUSE_THRESHOLD", "0.9"))
+MAX_MATCHES = 5
+BACKFILL_BATCH = 500
+
+
+def index_news(db: Session, news_id: int, text: Optional[str], signature: Optional[bytes] = None):
+    """Stores (or replaces) the signature and band rows of a news item. Joins the caller's transaction (no commit)."""
+    signature = signature if signature is not None else minhash.signature(text or "")
+    db.query(models.NewsLSHBand).filter(models.NewsLSHBand.news_id == news_id).delete(synchronize_session=False)
+    db.merge(models.NewsSignature(news_id=news_id, minhash=signature))
+    if signature is not None:
+        db.add_all([
+            models.NewsLSHBand(band=band, bucket=bucket, news_id=news_id)
+            for band, bucket in enumerate(minhash.band_keys(signature))
+        ])
+
+
+def find_duplicates(db: Session, signature: Optional[bytes]) -> List[dict]:
+    """
+    News whose text is similar to the signature, best first:
+    [{"news_id", "title", "status", "similarity"}].
+    """
+    if signature is None:
+        return []
+
+    keys = list(enumerate(minhash.band_keys(signature)))
+    candidate_ids = db.query(models.NewsLSHBand.news_id).filter(
+        tuple_(models.NewsLSHBand.band, models.NewsLSHBand.bucket).in_(keys)
+    ).distinct().subquery()
+
+    rows = db.query(
+        models.NewsSignature.news_id, models.NewsSignature.minhash, models.News.title, models.News.status
+    ).join(
+        models.News, models.News.id == models.NewsSignature.news_id
+    ).filter(models.NewsSignature.news_id.in_(candidate_ids)).all()
+
+    matches = []
+    for news_id, stored, title, status in rows:
+        score = minhash.similarity(signature, stored)
+        if score >= DUPLICATE_THRESHOLD:
+            matches.append({"news_id": news_id, "title": title, "status": status, "similarity": round(score, 3)})
+    matches.sort(key=lambda match: match["similarity"], reverse=True)
+    return matches[:MAX_MATCHES]
+
+
+def lookup(signature: Optional[bytes]) -> List[dict]:
+    """find_duplicates with its own session. Blocking (DB)."""
+    db = SessionLocal()
+    try:
+        return find_duplicates(db, signature)
+    finally:
+        db.close()
+
+
+def get_analysis(news_id: int) -> Optional[dict]:
+    """The stored analysis of a news item, in the shape ai_service returns. Blocking (DB)."""
+    db = SessionLocal()
+    try:
+        news = db.query(models.News).filter(models.News.id == news_id).first()
+        if news is None:
+            return None
+        classifications = news.classifications or {}
+        return {
+            "title": news.title,
+            "summary": news.summary or classifications.get("summary", ""),
+            "theme": classifications.get("theme", ""),
+            "geography": classifications.get("geography", ""),
+            "impact": classifications.get("impact", ""),
+            "impact_score": classifications.get("impact_score"),
+            "keywords": classifications.get("keywords", [])
+        }
+    finally:
+        db.close()
+
+
+def backfill() -> int:
+    """Indexes news created before the index existed (or whose indexing failed). Blocking (DB)."""
+    indexed = 0
+    db = SessionLocal()
+    try:
+        while True:
+            batch = db.query(models.News.id, models.News.content_processed).outerjoin(
+                models.NewsSignature, models.NewsSignature.news_id == models.News.id
+            ).filter(models.NewsSignature.news_id.is_(None)).order_by(models.News.id).limit(BACKFILL_BATCH).all()
+            if not batch:
+                return indexed
+            for news_id, content in batch:
+                index_news(db, news_id, content)
+            db.commit()
+            indexed += len(batch)
+    finally:
+        db.close()
+
+
+def index_stats() -> dict:
+    db = SessionLocal()
+    try:
+        indexed = db.query(func.count(models.NewsSignature.news_id)).scalar()
+    finally:
+        db.close()
+    return {"indexed": indexed, "threshold": DUPLICATE_THRESHOLD, "reuse_threshold": DUPLICATE_REUSE_THRESHOLD}
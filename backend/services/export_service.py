@@ -0,0 +1,325 @@
+"""
+Bulk export of news, votes and products to CSV, XLSX or Parquet.
+
+Rows are read with one plain SELECT (no ORM objects, no relationships) through a
+server-side cursor (yield_per), EXPORT_BATCH rows at a time, and each batch is
+encoded and handed out before the next one is fetched, so memory stays flat
+whatever the number of rows:
+- CSV: each batch is written and yielded as a chunk;
+- Parquet: each batch is a row group, yielded as soon as pyarrow writes it;
+- XLSX: openpyxl's write-only workbook keeps its rows in a temporary file; the
+  finished file is then streamed from disk (a zip cannot be sent until it is closed).
+
+openpyxl and pyarrow are only imported for their format, so CSV works without them.
+Used by GET /export/{dataset} and by export_data.py (CLI).
+"""
+import csv
+import io
+import json
+import os
+import tempfile
+from datetime import date
+from typing import Iterator, Optional
+
+from sqlalchemy import select, func, exists
+from sqlalchemy.orm import aliased
+
+from database import SessionLocal
+import models
+import crud_votes
+
+EXPORT_BATCH = int(os.getenv("EXPORT_BATCH_SIZE", "2000"))
+FILE_CHUNK = 1024 * 1024
+XLSX_MAX_ROWS = 1_048_575 # per sheet, below the header; more rows continue on a new sheet
+
+FORMATS = {
+    "csv": {"media_type": "text/csv; charset=utf-8", "module": None},
+    "xlsx": {"media_type": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "module": "openpyxl"},
+    "parquet": {"media_type": "application/vnd.apache.parquet", "module": "pyarrow"},
+}
+
+
+class ExportFormatUnavailable(Exception):
+    """Raised when the library a format needs is not installed."""
+
+
+def check_format(export_format: str):
+    """Raises ExportFormatUnavailable if the format's library is missing (call before streaming)."""
+    module = FORMATS[export_format]["module"]
+    if module is None:
+        return
+    try:
+        __import__(module)
+    except ImportError:
+        raise ExportFormatUnavailable(f"{export_format} export needs {module} (pip install {module})")
+
+
+# Column types, for conversion and the Parquet schema
+INT, FLOAT, STR, BOOL, DATE, DATETIME, LIST = "int", "float", "str", "bool", "date", "datetime", "list"
+
+
+def _news_columns():
+    news = models.News
+    postulator = aliased(models.User)
+    classifications = news.classifications
+    assignees = select(func.string_agg(models.User.name, "; ")).select_from(models.news_assignments).join(
+        models.User, models.User.id == models.news_assignments.c.user_id
+    ).where(models.news_assignments.c.news_id == news.id).scalar_subquery()
+    votes = crud_votes.vote_aggregate_columns()
+
+    columns = [
+        ("id", news.id, INT),
+        ("title", news.title, STR),
+        ("summary", news.summary, STR),
+        ("original_url", news.original_url, STR),
+        ("detection_date", news.detection_date, DATE),
+        ("status", news.status, STR),
+        ("category", news.category, STR),
+        ("theme", classifications["theme"].as_string(), STR),
+        ("geography", classifications["geography"].as_string(), STR),
+        ("impact", classifications["impact"].as_string(), STR),
+        ("impact_score", classifications["impact_score"].as_string(), INT),
+        ("keywords", classifications["keywords"], LIST),
+        ("in_council", news.in_council, BOOL),
+        ("is_prioritized", news.is_prioritized, BOOL),
+        ("editorial_focus", news.editorial_focus, STR),
+        ("postulator", postulator.name, STR),
+        ("assignees", assignees, STR),
+        ("vote_count", votes["vote_count"], INT),
+        ("impact_mean", votes["impact_mean"], FLOAT),
+        ("relevance_mean", votes["relevance_mean"], FLOAT),
+        ("updated_at", news.updated_at, DATETIME),
+    ]
+    statement = select(*[column for _, column, _ in columns]).select_from(news).outerjoin(
+        postulator, postulator.id == news.postulator_id
+    ).outerjoin(models.VoteAggregate, models.VoteAggregate.news_id == news.id)
+    return columns, statement
+
+
+def _vote_columns():
+    vote = models.Vote
+    columns = [
+        ("id", vote.id, INT),
+        ("news_id", vote.news_id, INT),
+        ("news_title", models.News.title, STR),
+        ("detection_date", models.News.detection_date, DATE),
+        ("news_status", models.News.status, STR),
+        ("user_id", vote.user_id, INT),
+        ("user_name", models.User.name, STR),
+        ("impact_score", vote.impact_score, INT),
+        ("relevance_score", vote.relevance_score, INT),
+        ("category_suggestion", vote.category_suggestion, STR),
+        ("is_active", vote.is_active, BOOL),
+        ("session_id", vote.session_id, INT),
+    ]
+    statement = select(*[column for _, column, _ in columns]).select_from(vote).join(
+        models.News, models.News.id == vote.news_id
+    ).outerjoin(models.User, models.User.id == vote.user_id)
+    return columns, statement
+
+
+def _product_columns():
+    product = models.Product
+    columns = [
+        ("id", product.id, INT),
+        ("news_id", product.news_id, INT),
+        ("news_title", models.News.title, STR),
+        ("news_status", models.News.status, STR),
+        ("user_id", product.user_id, INT),
+        ("user_name", models.User.name, STR),
+        ("product_type", product.product_type, STR),
+        ("name", product.name, STR),
+        ("description", product.description, STR),
+        ("url", product.url, STR),
+        ("file_path", product.file_path, STR),
+        ("created_at", product.created_at, DATE),
+    ]
+    statement = select(*[column for _, column, _ in columns]).select_from(product).join(
+        models.News, models.News.id == product.news_id
+    ).outerjoin(models.User, models.User.id == product.user_id)
+    return columns, statement
+
+
+# dataset -> (columns and statement, sort key, date filtered on)
+DATASETS = {
+    "news": (_news_columns, models.News.id, models.News.detection_date),
+    "votes": (_vote_columns, models.Vote.id, models.News.detection_date),
+    "products": (_product_columns, models.Product.id, models.Product.created_at),
+}
+
+
+def _filtered(dataset: str, statement, start: Optional[date], end: Optional[date], status: Optional[str],
+              session_id: Optional[int], include_archived: bool):
+    _, order, date_column = DATASETS[dataset]
+    if start:
+        statement = statement.where(date_column >= start)
+    if end:
+        statement = statement.where(date_column <= end)
+    if not include_archived:
+        statement = statement.where(models.News.status != models.NewsStatus.ARCHIVED.value)
+    if status:
+        statement = statement.where(models.News.status == status)
+    if session_id is not None:
+        if dataset == "votes":
+            statement = statement.where(models.Vote.session_id == session_id)
+        else:
+            # News on the board of that council (its snapshot), and their products
+            statement = statement.where(exists().where(
+                models.CouncilSessionItem.session_id == session_id,
+                models.CouncilSessionItem.news_id == models.News.id
+            ))
+    return statement.order_by(order)
+
+
+def _convert(value, kind: str):
+    if value is None:
+        return None
+    if kind == LIST:
+        return "; ".join(str(item) for item in value) if isinstance(value, list) else str(value)
+    if kind == INT and not isinstance(value, int):
+        try:
+            return int(float(value)) # e.g. impact_score read from JSON as text
+        except (TypeError, ValueError):
+            return None
+    if kind == FLOAT:
+        return float(value)
+    if kind == STR and not isinstance(value, str):
+        return json.dumps(value, ensure_ascii=False) if isinstance(value, (dict, list)) else str(value)
+    return value
+
+
+def _batches(dataset: str, **filters) -> Iterator[tuple]:
+    """Yields (column names, column types) and then lists of converted rows, EXPORT_BATCH at a time."""
+    columns, statement = DATASETS[dataset][0]()
+    names = [name for name, _, _ in columns]
+    kinds = [kind for _, _, kind in columns]
+    yield names, kinds
+
+    db = SessionLocal()
+    try:
+        # yield_per: server-side cursor, only one batch of rows in memory at a time
+        result = db.execute(_filtered(dataset, statement, **filters).execution_options(yield_per=EXPORT_BATCH))
+        for partition in result.partitions():
+            yield [[_convert(value, kind) for value, kind in zip(row, kinds)] for row in partition]
+    finally:
+        db.close()
+
+
+def _csv(batches) -> Iterator[bytes]:
+    names, _ = next(batches)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("\ufeff") # BOM, so Excel reads the accents as UTF-8
+    writer.writerow(names)
+    for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _Drain(io.RawIOBase):
+    """Write-only file that hands out what was written since the last take()."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _parquet(batches) -> Iterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {INT: pa.int64(), FLOAT: pa.float64(), STR: pa.string(), LIST: pa.string(), BOOL: pa.bool_(),
+             DATE: pa.date32(), DATETIME: pa.timestamp("us")}
+    names, kinds = next(batches)
+    schema = pa.schema([(name, types[kind]) for name, kind in zip(names, kinds)])
+    sink = _Drain()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        for rows in batches:
+            arrays = [pa.array(column, type=field.type) for column, field in zip(zip(*rows), schema)]
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+            yield sink.take()
+    finally:
+        writer.close()
+    yield sink.take()
+
+
+def _xlsx(batches, sheet_name: str) -> Iterator[bytes]:
+    from openpyxl import Workbook
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+    names, kinds = next(batches)
+    workbook = Workbook(write_only=True)
+    sheets = 0
+    sheet = None
+    sheet_rows = XLSX_MAX_ROWS
+
+    for rows in batches:
+        for row in rows:
+            if sheet_rows >= XLSX_MAX_ROWS:
+                sheets += 1
+                sheet = workbook.create_sheet(sheet_name if sheets == 1 else f"{sheet_name} {sheets}")
+                sheet.append(names)
+                sheet_rows = 0
+            # Control characters (pasted from PDFs) are not allowed in the sheet XML
+            sheet.append([ILLEGAL_CHARACTERS_RE.sub("", value) if isinstance(value, str) else value for value in row])
+            sheet_rows += 1
+    if sheet is None:
+        workbook.create_sheet(sheet_name).append(names)
+
+    with tempfile.TemporaryFile() as output:
+        workbook.save(output)
+        output.seek(0)
+        while True:
+            chunk = output.read(FILE_CHUNK)
+            if not chunk:
+                break
+            yield chunk
+
+
+def stream(
+    dataset: str,
+    export_format: str = "csv",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    status: Optional[str] = None,
+    session_id: Optional[int] = None,
+    include_archived: bool = False
+) -> Iterator[bytes]:
+    """
+    Yields the export file in chunks. Opens its own session (it outlives the
+    request's). start/end filter on the detection date of the news item (creation
+    date for products); status on the news status (archived news are left out
+    unless include_archived); session_id on the council session (votes cast in it,
+    or the news on its board and their products). Rows are ordered by id. Blocking (DB).
+    """
+    if dataset not in DATASETS:
+        raise ValueError(f"Unknown dataset {dataset}")
+    batches = _batches(dataset, start=start, end=end, status=status, session_id=session_id, include_archived=include_archived)
+    if export_format == "csv":
+        return _csv(batches)
+    if export_format == "parquet":
+        return _parquet(batches)
+    if export_format == "xlsx":
+        return _xlsx(batches, dataset)
+    raise ValueError(f"Unknown format {export_format}")
@@ -0,0 +1,152 @@
+import hashlib
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from database import SessionLocal
+import models
+
+CACHE_TTL = timedelta(hours=int(os.getenv("EXTRACTION_CACHE_TTL_HOURS", "168")))
+CACHE_MAX_ENTRIES = int(os.getenv("EXTRACTION_CACHE_MAX_ENTRIES", "5000"))
+
+# Query parameters that only identify the campaign/click, never the content
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "igshid", "mc_cid", "mc_eid",
+    "_ga", "_gl", "ref", "ref_src", "cmpid", "ocid", "smid", "spm"
+}
+TRACKING_PREFIXES = ("utm_",)
+
+# Process-local counters, exposed through /news/analyze/stats
+stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "errors": 0}
+
+
+def normalize_url(url: str) -> str:
+    """
+    Canonical form of a URL for cache keys: lowercase scheme/host, no default port,
+    no fragment, tracking parameters removed and remaining parameters sorted.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    try:
+        host = (parts.hostname or "").lower()
+        if ":" in host:
+            host = f"[{host}]" # IPv6 literal: hostname comes without its brackets
+        port = parts.port
+        if port and not ((scheme == "http" and port == 80) or (scheme == "https" and port == 443)):
+            host = f"{host}:{port}"
+    except ValueError:
+        # Malformed port: keep the authority as given
+        host = parts.netloc.lower()
+
+    query = [
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if name.lower() not in TRACKING_PARAMS and not name.lower().startswith(TRACKING_PREFIXES)
+    ]
+    query.sort()
+
+    return urlunsplit((scheme, host, parts.path or "/", urlencode(query), ""))
+
+
+def url_key(url: str) -> str:
+    return f"url:{normalize_url(url)}"
+
+
+def pdf_key(file_content: bytes) -> str:
+    return f"pdf:{hashlib.sha256(file_content).hexdigest()}"
+
+
+def get(key: str) -> Optional[str]:
+    """
+    Returns the cached text for key, or None if missing, expired or the cache is
+    unavailable (a cache outage must not fail extraction). Blocking (DB).
+    """
+    db = SessionLocal()
+    try:
+        entry = db.query(models.ExtractionCache).filter(models.ExtractionCache.key == key).first()
+        now = datetime.utcnow()
+
+        if entry is None or entry.created_at < now - CACHE_TTL:
+            if entry is not None:
+                db.delete(entry)
+                db.commit()
+            stats["misses"] += 1
+            return None
+
+        entry.last_accessed_at = now
+        entry.hit_count = (entry.hit_count or 0) + 1
+        db.commit()
+        stats["hits"] += 1
+        return entry.content
+    except SQLAlchemyError as e:
+        db.rollback()
+        stats["errors"] += 1
+        print(f"Extraction cache read failed: {e}")
+        return None
+    finally:
+        db.close()
+
+
+def put(key: str, source: str, content: str):
+    """
+    Stores extracted text and evicts expired / least recently used entries. Errors
+    are logged, not raised: the text was extracted either way. Blocking (DB).
+    """
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        db.merge(models.ExtractionCache(
+            key=key,
+            source=source,
+            content=content,
+            created_at=now,
+            last_accessed_at=now,
+            hit_count=0
+        ))
+        db.commit()
+        stats["stores"] += 1
+        _evict(db, now)
+    except IntegrityError:
+        # Another request stored the same key concurrently; either copy is fine
+        db.rollback()
+    except SQLAlchemyError as e:
+        db.rollback()
+        stats["errors"] += 1
+        print(f"Extraction cache write failed: {e}")
+    finally:
+        db.close()
+
+
+def _evict(db, now: datetime):
+    evicted = db.query(models.ExtractionCache).filter(
+        models.ExtractionCache.created_at < now - CACHE_TTL
+    ).delete(synchronize_session=False)
+
+    overflow = db.query(models.ExtractionCache.key).order_by(
+        models.ExtractionCache.last_accessed_at.desc()
+    ).offset(CACHE_MAX_ENTRIES).subquery()
+    evicted += db.query(models.ExtractionCache).filter(
+        models.ExtractionCache.key.in_(db.query(overflow.c.key))
+    ).delete(synchronize_session=False)
+
+    db.commit()
+    stats["evictions"] += evicted
+
+
+def cache_stats() -> dict:
+    db = SessionLocal()
+    try:
+        entries = db.query(models.ExtractionCache).count()
+    finally:
+        db.close()
+
+    lookups = stats["hits"] + stats["misses"]
+    return {
+        **stats,
+        "entries": entries,
+        "max_entries": CACHE_MAX_ENTRIES,
+        "ttl_hours": CACHE_TTL.total_seconds() / 3600,
+        "hit_rate": round(stats["hits"] / lookups, 3) if lookups else 0.0
+    }
@@ -1,92 +1,245 @@
-import requests
-from pypdf import PdfReader
-from io import BytesIO
-import trafilatura
-from bs4 import BeautifulSoup
+import asyncio
+import multiprocessing
+import os
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Tuple
 
-def extract_from_url(url: str) -> str:
+import httpx
+
+from services import parsing_workers, extraction_cache
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+# Maximum characters of extracted text. Generous on purpose: ai_service compacts it
+# to the prompt token budget, so conclusions of long reports are not cut off here.
+MAX_TEXT_CHARS = int(os.getenv("EXTRACTION_MAX_TEXT_CHARS", "60000"))
+
+# Download limits for the shared HTTP client
+MAX_DOWNLOAD_BYTES = int(os.getenv("EXTRACTION_MAX_DOWNLOAD_BYTES", 15 * 1024 * 1024))
+FETCH_TIMEOUT = httpx.Timeout(
+    float(os.getenv("EXTRACTION_FETCH_TIMEOUT", "15")),
+    connect=5.0
+)
+FETCH_LIMITS = httpx.Limits(
+    max_connections=int(os.getenv("EXTRACTION_MAX_CONNECTIONS", "20")),
+    max_keepalive_connections=10
+)
+
+# Parser process pool: HTML/PDF parsing is CPU-bound and must not run in the API process
+PARSER_WORKERS = int(os.getenv("EXTRACTION_PARSER_WORKERS", max(1, min(4, (os.cpu_count() or 2) - 1))))
+PARSER_MAX_TASKS_PER_CHILD = int(os.getenv("EXTRACTION_PARSER_MAX_TASKS_PER_CHILD", "100"))
+PARSER_MEMORY_LIMIT_MB = int(os.getenv("EXTRACTION_PARSER_MEMORY_MB", "1024"))
+PDF_MAX_PAGES = int(os.getenv("EXTRACTION_PDF_MAX_PAGES", "300"))
+# Pages per parser task: at least this many, and at most two tasks per worker, so a
+# long PDF is opened a handful of times and extraction still stops near the budget
+PDF_PAGES_PER_TASK = 8
+
+_parser_pool: Optional[ProcessPoolExecutor] = None
+
+# Shared, pooled client. Created lazily so it binds to the running event loop.
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+class FetchError(Exception):
+    """Raised when a URL cannot be downloaded within the configured limits."""
+
+
+class ExtractionError(Exception):
+    """Raised when no text could be extracted from a URL or PDF (download or parse failure)."""
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=FETCH_TIMEOUT,
+            limits=FETCH_LIMITS,
+            follow_redirects=True,
+            headers={'User-Agent': USER_AGENT}
+        )
+    return _http_client
+
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+def get_parser_pool() -> ProcessPoolExecutor:
+    global _parser_pool
+    if _parser_pool is None:
+        # spawn: never fork the API process (event loop, DB connections, HTTP pool)
+        _parser_pool = ProcessPoolExecutor(
+            max_workers=PARSER_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=parsing_workers.limit_worker_memory,
+            initargs=(PARSER_MEMORY_LIMIT_MB * 1024 * 1024,),
+            max_tasks_per_child=PARSER_MAX_TASKS_PER_CHILD
+        )
+    return _parser_pool
+
+
+def shutdown_parser_pool():
+    global _parser_pool
+    if _parser_pool is not None:
+        _parser_pool.shutdown(wait=False, cancel_futures=True)
+        _parser_pool = None
+
+
+async def run_in_parser(func, *args):
+    """Runs a parsing_workers function in the process pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(get_parser_pool(), func, *args)
+    except BrokenProcessPool:
+        # A worker died (usually the memory cap). Recreate the pool for the next request.
+        print("Parser pool broken (worker exceeded limits?), recreating it")
+        shutdown_parser_pool()
+        raise
+
+
+async def fetch_url(url: str) -> Tuple[bytes, str]:
     """
-    Extracts the main content from a URL using trafilatura (specialized for articles).
-    Falls back to BeautifulSoup if trafilatura fails.
+    Downloads a URL once through the shared client.
+    Returns the raw body and the lowercased Content-Type. Aborts as soon as the
+    body exceeds MAX_DOWNLOAD_BYTES instead of buffering the whole response.
     """
-    try:
-        # Method 1: Use trafilatura (best for news articles)
-        downloaded = trafilatura.fetch_url(url)
-        if downloaded:
-            # Extract main content, ignoring navigation, ads, scripts
-            content = trafilatura.extract(
-                downloaded,
-                include_comments=False,
-                include_tables=True,
-                no_fallback=False,
-                favor_recall=True  # Prefer getting more content
-            )
-            if content and len(content) > 100:
-                return content[:20000]
-        
-        # Method 2: Fallback to requests + BeautifulSoup
-        print(f"Trafilatura failed for {url}, trying BeautifulSoup...")
-        response = requests.get(url, timeout=15, headers={
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        })
+    client = get_http_client()
+    async with client.stream("GET", url) as response:
         response.raise_for_status()
-        
+
+        declared_length = response.headers.get("Content-Length")
+        if declared_length and declared_length.isdigit() and int(declared_length) > MAX_DOWNLOAD_BYTES:
+            raise FetchError(f"Content too large ({declared_length} bytes)")
+
+        chunks = []
+        size = 0
+        async for chunk in response.aiter_bytes():
+            size += len(chunk)
+            if size > MAX_DOWNLOAD_BYTES:
+                raise FetchError(f"Content exceeds {MAX_DOWNLOAD_BYTES} bytes")
+            chunks.append(chunk)
+
         content_type = response.headers.get('Content-Type', '').lower()
-        
+        return b"".join(chunks), content_type
+
+
+async def extract_from_url(url: str) -> str:
+    """
+    Downloads the URL once (non-blocking, pooled client) and extracts its main content.
+    Parsing runs in the parser process pool so the API process keeps serving requests.
+    Results are cached by canonical URL, so repeated submissions skip network and parser.
+    Raises ExtractionError if the page cannot be downloaded or has no usable content.
+    """
+    try:
+        key = extraction_cache.url_key(url)
+        cached = await asyncio.to_thread(extraction_cache.get, key)
+        if cached is not None:
+            return cached
+
+        body, content_type = await fetch_url(url)
+
         # Handle PDF URL
-        if 'application/pdf' in content_type or url.endswith('.pdf'):
-            return extract_from_pdf(response.content)
-        
-        # Parse HTML with BeautifulSoup
-        soup = BeautifulSoup(response.text, 'lxml')
-        
-        # Remove unwanted elements
-        for tag in soup(['script', 'style', 'nav', 'header', 'footer', 'aside', 
-                         'iframe', 'noscript', 'form', 'button', 'input']):
-            tag.decompose()
-        
-        # Try to find main content areas
-        main_content = None
-        for selector in ['article', 'main', '[role="main"]', '.post-content', 
-                         '.entry-content', '.article-body', '.content']:
-            main_content = soup.select_one(selector)
-            if main_content:
-                break
-        
-        if main_content:
-            text = main_content.get_text(separator='\n', strip=True)
+        if 'application/pdf' in content_type or url.lower().endswith('.pdf'):
+            text = await _extract_pdf_text(body)
         else:
-            # Fallback: get all paragraph text
-            paragraphs = soup.find_all('p')
-            text = '\n'.join(p.get_text(strip=True) for p in paragraphs if len(p.get_text(strip=True)) > 50)
-        
-        if text and len(text) > 100:
-            return text[:20000]
-        
-        return "No se pudo extraer contenido significativo de la URL."
-        
+            text = await run_in_parser(parsing_workers.parse_html, body, url, MAX_TEXT_CHARS)
+
+        if text == parsing_workers.NO_CONTENT_MESSAGE:
+            raise ExtractionError(text)
+        await asyncio.to_thread(extraction_cache.put, key, "url", text)
+        return text
+
+    except ExtractionError:
+        raise
     except Exception as e:
         error_msg = f"Error extracting URL: {str(e)}"
         print(error_msg)
-        return error_msg
+        raise ExtractionError(error_msg) from e
 
-def extract_from_pdf(file_content: bytes) -> str:
+async def extract_from_pdf(file_content: bytes) -> str:
     """
-    Extracts text from a PDF file using pypdf.
-    Returns a specific marker if no text is found (likely scanned).
+    Extracts text from a PDF file, cached by the SHA-256 of its bytes.
+    Returns a specific marker if no text is found (likely scanned). Raises
+    ExtractionError if the file cannot be parsed.
     """
     try:
-        reader = PdfReader(BytesIO(file_content))
-        text = ""
-        for page in reader.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + "\n"
-        
-        # Check for scanned PDF (little to no text extracted)
-        if len(text.strip()) < 50:
-             return "OCR_REQUIRED"
-             
+        key = extraction_cache.pdf_key(file_content)
+        cached = await asyncio.to_thread(extraction_cache.get, key)
+        if cached is not None:
+            return cached
+
+        text = await _extract_pdf_text(file_content)
+        await asyncio.to_thread(extraction_cache.put, key, "pdf", text)
         return text
     except Exception as e:
-        return f"Error extracting PDF: {str(e)}"
+        raise ExtractionError(f"Error extracting PDF: {str(e)}") from e
+
+def _spool_pdf(file_content: bytes) -> str:
+    with tempfile.NamedTemporaryFile(prefix="extract-", suffix=".pdf", delete=False) as spooled:
+        spooled.write(file_content)
+        return spooled.name
+
+
+async def _extract_pdf_text(file_content: bytes) -> str:
+    """
+    Extracts text from a PDF using pypdf inside the parser pool.
+    The bytes are written once to a temporary file and workers get its path, so
+    the PDF is not pickled to every task. Pages are processed in parallel chunks,
+    in order, and extraction stops as soon as MAX_TEXT_CHARS is collected or
+    PDF_MAX_PAGES is reached.
+    """
+    path = await asyncio.to_thread(_spool_pdf, file_content)
+    try:
+        return await _extract_pdf_file(path)
+    finally:
+        try:
+            os.unlink(path)
+        except OSError as e:
+            print(f"Could not remove temporary PDF {path}: {e}")
+
+async def _extract_pdf_file(path: str) -> str:
+    page_count = await run_in_parser(parsing_workers.count_pdf_pages, path)
+    page_count = min(page_count, PDF_MAX_PAGES)
+    pages_per_task = max(PDF_PAGES_PER_TASK, -(-page_count // (2 * PARSER_WORKERS)))
+    ranges = [
+        (start, min(start + pages_per_task, page_count))
+        for start in range(0, page_count, pages_per_task)
+    ]
+
+    parts = []
+    collected = 0
+    next_range = 0
+    in_flight = deque()
+    try:
+        while collected < MAX_TEXT_CHARS and (in_flight or next_range < len(ranges)):
+            # Keep at most one chunk per worker in flight
+            while next_range < len(ranges) and len(in_flight) < PARSER_WORKERS:
+                start, end = ranges[next_range]
+                in_flight.append(asyncio.ensure_future(run_in_parser(
+                    parsing_workers.extract_pdf_pages,
+                    path, start, end, MAX_TEXT_CHARS - collected
+                )))
+                next_range += 1
+
+            chunk_text = await in_flight.popleft()
+            if chunk_text:
+                parts.append(chunk_text)
+                collected += len(chunk_text) + 1
+    finally:
+        # Budget reached (or error): drop chunks that are no longer needed
+        for future in in_flight:
+            future.cancel()
+
+    text = "\n".join(parts)[:MAX_TEXT_CHARS]
+
+    # Check for scanned PDF (little to no text extracted)
+    if len(text.strip()) < 50:
+         return "OCR_REQUIRED"
+
+    return text
@@ -0,0 +1,285 @@
+"""
+Postgres-backed queue for background analyses.
+
+Jobs are rows of analysis_jobs. In-process workers claim them with
+SELECT ... FOR UPDATE SKIP LOCKED, so several API workers can share the queue.
+A job whose worker died (restart, crash) is reclaimed once its heartbeat is
+older than ANALYSIS_JOB_STALE_SECONDS; if the text was already extracted the
+new attempt resumes at the AI step.
+"""
+import asyncio
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Optional, List
+
+from sqlalchemy import or_, and_
+from sqlalchemy.orm import Session, defer
+
+from database import SessionLocal
+import models
+from models import AnalysisJobStatus
+from services import analysis_pipeline
+
+JOB_WORKERS = int(os.getenv("ANALYSIS_JOB_WORKERS", "2"))
+POLL_INTERVAL = float(os.getenv("ANALYSIS_JOB_POLL_SECONDS", "1"))
+STALE_AFTER = timedelta(seconds=int(os.getenv("ANALYSIS_JOB_STALE_SECONDS", "600")))
+# Jobs claimed together by one worker; their short texts are packed into shared Gemini requests
+JOB_CLAIM_BATCH = int(os.getenv("ANALYSIS_JOB_CLAIM_BATCH", "6"))
+MAX_ATTEMPTS = 3
+
+IN_PROGRESS = (AnalysisJobStatus.EXTRACTING.value, AnalysisJobStatus.ANALYZING.value)
+
+_worker_tasks = []
+
+
+def enqueue(db: Session, url: Optional[str], file_content: Optional[bytes], refresh: bool = False) -> models.AnalysisJob:
+    job = models.AnalysisJob(
+        source_url=url,
+        file_content=file_content,
+        refresh=refresh,
+        status=AnalysisJobStatus.PENDING.value
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def get_job(db: Session, job_id: int) -> Optional[models.AnalysisJob]:
+    return db.query(models.AnalysisJob).options(
+        defer(models.AnalysisJob.file_content)
+    ).filter(models.AnalysisJob.id == job_id).first()
+
+
+def claim_jobs(limit: int) -> List[dict]:
+    """
+    Locks and marks up to `limit` of the oldest runnable jobs (several at once so
+    short texts can share a Gemini request). Returns their inputs. Blocking (DB).
+    """
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        jobs = db.query(models.AnalysisJob).filter(
+            or_(
+                models.AnalysisJob.status == AnalysisJobStatus.PENDING.value,
+                and_(
+                    models.AnalysisJob.status.in_(IN_PROGRESS),
+                    models.AnalysisJob.locked_at < now - STALE_AFTER
+                )
+            )
+        ).order_by(models.AnalysisJob.id).limit(limit).with_for_update(skip_locked=True).all()
+
+        claimed = []
+        for job in jobs:
+            job.updated_at = now
+            if job.attempts >= MAX_ATTEMPTS:
+                job.status = AnalysisJobStatus.FAILED.value
+                job.error = f"Abandoned after {job.attempts} attempts"
+                job.file_content = None
+                job.locked_at = None
+                continue
+
+            # Resume at the AI step when the text survived a previous attempt
+            job.status = AnalysisJobStatus.ANALYZING.value if job.text_content else AnalysisJobStatus.EXTRACTING.value
+            job.attempts = (job.attempts or 0) + 1
+            job.locked_at = now
+            claimed.append({
+                "id": job.id,
+                "source_url": job.source_url,
+                "file_content": job.file_content,
+                "refresh": job.refresh,
+                "text_content": job.text_content
+            })
+        db.commit()
+        return claimed
+    finally:
+        db.close()
+
+
+def _update(job_ids: List[int], **fields):
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        fields.setdefault("locked_at", now) # heartbeat
+        db.query(models.AnalysisJob).filter(models.AnalysisJob.id.in_(job_ids)).update(
+            {**fields, "updated_at": now}, synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def _touch(job_ids: List[int]):
+    # Only jobs still in progress: a finish() racing with the tick keeps its final timestamps
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        db.query(models.AnalysisJob).filter(
+            models.AnalysisJob.id.in_(job_ids),
+            models.AnalysisJob.status.in_(IN_PROGRESS)
+        ).update({"locked_at": now, "updated_at": now}, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+async def _heartbeat(unfinished: set):
+    # Long limiter waits must not make live jobs look abandoned. Reads the live set on
+    # every tick: finished jobs must keep their final locked_at/updated_at
+    while True:
+        await asyncio.sleep(STALE_AFTER.total_seconds() / 3)
+        if unfinished:
+            await asyncio.to_thread(_touch, list(unfinished))
+
+
+async def process(jobs: List[dict]):
+    """Extracts every claimed job concurrently, then analyzes them together."""
+    unfinished = {job["id"] for job in jobs}
+    heartbeat = asyncio.create_task(_heartbeat(unfinished))
+
+    async def finish(job_ids: List[int], **fields):
+        await asyncio.to_thread(_update, job_ids, file_content=None, locked_at=None, **fields)
+        unfinished.difference_update(job_ids)
+
+    async def extract_job(job: dict) -> Optional[dict]:
+        if job["text_content"] is not None:
+            return job
+        try:
+            text_content = await analysis_pipeline.extract(job["source_url"], job["file_content"])
+        except Exception as e:
+            # Dead link, unparsable file (EmptyContentError) or anything else: the job
+            # fails here, without sending anything to Gemini
+            print(f"Analysis job {job['id']} failed at extraction: {e}")
+            await finish([job["id"]], status=AnalysisJobStatus.FAILED.value, error=str(e))
+            return None
+        await asyncio.to_thread(
+            _update, [job["id"]],
+            status=AnalysisJobStatus.ANALYZING.value,
+            text_content=text_content
+        )
+        return {**job, "text_content": text_content}
+
+    try:
+        extracted = [job for job in await asyncio.gather(*(extract_job(job) for job in jobs)) if job]
+
+        for refresh in (False, True):
+            group = [job for job in extracted if bool(job["refresh"]) == refresh]
+            if not group:
+                continue
+            try:
+                results = await analysis_pipeline.analyze_many(
+                    {str(job["id"]): (job["source_url"], job["text_content"]) for job in group},
+                    refresh=refresh
+                )
+                for job in group:
+                    await finish([job["id"]], status=AnalysisJobStatus.DONE.value, result=results[str(job["id"])])
+            except Exception as e:
+                print(f"Analysis jobs {[job['id'] for job in group]} failed: {e}")
+                await finish(
+                    [job["id"] for job in group if job["id"] in unfinished],
+                    status=AnalysisJobStatus.FAILED.value, error=str(e)
+                )
+    except asyncio.CancelledError:
+        # Shutting down: hand the jobs back so the next worker picks them up right away
+        if unfinished:
+            await asyncio.to_thread(
+                _update,
+                list(unfinished),
+                status=AnalysisJobStatus.PENDING.value,
+                attempts=models.AnalysisJob.attempts - 1,
+                locked_at=None
+            )
+        raise
+    finally:
+        heartbeat.cancel()
+
+
+async def _worker_loop(worker_number: int):
+    while True:
+        try:
+            jobs = await asyncio.to_thread(claim_jobs, JOB_CLAIM_BATCH)
+        except Exception as e:
+            print(f"Analysis worker {worker_number} could not claim jobs: {e}")
+            jobs = []
+
+        if not jobs:
+            await asyncio.sleep(POLL_INTERVAL)
+            continue
+
+        print(f"Analysis worker {worker_number} processing jobs {[job['id'] for job in jobs]}")
+        await process(jobs)
+
+
+def start_workers():
+    for worker_number in range(JOB_WORKERS):
+        _worker_tasks.append(asyncio.create_task(_worker_loop(worker_number)))
+
+
+async def stop_workers():
+    for task in _worker_tasks:
+        task.cancel()
+    await asyncio.gather(*_worker_tasks, return_exceptions=True)
+    _worker_tasks.clear()
+
+
+def _job_state(job_id: int) -> Optional[dict]:
+    db = SessionLocal()
+    try:
+        job = get_job(db, job_id)
+        if job is None:
+            return None
+        return {
+            "status": job.status,
+            "text_content": job.text_content,
+            "result": job.result,
+            "error": job.error
+        }
+    finally:
+        db.close()
+
+
+def format_event(event: str, data) -> str:
+    """Server-Sent Events frame."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def stream_events(job_id: int):
+    """
+    Yields SSE frames for a job: every status change, the extracted text once
+    available, then the final result (or error). Polls the jobs table, so it
+    works whichever API worker is processing the job.
+    """
+    last_status = None
+    text_sent = False
+    idle_polls = 0
+
+    while True:
+        state = await asyncio.to_thread(_job_state, job_id)
+        if state is None:
+            yield format_event("error", {"detail": "Job not found"})
+            return
+
+        sent = False
+        if state["status"] != last_status:
+            last_status = state["status"]
+            yield format_event("status", {"job_id": job_id, "status": last_status})
+            sent = True
+
+        if state["text_content"] and not text_sent:
+            yield format_event("extracted", {"job_id": job_id, "content_processed": state["text_content"]})
+            text_sent = True
+            sent = True
+
+        if last_status == AnalysisJobStatus.DONE.value:
+            yield format_event("result", state["result"])
+            return
+        if last_status == AnalysisJobStatus.FAILED.value:
+            yield format_event("error", {"detail": state["error"]})
+            return
+
+        idle_polls = 0 if sent else idle_polls + 1
+        if idle_polls and idle_polls % 15 == 0:
+            yield ": keepalive\n\n" # keeps proxies from closing an idle stream
+
+        await asyncio.sleep(POLL_INTERVAL)
@@ -0,0 +1,140 @@
+"""
+Tolerant JSON parsing for model replies.
+
+Models wrap JSON in code fences or prose, answer with Python-style literals
+(single quotes, True/None), leave trailing commas or get cut off mid-reply. Each of
+those used to cost a full re-generation; here they are repaired locally:
+
+1. Fences are stripped and the first complete JSON value is decoded, ignoring any
+   text around it.
+2. Otherwise the reply is rewritten in one pass: single-quoted strings become double
+   quoted (with their escaped \' unescaped: it is not a JSON escape), Python
+   literals become JSON, raw newlines in strings are escaped and trailing commas
+   dropped.
+3. A truncated reply is closed (open string, brackets); if that is still not valid,
+   it is cut back to the last complete element and closed again.
+"""
+import json
+from typing import Tuple
+
+PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+CLOSING = {"{": "}", "[": "]"}
+
+
+class JSONRepairError(ValueError):
+    """The reply holds no JSON value that could be recovered."""
+
+
+def _strip_fences(text: str) -> str:
+    return text.replace("```json", "").replace("```", "").strip()
+
+
+def _close(output: list, stack: list) -> str:
+    text = "".join(output).rstrip()
+    while text.endswith(","):
+        text = text[:-1].rstrip()
+    if text.endswith(":"):
+        # Dangling key: drop it, and the comma before it
+        text = text[:-1].rstrip()
+        if text.endswith('"'):
+            text = text[:text.rfind('"', 0, len(text) - 1)].rstrip()
+        while text.endswith(","):
+            text = text[:-1].rstrip()
+    return text + "".join(CLOSING[opener] for opener in reversed(stack))
+
+
+def _rewrite(text: str) -> Tuple[str, str]:
+    """
+    Rewrites text (starting at an opening bracket) as JSON. Returns the text closed
+    as-is and the text cut back to the last complete element; both are the same
+    when the value was complete.
+    """
+    output = []
+    stack = []
+    quote = None
+    escaped = False
+    safe_point = None # (output length, stack depth) after the last complete element
+    position = 0
+
+    while position < len(text):
+        char = text[position]
+        position += 1
+
+        if quote:
+            if escaped:
+                # \' is valid in Python strings only; JSON needs the bare quote
+                output.append(char if char == "'" else "\\" + char)
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == quote:
+                output.append('"')
+                quote = None
+            elif char == '"':
+                output.append('\\"')
+            elif char == "\n":
+                output.append("\\n")
+            else:
+                output.append(char)
+            continue
+
+        if char in "\"'":
+            quote = char
+            output.append('"')
+        elif char in "{[":
+            stack.append(char)
+            output.append(char)
+        elif char in "}]":
+            while output and output[-1] in ", \n\t\r":
+                output.pop()
+            if stack and CLOSING[stack[-1]] == char:
+                stack.pop()
+            output.append(char)
+            safe_point = (len(output), len(stack))
+            if not stack:
+                break
+        elif char == ",":
+            safe_point = (len(output), len(stack))
+            output.append(char)
+        elif char.isalpha():
+            end = position
+            while end < len(text) and text[end].isalpha():
+                end += 1
+            word = char + text[position:end]
+            output.append(PYTHON_LITERALS.get(word, word))
+            position = end
+        else:
+            output.append(char)
+
+    if quote:
+        output.append('"')
+    closed = _close(output, stack)
+    if safe_point is None:
+        return closed, closed
+    length, depth = safe_point
+    return closed, _close(output[:length], stack[:depth])
+
+
+def loads(text: str, open_char: str = "{") -> Tuple[object, bool]:
+    """
+    Parses the first JSON value starting with open_char ("{" or "[") in a model reply.
+    Returns (value, repaired), where repaired is True when the reply was not valid
+    JSON as sent. Raises JSONRepairError when nothing can be recovered.
+    """
+    cleaned = _strip_fences(text)
+    start = cleaned.find(open_char)
+    if start == -1:
+        raise JSONRepairError(f"No JSON {'object' if open_char == '{' else 'array'} in reply")
+
+    try:
+        value, _ = json.JSONDecoder().raw_decode(cleaned, start)
+        return value, False
+    except json.JSONDecodeError:
+        pass
+
+    for candidate in dict.fromkeys(_rewrite(cleaned[start:])):
+        try:
+            return json.loads(candidate), True
+        except json.JSONDecodeError:
+            continue
+    raise JSONRepairError("Reply is not valid JSON and could not be repaired")
@@ -0,0 +1,188 @@
+"""
+Backends that turn a prompt into the model's raw reply.
+
+ai_service only talks to `backend.generate(model, prompt, response_schema)`, so
+the quota limiter, retries and parsing can be exercised offline. AI_BACKEND selects the backend:
+
+- gemini (default): the real Gemini API through google-genai.
+- stub: deterministic local replies with configurable latency and injected
+  failures (network errors, 429s, malformed JSON), for load tests and development.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+from typing import NamedTuple, Optional
+
+from services.text_compaction import estimate_tokens
+
+RETRY_DELAY_PATTERN = re.compile(r"retry(?:Delay| in)['\"]?[:\s]*['\"]?(\d+(?:\.\d+)?)s", re.IGNORECASE)
+
+
+class LLMResponse(NamedTuple):
+    text: str
+    total_tokens: int # 0 when the backend does not report usage
+
+
+class QuotaExceededError(Exception):
+    """The provider rejected the call for quota (HTTP 429). retry_after is in seconds, if reported."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _is_rate_limit_error(error: Exception) -> bool:
+    message = str(error)
+    return getattr(error, "code", None) == 429 or "RESOURCE_EXHAUSTED" in message or "429" in message
+
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    match = RETRY_DELAY_PATTERN.search(str(error))
+    return float(match.group(1)) if match else None
+
+
+class GeminiBackend:
+    name = "gemini"
+
+    def __init__(self, api_key: Optional[str]):
+        self.api_key = api_key
+        self._client = None
+
+    def _get_client(self):
+        # Imported and created on first use, so the stub runs without google-genai or a key
+        if self._client is None:
+            from google import genai
+            self._client = genai.Client(api_key=self.api_key)
+        return self._client
+
+    async def generate(self, model: str, prompt: str, response_schema=None) -> LLMResponse:
+        """With response_schema (a pydantic model or list of one), the reply is JSON constrained to it."""
+        client = self._get_client()
+        config = None
+        if response_schema is not None:
+            config = {"response_mime_type": "application/json", "response_schema": response_schema}
+        try:
+            response = await asyncio.to_thread(
+                client.models.generate_content,
+                model=model,
+                contents=prompt,
+                config=config
+            )
+        except Exception as e:
+            if _is_rate_limit_error(e):
+                raise QuotaExceededError(str(e), _retry_after_seconds(e)) from e
+            raise
+
+        usage = getattr(response, "usage_metadata", None)
+        return LLMResponse(response.text, getattr(usage, "total_token_count", None) or 0)
+
+
+PACKED_ARTICLE_PATTERN = re.compile(r'<<<ARTICULO id="([^"]+)">>>\s*(.*?)\s*<<<FIN ARTICULO>>>', re.DOTALL)
+SINGLE_TEXT_PATTERN = re.compile(r'Texto a analizar:\s*"(.*)"\s*Salida requerida', re.DOTALL)
+
+
+class StubBackend:
+    """
+    Offline stand-in for Gemini. Replies are derived from the prompt, so the same
+    text always gets the same analysis; failures are drawn from a seeded RNG so a
+    load-test run can be repeated.
+    """
+
+    name = "stub"
+
+    def __init__(
+        self,
+        latency_ms: float = 800,
+        jitter_ms: float = 200,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        malformed_rate: float = 0.0,
+        retry_after: float = 2.0,
+        seed: Optional[int] = None
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.malformed_rate = malformed_rate
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self.stats = {"calls": 0, "errors": 0, "rate_limited": 0, "malformed": 0}
+
+    @classmethod
+    def from_env(cls) -> "StubBackend":
+        seed = os.getenv("STUB_LLM_SEED")
+        return cls(
+            latency_ms=float(os.getenv("STUB_LLM_LATENCY_MS", "800")),
+            jitter_ms=float(os.getenv("STUB_LLM_JITTER_MS", "200")),
+            error_rate=float(os.getenv("STUB_LLM_ERROR_RATE", "0")),
+            rate_limit_rate=float(os.getenv("STUB_LLM_RATE_LIMIT_RATE", "0")),
+            malformed_rate=float(os.getenv("STUB_LLM_MALFORMED_RATE", "0")),
+            retry_after=float(os.getenv("STUB_LLM_RETRY_AFTER", "2")),
+            seed=int(seed) if seed else None
+        )
+
+    async def generate(self, model: str, prompt: str, response_schema=None) -> LLMResponse:
+        self.stats["calls"] += 1
+        latency = self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms)
+        await asyncio.sleep(max(0.0, latency) / 1000)
+
+        draw = self._random.random()
+        if draw < self.rate_limit_rate:
+            self.stats["rate_limited"] += 1
+            raise QuotaExceededError(
+                f"429 RESOURCE_EXHAUSTED (stub). retryDelay '{self.retry_after:g}s'", self.retry_after
+            )
+        draw -= self.rate_limit_rate
+        if draw < self.error_rate:
+            self.stats["errors"] += 1
+            raise ConnectionError("Stub backend: simulated network failure")
+        draw -= self.error_rate
+
+        articles = PACKED_ARTICLE_PATTERN.findall(prompt)
+        if articles:
+            reply = json.dumps(
+                [{"id": item_id, **self._analysis(text)} for item_id, text in articles], ensure_ascii=False
+            )
+        else:
+            match = SINGLE_TEXT_PATTERN.search(prompt)
+            reply = json.dumps(self._analysis(match.group(1) if match else prompt), ensure_ascii=False)
+
+        if draw < self.malformed_rate:
+            self.stats["malformed"] += 1
+            reply = self._malform(reply, structured=response_schema is not None)
+
+        return LLMResponse(reply, estimate_tokens(prompt) + estimate_tokens(reply))
+
+    def _analysis(self, text: str) -> dict:
+        words = text.split()
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        keywords = sorted({word.strip(".,;:()\"'").lower() for word in words if len(word) > 6})[:3]
+        return {
+            "title": " ".join(words[:12]) or f"Texto {digest[:8]}",
+            "summary": " ".join(words[:60]),
+            "theme": ("Inteligencia Artificial", "Biotecnología", "Política Pública", "Smart Cities")[int(digest[0], 16) % 4],
+            "geography": ("Medellín", "Colombia", "Latam", "Global")[int(digest[1], 16) % 4],
+            "impact": f"Análisis simulado ({digest[:12]}).",
+            "impact_score": int(digest[2], 16) % 5 + 1,
+            "keywords": keywords
+        }
+
+    def _malform(self, reply: str, structured: bool) -> str:
+        # The two shapes seen from real models: a cut-off reply and a Python-style literal.
+        # Schema-constrained output can only be cut off (output token limit).
+        if structured or self._random.random() < 0.5:
+            return reply[:max(1, len(reply) // 2)]
+        return reply.replace('"', "'")
+
+
+def get_backend():
+    name = os.getenv("AI_BACKEND", "gemini")
+    if name == "stub":
+        return StubBackend.from_env()
+    if name == "gemini":
+        return GeminiBackend(os.getenv("GEMINI_API_KEY"))
+    raise ValueError(f"Unknown AI_BACKEND: {name}")
@@ -0,0 +1,72 @@
+"""
+MinHash signatures and LSH band keys for near-duplicate detection.
+
+Pure computation (NumPy only), so it can run in the parser process pool.
+Texts are reduced to overlapping word shingles; the fraction of equal positions in
+two signatures estimates the Jaccard similarity of their shingle sets. Signatures
+are split into BANDS bands of ROWS values: two texts share at least one band key
+with high probability when they are similar (about 50% at a Jaccard of 0.42, above
+99% from 0.7), which is what makes candidate lookup an index scan.
+"""
+import hashlib
+import re
+from typing import List, Optional
+
+import numpy as np
+
+NUM_PERM = 128
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+SHINGLE_WORDS = 5
+
+# Stored news keep only the processed-text preview, so both sides are compared on
+# the same leading part of the article
+SIGNATURE_CHARS = 5000
+
+WORD_PATTERN = re.compile(r"[a-záéíóúüñ0-9]+", re.IGNORECASE)
+
+# Universal hashing h(x) = (a*x + b) mod p over 32-bit shingle hashes; a < 2^31 keeps a*x within uint64
+_PRIME = np.uint64(4294967311)
+_random = np.random.RandomState(20260101) # fixed: stored signatures must stay comparable
+_A = _random.randint(1, 2 ** 31, NUM_PERM, dtype=np.uint64)
+_B = _random.randint(0, 2 ** 32, NUM_PERM, dtype=np.uint64)
+
+
+def _shingle_hashes(text: str) -> np.ndarray:
+    words = WORD_PATTERN.findall(text[:SIGNATURE_CHARS].lower())
+    if not words:
+        return np.empty(0, dtype=np.uint64)
+    count = max(1, len(words) - SHINGLE_WORDS + 1)
+    shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(count)}
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=4).digest(), "little") for shingle in shingles),
+        dtype=np.uint64,
+        count=len(shingles)
+    )
+
+
+def signature(text: str) -> Optional[bytes]:
+    """MinHash signature of text as NUM_PERM little-endian uint32 (None for texts without words)."""
+    hashes = _shingle_hashes(text or "")
+    if hashes.size == 0:
+        return None
+    permuted = (np.outer(hashes, _A) + _B) % _PRIME
+    return (permuted.min(axis=0) & np.uint64(0xFFFFFFFF)).astype("<u4").tobytes()
+
+
+def band_keys(signature_bytes: bytes) -> List[int]:
+    """One signed 64-bit bucket key per band (fits a BIGINT column)."""
+    row_bytes = ROWS * 4
+    return [
+        int.from_bytes(
+            hashlib.blake2b(signature_bytes[band * row_bytes:(band + 1) * row_bytes], digest_size=8).digest(),
+            "little",
+            signed=True
+        )
+        for band in range(BANDS)
+    ]
+
+
+def similarity(first: bytes, second: bytes) -> float:
+    """Estimated Jaccard similarity of the texts behind two signatures."""
+    return float(np.mean(np.frombuffer(first, dtype="<u4") == np.frombuffer(second, dtype="<u4")))
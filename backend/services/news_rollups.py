@@ -0,0 +1,217 @@
+"""
+Daily rollups of news counts by (day, status, theme, geography, category).
+
+Trend questions (news per week by theme, geography mix, status funnel) are
+answered from news_daily_rollups instead of scanning `news` and its JSON
+classifications. The day is the detection date; status, category, and the theme
+and geography of the AI classification are the news item's current values.
+
+news_rollup_members records the key each news item is counted under, which makes
+refresh() idempotent: it moves an item from its counted key to its current one,
+and does nothing when they match. Writes refresh the news they touch in their own
+transaction; a catch-up job re-reads the news updated since its watermark
+(news.updated_at) for changes made by other paths.
+"""
+import asyncio
+import os
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import func, cast, Date, DateTime, tuple_, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, engine
+import models
+
+GRANULARITIES = ("day", "week", "month")
+DIMENSIONS = ("status", "theme", "geography", "category")
+
+CATCH_UP_INTERVAL = int(os.getenv("NEWS_ROLLUP_CATCH_UP_SECONDS", "600"))
+CATCH_UP_BATCH = 500
+# Re-read window behind the watermark: a transaction may commit after a later one
+# whose rows the job already saw (re-reading is harmless, refresh is idempotent)
+WATERMARK_OVERLAP = timedelta(minutes=5)
+WATERMARK_NAME = "news_daily_rollups"
+# One catch-up at a time across API workers
+CATCH_UP_LOCK_ID = 7302
+MAX_LABEL_CHARS = 120
+
+_catch_up_task = None
+
+
+def _label(value) -> str:
+    # Missing values are "" so they can be part of the primary key
+    return str(value).strip()[:MAX_LABEL_CHARS] if value else ""
+
+
+def rollup_key(detection_date, status, category, classifications) -> tuple:
+    classifications = classifications or {}
+    return (
+        detection_date or date.today(),
+        _label(status),
+        _label(classifications.get("theme")),
+        _label(classifications.get("geography")),
+        _label(category)
+    )
+
+
+def refresh(db: Session, news_ids: List[int]):
+    """
+    Moves each news item to its current rollup key (removing deleted ones).
+    Locks the news rows, so concurrent refreshes of an item serialize. No commit.
+    """
+    news_ids = sorted(set(news_ids))
+    if not news_ids:
+        return
+    db.flush()
+    current = {
+        row.id: rollup_key(row.detection_date, row.status, row.category, row.classifications)
+        for row in db.query(
+            models.News.id, models.News.detection_date, models.News.status,
+            models.News.category, models.News.classifications
+        ).filter(models.News.id.in_(news_ids)).order_by(models.News.id).with_for_update()
+    }
+    members = {
+        member.news_id: member
+        for member in db.query(models.NewsRollupMember).filter(models.NewsRollupMember.news_id.in_(news_ids))
+    }
+
+    deltas = Counter()
+    for news_id in news_ids:
+        member = members.get(news_id)
+        counted = (member.day, member.status, member.theme, member.geography, member.category) if member else None
+        key = current.get(news_id)
+        if counted == key:
+            continue
+        if counted is not None:
+            deltas[counted] -= 1
+        if key is None:
+            db.delete(member)
+            continue
+        deltas[key] += 1
+        if member is None:
+            member = models.NewsRollupMember(news_id=news_id)
+            db.add(member)
+        member.day, member.status, member.theme, member.geography, member.category = key
+
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    statement = pg_insert(models.NewsDailyRollup).values([
+        {"day": key[0], "status": key[1], "theme": key[2], "geography": key[3], "category": key[4], "news_count": delta}
+        for key, delta in sorted(deltas.items()) # fixed lock order between concurrent writers
+    ])
+    db.execute(statement.on_conflict_do_update(
+        index_elements=["day", "status", "theme", "geography", "category"],
+        set_={"news_count": models.NewsDailyRollup.news_count + statement.excluded.news_count}
+    ))
+
+
+def catch_up(sweep_deleted: bool = False) -> int:
+    """
+    Refreshes the news updated since the watermark, in (updated_at, id) batches,
+    and advances it. sweep_deleted also removes news deleted behind our back
+    (a full anti-join, done at startup only). Skipped while another worker runs
+    it. Blocking (DB). Returns news refreshed.
+    """
+    with engine.connect() as lock_connection:
+        if not lock_connection.execute(text("SELECT pg_try_advisory_lock(:lock_id)"), {"lock_id": CATCH_UP_LOCK_ID}).scalar():
+            return 0
+        try:
+            return _catch_up(sweep_deleted)
+        finally:
+            lock_connection.execute(text("SELECT pg_advisory_unlock(:lock_id)"), {"lock_id": CATCH_UP_LOCK_ID})
+
+
+def _catch_up(sweep_deleted: bool) -> int:
+    refreshed = 0
+    db = SessionLocal()
+    try:
+        state = db.query(models.RollupWatermark).filter(models.RollupWatermark.name == WATERMARK_NAME).first()
+        if state is None:
+            state = models.RollupWatermark(name=WATERMARK_NAME)
+            db.add(state)
+        position = ((state.updated_through - WATERMARK_OVERLAP) if state.updated_through else datetime.min, 0)
+
+        while True:
+            batch = db.query(models.News.id, models.News.updated_at).filter(
+                tuple_(models.News.updated_at, models.News.id) > tuple_(*position)
+            ).order_by(models.News.updated_at, models.News.id).limit(CATCH_UP_BATCH).all()
+            if not batch:
+                break
+            refresh(db, [news_id for news_id, _ in batch])
+            position = (batch[-1].updated_at, batch[-1].id)
+            state.updated_through = max(state.updated_through or datetime.min, position[0])
+            db.commit()
+            refreshed += len(batch)
+
+        if sweep_deleted:
+            orphans = [news_id for (news_id,) in db.query(models.NewsRollupMember.news_id).outerjoin(
+                models.News, models.News.id == models.NewsRollupMember.news_id
+            ).filter(models.News.id.is_(None))]
+            for start in range(0, len(orphans), CATCH_UP_BATCH):
+                refresh(db, orphans[start:start + CATCH_UP_BATCH])
+            refreshed += len(orphans)
+        db.commit()
+        return refreshed
+    finally:
+        db.close()
+
+
+async def _catch_up_loop():
+    sweep_deleted = True
+    while True:
+        try:
+            refreshed = await asyncio.to_thread(catch_up, sweep_deleted)
+            if refreshed:
+                print(f"News rollups: refreshed {refreshed} news items")
+            sweep_deleted = False
+        except Exception as e:
+            print(f"News rollup catch-up failed: {e}")
+        await asyncio.sleep(CATCH_UP_INTERVAL)
+
+
+def start_catch_up():
+    global _catch_up_task
+    _catch_up_task = asyncio.create_task(_catch_up_loop())
+
+
+async def stop_catch_up():
+    global _catch_up_task
+    if _catch_up_task is not None:
+        _catch_up_task.cancel()
+        await asyncio.gather(_catch_up_task, return_exceptions=True)
+        _catch_up_task = None
+
+
+def timeseries(
+    db: Session,
+    start: date,
+    end: date,
+    granularity: str = "week",
+    group_by: Optional[str] = None,
+    **filters: Optional[str]
+) -> List[dict]:
+    """
+    [{"period", "group", "count"}] for the news detected between start and end
+    (inclusive), per period (start of the day, ISO week or month) and, with
+    group_by, per value of that dimension. filters are exact matches on dimensions.
+    """
+    rollup = models.NewsDailyRollup
+    period = cast(func.date_trunc(granularity, cast(rollup.day, DateTime)), Date).label("period")
+    group = getattr(rollup, group_by).label("group") if group_by else None
+    columns = [period] + ([group] if group is not None else [])
+
+    query = db.query(*columns, func.sum(rollup.news_count).label("news_count")).filter(
+        rollup.day >= start, rollup.day <= end
+    )
+    for dimension, value in filters.items():
+        if value is not None:
+            query = query.filter(getattr(rollup, dimension) == value)
+    rows = query.group_by(*columns).having(func.sum(rollup.news_count) > 0).order_by(*columns).all()
+    return [
+        {"period": row.period, "group": row.group if group is not None else None, "count": int(row.news_count)}
+        for row in rows
+    ]
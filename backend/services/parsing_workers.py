@@ -0,0 +1,93 @@
+"""
+CPU-bound parsing functions executed inside the extraction process pool.
+
+Everything here must stay importable without the API (no database, no FastAPI)
+and every function must be a top-level callable so it can be pickled to workers.
+"""
+
+from pypdf import PdfReader
+import trafilatura
+from bs4 import BeautifulSoup
+
+NO_CONTENT_MESSAGE = "No se pudo extraer contenido significativo de la URL."
+
+
+def limit_worker_memory(max_bytes: int):
+    """Pool initializer: caps the address space of each worker (Linux only)."""
+    if not max_bytes:
+        return
+    try:
+        import resource
+        resource.setrlimit(resource.RLIMIT_AS, (max_bytes, max_bytes))
+    except (ImportError, ValueError, OSError) as e:
+        print(f"Could not limit parser worker memory: {e}")
+
+
+def parse_html(html: bytes, url: str, max_chars: int) -> str:
+    """
+    Extracts the main content from an already downloaded HTML page using
+    trafilatura (specialized for articles). Falls back to BeautifulSoup.
+    """
+    # Method 1: Use trafilatura (best for news articles)
+    content = trafilatura.extract(
+        html,
+        url=url or None,
+        include_comments=False,
+        include_tables=True,
+        no_fallback=False,
+        favor_recall=True  # Prefer getting more content
+    )
+    if content and len(content) > 100:
+        return content[:max_chars]
+
+    # Method 2: Fallback to BeautifulSoup over the same bytes (no second download)
+    print(f"Trafilatura failed for {url}, trying BeautifulSoup...")
+    soup = BeautifulSoup(html, 'lxml')
+
+    # Remove unwanted elements
+    for tag in soup(['script', 'style', 'nav', 'header', 'footer', 'aside',
+                     'iframe', 'noscript', 'form', 'button', 'input']):
+        tag.decompose()
+
+    # Try to find main content areas
+    main_content = None
+    for selector in ['article', 'main', '[role="main"]', '.post-content',
+                     '.entry-content', '.article-body', '.content']:
+        main_content = soup.select_one(selector)
+        if main_content:
+            break
+
+    if main_content:
+        text = main_content.get_text(separator='\n', strip=True)
+    else:
+        # Fallback: get all paragraph text
+        paragraphs = soup.find_all('p')
+        text = '\n'.join(p.get_text(strip=True) for p in paragraphs if len(p.get_text(strip=True)) > 50)
+
+    if text and len(text) > 100:
+        return text[:max_chars]
+
+    return NO_CONTENT_MESSAGE
+
+
+def count_pdf_pages(path: str) -> int:
+    return len(PdfReader(path).pages)
+
+
+def extract_pdf_pages(path: str, start: int, end: int, max_chars: int) -> str:
+    """
+    Extracts text from pages [start, end) of the PDF at path and stops as soon as
+    max_chars is reached, so a worker never holds more than its share of the
+    character budget. The file is read lazily: only the objects of those pages.
+    """
+    reader = PdfReader(path)
+    parts = []
+    size = 0
+    for index in range(start, min(end, len(reader.pages))):
+        page_text = reader.pages[index].extract_text()
+        if page_text:
+            parts.append(page_text)
+            size += len(page_text) + 1
+            if size >= max_chars:
+                break
+    return "\n".join(parts)[:max_chars]
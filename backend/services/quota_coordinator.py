@@ -0,0 +1,107 @@
+"""
+Gemini quota shared by every API worker and background job through Postgres.
+
+Each dimension (requests, tokens) is a token bucket stored as one row of
+ai_quota_buckets. Reservations lock both rows (SELECT ... FOR UPDATE, always in the
+same order), refill them using the database clock and take the budget in a single
+short transaction, so N uvicorn workers draw from one budget instead of N.
+"""
+import asyncio
+from datetime import timedelta
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from database import SessionLocal
+import models
+
+
+class PostgresQuota:
+    name = "postgres"
+
+    def __init__(self, bucket_prefix: str, requests_per_minute: int, tokens_per_minute: int):
+        self.request_bucket = f"{bucket_prefix}:requests"
+        self.token_bucket = f"{bucket_prefix}:tokens"
+        self.limits = {
+            self.request_bucket: (requests_per_minute, requests_per_minute / 60.0),
+            self.token_bucket: (tokens_per_minute, tokens_per_minute / 60.0)
+        }
+
+    def _lock_buckets(self, db):
+        """Returns (db_now, {name: row}) with both rows locked, creating them on first use."""
+        now = db.execute(text("SELECT clock_timestamp()")).scalar()
+        db.execute(
+            pg_insert(models.AIQuotaBucket)
+            .values([
+                {"name": name, "tokens": capacity, "updated_at": now}
+                for name, (capacity, _) in self.limits.items()
+            ])
+            .on_conflict_do_nothing(index_elements=["name"])
+        )
+        rows = db.query(models.AIQuotaBucket).filter(
+            models.AIQuotaBucket.name.in_(list(self.limits))
+        ).order_by(models.AIQuotaBucket.name).with_for_update().all()
+
+        buckets = {}
+        for row in rows:
+            capacity, rate = self.limits[row.name]
+            elapsed = max(0.0, (now - row.updated_at).total_seconds())
+            row.tokens = min(capacity, row.tokens + elapsed * rate)
+            row.updated_at = now
+            buckets[row.name] = row
+        return now, buckets
+
+    def _reserve(self, estimated_tokens: int) -> float:
+        db = SessionLocal()
+        try:
+            now, buckets = self._lock_buckets(db)
+            requests = buckets[self.request_bucket]
+            tokens = buckets[self.token_bucket]
+
+            def seconds_until(row, amount):
+                capacity, rate = self.limits[row.name]
+                amount = min(amount, capacity)
+                return 0.0 if row.tokens >= amount else (amount - row.tokens) / rate
+
+            blocked = (requests.blocked_until - now).total_seconds() if requests.blocked_until else 0.0
+            wait = max(blocked, seconds_until(requests, 1), seconds_until(tokens, estimated_tokens))
+            if wait <= 0:
+                requests.tokens -= 1
+                tokens.tokens -= estimated_tokens
+            db.commit()
+            return wait
+        finally:
+            db.close()
+
+    def _adjust_tokens(self, delta: int):
+        db = SessionLocal()
+        try:
+            _, buckets = self._lock_buckets(db)
+            buckets[self.token_bucket].tokens -= delta
+            db.commit()
+        finally:
+            db.close()
+
+    def _block(self, seconds: float):
+        db = SessionLocal()
+        try:
+            now, buckets = self._lock_buckets(db)
+            requests = buckets[self.request_bucket]
+            until = now + timedelta(seconds=seconds)
+            if requests.blocked_until is None or requests.blocked_until < until:
+                requests.blocked_until = until
+            requests.tokens = min(requests.tokens, 0.0)
+            db.commit()
+        finally:
+            db.close()
+
+    async def reserve(self, estimated_tokens: int) -> float:
+        """Takes one request and the tokens if available. Returns 0, or the seconds to wait."""
+        return await asyncio.to_thread(self._reserve, estimated_tokens)
+
+    async def adjust_tokens(self, delta: int):
+        await asyncio.to_thread(self._adjust_tokens, delta)
+
+    async def block(self, seconds: float):
+        """A 429 seen by any worker pauses all of them."""
+        await asyncio.to_thread(self._block, seconds)
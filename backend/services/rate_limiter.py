@@ -0,0 +1,165 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+
+class TokenBucket:
+    """Classic token bucket: `capacity` tokens, refilled continuously at `rate` per second."""
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def time_until(self, amount: float, now: float) -> float:
+        """Seconds until `amount` tokens are available (0 if available now)."""
+        self._refill(now)
+        amount = min(amount, self.capacity) # a single oversized call must still pass eventually
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float):
+        # May go negative when correcting with real usage; refill pays the debt back
+        self.tokens -= amount
+
+    def drain(self, now: float):
+        self._refill(now)
+        self.tokens = min(self.tokens, 0.0)
+
+
+class LocalQuota:
+    """Request/token budget held in this process only (single worker deployments)."""
+
+    name = "local"
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.request_bucket = TokenBucket(requests_per_minute, requests_per_minute / 60.0)
+        self.token_bucket = TokenBucket(tokens_per_minute, tokens_per_minute / 60.0)
+
+    async def reserve(self, estimated_tokens: int) -> float:
+        """Takes one request and the tokens if available. Returns 0, or the seconds to wait."""
+        now = time.monotonic()
+        wait = max(
+            self.request_bucket.time_until(1, now),
+            self.token_bucket.time_until(estimated_tokens, now)
+        )
+        if wait <= 0:
+            self.request_bucket.consume(1)
+            self.token_bucket.consume(estimated_tokens)
+        return wait
+
+    async def adjust_tokens(self, delta: int):
+        self.token_bucket.consume(delta)
+
+    async def block(self, seconds: float):
+        self.request_bucket.drain(time.monotonic())
+
+
+class RateLimiter:
+    """
+    Async limiter for an external API quota: requests per minute, tokens per minute
+    and a cap on concurrent calls. Callers wait in FIFO order; a 429 from the API
+    pauses every caller until the reported retry delay has passed.
+    The request/token budget lives in `quota` (this process, or shared through Postgres).
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int, max_concurrency: int, quota=None):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_concurrency = max_concurrency
+
+        self.quota = quota or LocalQuota(requests_per_minute, tokens_per_minute)
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._reserve_lock = asyncio.Lock()
+        self.blocked_until = 0.0
+
+        self.waiting = 0
+        self.in_flight = 0
+        self.stats = {
+            "acquired": 0,
+            "rate_limited": 0,
+            "total_wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+            "last_wait_seconds": 0.0
+        }
+
+    async def _wait_for_budget(self, estimated_tokens: int):
+        # One caller reserves at a time so the queue is served in arrival order
+        async with self._reserve_lock:
+            while True:
+                wait = self.blocked_until - time.monotonic()
+                if wait <= 0:
+                    wait = await self.quota.reserve(estimated_tokens)
+                    if wait <= 0:
+                        return
+                await asyncio.sleep(wait)
+
+    @asynccontextmanager
+    async def acquire(self, estimated_tokens: int = 0):
+        """
+        Waits for a concurrency slot and for request/token budget.
+        Yields the seconds spent waiting in the queue.
+        """
+        enqueued_at = time.monotonic()
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+            try:
+                await self._wait_for_budget(estimated_tokens)
+            except BaseException:
+                self._slots.release()
+                raise
+        finally:
+            self.waiting -= 1
+
+        waited = time.monotonic() - enqueued_at
+        self.stats["acquired"] += 1
+        self.stats["total_wait_seconds"] += waited
+        self.stats["max_wait_seconds"] = max(self.stats["max_wait_seconds"], waited)
+        self.stats["last_wait_seconds"] = waited
+
+        self.in_flight += 1
+        try:
+            yield waited
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+    async def record_usage(self, estimated_tokens: int, actual_tokens: int):
+        """Corrects the token budget once the real usage of a call is known."""
+        if actual_tokens and actual_tokens != estimated_tokens:
+            try:
+                await self.quota.adjust_tokens(actual_tokens - estimated_tokens)
+            except Exception as e:
+                # Accounting only; never fail a successful call because of it
+                print(f"Could not record token usage: {e}")
+
+    async def report_rate_limited(self, retry_after: float):
+        """Called on a real 429: pause everyone and empty the request bucket."""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+        self.stats["rate_limited"] += 1
+        try:
+            await self.quota.block(retry_after)
+        except Exception as e:
+            print(f"Could not share rate limit pause: {e}")
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        acquired = self.stats["acquired"]
+        return {
+            "requests_per_minute": self.requests_per_minute,
+            "tokens_per_minute": self.tokens_per_minute,
+            "max_concurrency": self.max_concurrency,
+            "quota_backend": self.quota.name,
+            "queue_depth": self.waiting,
+            "in_flight": self.in_flight,
+            "blocked_for_seconds": round(max(0.0, self.blocked_until - now), 2),
+            "avg_wait_seconds": round(self.stats["total_wait_seconds"] / acquired, 3) if acquired else 0.0,
+            **{key: round(value, 3) if isinstance(value, float) else value for key, value in self.stats.items()}
+        }
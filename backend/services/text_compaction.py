@@ -0,0 +1,170 @@
+"""
+Input compaction before the Gemini prompt.
+
+Instead of cutting the text at a fixed number of characters (which drops the
+conclusions of long reports), the text is cleaned and, only if it still does not
+fit, reduced to its most informative sentences:
+
+1. Repeated lines/paragraphs/sentences (menus, share bars, footers) are kept once.
+2. Short boilerplate lines (cookies, subscriptions, "lee también"...) are removed.
+3. Sentences are ranked by the frequency of their content words (SumBasic, so the
+   selection does not keep repeating the same topic), with a bonus for the opening
+   and closing parts of the document, and the best ones are kept in their original
+   order until the token budget is filled.
+"""
+import re
+from collections import Counter
+from typing import NamedTuple
+
+# ~4 characters per token for Spanish/English prose
+CHARS_PER_TOKEN = 4
+
+# Phrases that only appear in site chrome, searched in short lines
+BOILERPLATE_MAX_CHARS = 160
+BOILERPLATE_PHRASES = re.compile(
+    r"cookies|política de privacidad|politica de privacidad|privacy policy|aviso legal|"
+    r"términos y condiciones|terminos y condiciones|terms of (use|service)|"
+    r"todos los derechos reservados|all rights reserved|©|"
+    r"suscr[ií]bete|subscribe|newsletter|reg[ií]strate|inicia sesi[oó]n|sign (in|up)|"
+    r"compart(e|ir) (en|por)|share (on|this)|s[ií]guenos|follow us|"
+    r"lee también|lea también|te puede interesar|noticias relacionadas|read more|related articles|"
+    r"haz clic|click here",
+    re.IGNORECASE
+)
+# Navigation/ads labels that are boilerplate only when they are the whole line
+BOILERPLATE_LINES = re.compile(
+    r"^(publicidad|advertisement|compartir|share|menú|menu|buscar|search|inicio|home|"
+    r"login|ingresar|cerrar|close|volver|back|anterior|siguiente|next|previous)$",
+    re.IGNORECASE
+)
+
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?;])\s+")
+WORD_PATTERN = re.compile(r"[a-záéíóúüñ0-9]+", re.IGNORECASE)
+
+STOPWORDS = {
+    # Spanish
+    "para", "como", "pero", "este", "esta", "estos", "estas", "desde", "entre", "sobre",
+    "también", "tambien", "porque", "cuando", "donde", "hasta", "sino", "según", "segun",
+    "cual", "cuales", "quien", "quienes", "todo", "todos", "toda", "todas", "otro", "otra",
+    "otros", "otras", "mismo", "misma", "más", "menos", "muy", "han", "había", "habia",
+    "será", "sera", "sido", "ser", "son", "está", "esta", "están", "estan", "tiene", "tienen",
+    "puede", "pueden", "hace", "hacer", "ello", "ellos", "ellas", "aquí", "aqui", "dijo",
+    "año", "años", "parte", "cada", "tras", "durante", "mientras", "solo", "sólo", "además",
+    # English
+    "that", "this", "with", "from", "have", "were", "which", "their", "there", "they",
+    "about", "would", "could", "should", "been", "into", "than", "then", "them", "these",
+    "those", "also", "more", "most", "some", "such", "only", "other", "what", "when",
+    "where", "will", "your", "said", "over", "after", "before", "while",
+}
+
+
+class CompactionResult(NamedTuple):
+    text: str
+    original_tokens: int
+    compacted_tokens: int
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.original_tokens - self.compacted_tokens
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _normalize(line: str) -> str:
+    return " ".join(WORD_PATTERN.findall(line.lower()))
+
+
+def _clean_lines(text: str) -> list:
+    seen = set()
+    lines = []
+    for raw_line in text.splitlines():
+        line = " ".join(raw_line.split())
+        if not line:
+            continue
+        key = _normalize(line)
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        if BOILERPLATE_LINES.match(key) or (len(line) <= BOILERPLATE_MAX_CHARS and BOILERPLATE_PHRASES.search(line)):
+            continue
+        lines.append(line)
+    return lines
+
+
+def _content_words(sentence: str) -> list:
+    return [
+        word for word in WORD_PATTERN.findall(sentence.lower())
+        if len(word) > 3 and word not in STOPWORDS
+    ]
+
+
+def _select_sentences(lines: list, char_budget: int) -> str:
+    # (line index, sentence) in document order, repeated sentences kept once
+    sentences = []
+    seen = set()
+    for line_index, line in enumerate(lines):
+        for sentence in SENTENCE_SPLIT.split(line):
+            key = _normalize(sentence)
+            if key and key not in seen:
+                seen.add(key)
+                sentences.append((line_index, sentence))
+    words_by_sentence = [_content_words(sentence) for _, sentence in sentences]
+    counts = Counter(word for words in words_by_sentence for word in words)
+    total_words = sum(counts.values()) or 1
+    probabilities = {word: count / total_words for word, count in counts.items()}
+
+    total = len(sentences)
+    edge = max(1, total // 10)
+    position_bonus = [
+        1.5 if position < edge or position >= total - edge else 1.0 # introduction and conclusions
+        for position in range(total)
+    ]
+
+    # SumBasic: pick the sentence with the highest mean word probability, then square
+    # the probability of its words so the next picks cover different content
+    chosen = set()
+    remaining = set(range(total))
+    smallest = min((len(sentence) + 1 for _, sentence in sentences), default=0)
+    used = 0
+    while remaining and used + smallest <= char_budget:
+        def score(position):
+            words = words_by_sentence[position]
+            if not words:
+                return 0.0
+            return position_bonus[position] * sum(probabilities[word] for word in words) / len(words)
+
+        best = max(remaining, key=score)
+        remaining.discard(best)
+        size = len(sentences[best][1]) + 1
+        if used + size > char_budget:
+            continue
+        chosen.add(best)
+        used += size
+        for word in set(words_by_sentence[best]):
+            probabilities[word] **= 2
+
+    output_lines = []
+    current_line = None
+    for position in sorted(chosen):
+        line_index, sentence = sentences[position]
+        if line_index != current_line:
+            output_lines.append(sentence)
+            current_line = line_index
+        else:
+            output_lines[-1] += " " + sentence
+    return "\n".join(output_lines)
+
+
+def compact_text(text: str, token_budget: int) -> CompactionResult:
+    """Returns the text reduced to fit token_budget, plus the token counts before and after."""
+    original_tokens = estimate_tokens(text)
+    compacted = "\n".join(_clean_lines(text))
+
+    char_budget = token_budget * CHARS_PER_TOKEN
+    if len(compacted) > char_budget:
+        # Sentences longer than the whole budget can leave nothing selected
+        compacted = _select_sentences(compacted.splitlines(), char_budget) or compacted[:char_budget]
+
+    return CompactionResult(compacted, original_tokens, estimate_tokens(compacted))
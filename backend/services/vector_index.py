@@ -0,0 +1,196 @@
+"""
+Related-news index: one hashed bag-of-words vector per news item, searched by cosine.
+
+Vectors are built locally from title, summary, keywords and theme (no external
+service): words and word pairs are hashed into DIM signed buckets, with
+sublinear term frequency and per-field weights, then L2-normalized. They live in
+a float32 file memory-mapped by every API worker, one row per news id, so a
+lookup is a single matrix-vector product (100k news x 512 dims = 200 MB, a few
+milliseconds). The file is only a derived copy of Postgres: rows are written on
+create/update and missing rows are rebuilt at startup.
+"""
+import fcntl
+import hashlib
+import math
+import os
+import threading
+from collections import Counter
+from typing import List, Tuple, Optional
+
+import numpy as np
+
+from database import SessionLocal
+import models
+from services.text_compaction import WORD_PATTERN, STOPWORDS
+
+DIM = int(os.getenv("RELATED_VECTOR_DIM", "512"))
+INDEX_DIR = os.getenv("RELATED_INDEX_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data"))
+INITIAL_ROWS = 1024
+MIN_SCORE = 0.05
+
+FIELD_WEIGHTS = {"title": 2.0, "summary": 1.0, "keywords": 3.0, "theme": 2.0}
+
+
+def _tokens(text: str) -> List[str]:
+    return [word for word in WORD_PATTERN.findall(text.lower()) if len(word) > 2 and word not in STOPWORDS]
+
+
+def _fields(news) -> dict:
+    classifications = news.classifications or {}
+    keywords = classifications.get("keywords") or []
+    return {
+        "title": news.title or "",
+        "summary": news.summary or classifications.get("summary") or "",
+        "keywords": keywords if isinstance(keywords, list) else [str(keywords)],
+        "theme": classifications.get("theme") or ""
+    }
+
+
+def vectorize(news) -> np.ndarray:
+    """Normalized hashed vector of a News row (or anything with the same attributes)."""
+    features = Counter()
+    for field, value in _fields(news).items():
+        weight = FIELD_WEIGHTS[field]
+        if field == "keywords":
+            for keyword in value:
+                words = _tokens(str(keyword))
+                if words:
+                    features["kw:" + " ".join(words)] += weight # the whole tag, besides its words
+                features.update({word: weight for word in words})
+            continue
+        words = _tokens(value)
+        for word in words:
+            features[word] += weight
+        for first, second in zip(words, words[1:]):
+            features[f"{first} {second}"] += weight / 2
+
+    vector = np.zeros(DIM, dtype=np.float32)
+    for feature, count in features.items():
+        digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+        sign = 1.0 if digest >> 63 else -1.0 # signed hashing: collisions cancel out instead of piling up
+        vector[digest % DIM] += sign * (1.0 + math.log(count))
+
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class VectorIndex:
+    """float32 rows of DIM values indexed by news id, in a file shared by all workers."""
+
+    def __init__(self, directory: str, dim: int):
+        self.dim = dim
+        self.path = os.path.join(directory, f"related-{dim}.f32")
+        self.lock_path = self.path + ".lock"
+        self._lock = threading.Lock()
+        self._vectors = None
+        self._mapped_bytes = 0
+
+    def _rows_in_file(self) -> int:
+        try:
+            return os.path.getsize(self.path) // (self.dim * 4)
+        except FileNotFoundError:
+            return 0
+
+    def _view(self, min_rows: int = 0) -> Optional[np.memmap]:
+        """Current mapping, remapped when another worker grew the file. Grows it to min_rows."""
+        if self._rows_in_file() < min_rows:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.lock_path, "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX) # one worker grows the file at a time
+                rows = self._rows_in_file()
+                if rows < min_rows:
+                    with open(self.path, "ab") as data:
+                        data.truncate(max(min_rows, rows * 2, INITIAL_ROWS) * self.dim * 4) # zero-filled
+
+        rows = self._rows_in_file()
+        if rows == 0:
+            return None
+        if self._vectors is None or self._mapped_bytes != rows * self.dim * 4:
+            self._vectors = np.memmap(self.path, dtype=np.float32, mode="r+", shape=(rows, self.dim))
+            self._mapped_bytes = rows * self.dim * 4
+        return self._vectors
+
+    def put(self, news_id: int, vector: np.ndarray, flush: bool = True):
+        with self._lock:
+            vectors = self._view(min_rows=news_id + 1)
+            vectors[news_id] = vector
+            if flush:
+                vectors.flush()
+
+    def flush(self):
+        with self._lock:
+            vectors = self._view()
+            if vectors is not None:
+                vectors.flush()
+
+    def remove(self, news_id: int):
+        with self._lock:
+            vectors = self._view()
+            if vectors is not None and news_id < len(vectors):
+                vectors[news_id] = 0
+                vectors.flush()
+
+    def nearest(self, news_id: int, k: int) -> List[Tuple[int, float]]:
+        """[(news_id, cosine)] of the k most similar rows, best first."""
+        with self._lock:
+            vectors = self._view()
+        if vectors is None or news_id >= len(vectors):
+            return []
+        query = np.array(vectors[news_id])
+        if not query.any():
+            return []
+
+        scores = vectors @ query
+        scores[news_id] = -1.0
+        k = min(k, len(scores) - 1)
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(row), float(scores[row])) for row in top if scores[row] >= MIN_SCORE]
+
+    def indexed_ids(self) -> np.ndarray:
+        with self._lock:
+            vectors = self._view()
+        if vectors is None:
+            return np.empty(0, dtype=np.int64)
+        return np.flatnonzero(np.any(vectors, axis=1))
+
+
+index = VectorIndex(INDEX_DIR, DIM)
+
+
+def index_news(news):
+    """Writes the vector of a News row (call after create/update)."""
+    try:
+        index.put(news.id, vectorize(news))
+    except OSError as e:
+        # The index is derived data: never fail the write, the startup backfill repairs it
+        print(f"Could not update related-news index for {news.id}: {e}")
+
+
+def remove_news(news_id: int):
+    try:
+        index.remove(news_id)
+    except OSError as e:
+        print(f"Could not remove news {news_id} from related-news index: {e}")
+
+
+def related(news_id: int, k: int = 10) -> List[Tuple[int, float]]:
+    return index.nearest(news_id, k)
+
+
+def backfill(batch_size: int = 1000) -> int:
+    """Vectorizes the news that have no row yet (new index file, failed writes). Blocking (DB)."""
+    indexed = set(index.indexed_ids().tolist())
+    db = SessionLocal()
+    try:
+        ids = [news_id for (news_id,) in db.query(models.News.id).all() if news_id not in indexed]
+        for start in range(0, len(ids), batch_size):
+            batch = db.query(models.News).filter(models.News.id.in_(ids[start:start + batch_size])).all()
+            for news in batch:
+                index.put(news.id, vectorize(news), flush=False)
+        index.flush()
+        return len(ids)
+    finally:
+        db.close()
@@ -4,7 +4,7 @@ import { useState, useEffect } from 'react';
 import Link from 'next/link';
 import MatrixChart from '@/components/MatrixChart';
 import { useUser } from '@/context/UserContext';
-import { News, User } from '@/types';
+import { CouncilBoardItem, User } from '@/types';
 import API_BASE_URL from '@/config/api';
 
 // Helper interface for processed chart data
@@ -14,7 +14,7 @@ interface ProcessedVoteData {
     avgImpact: number;
     avgRelevance: number;
     category: string;
-    newsItem: News; // Keep reference to original news item
+    newsItem: CouncilBoardItem; // Keep reference to original board item
     hasExecutiveVote: boolean;
 }
 
@@ -47,42 +47,19 @@ export default function MatrixPage() {
     const fetchMatrixData = async () => {
         setLoading(true);
         try {
-            const resNews = await fetch(`${API_BASE_URL}/news/`);
-            if (resNews.ok) {
-                const allNews: News[] = await resNews.json();
-                const councilNews = allNews.filter((n: News) => n.in_council);
-
-                const processed: ProcessedVoteData[] = [];
-
-                for (const n of councilNews) {
-                    const resVotes = await fetch(`${API_BASE_URL}/votes/news/${n.id}`);
-                    if (resVotes.ok) {
-                        const votes = await resVotes.json();
-                        if (votes.length > 0) {
-                            const totalImp = votes.reduce((sum: number, v: any) => sum + v.impact_score, 0);
-                            const totalRel = votes.reduce((sum: number, v: any) => sum + v.relevance_score, 0);
-
-                            const avgImp = totalImp / votes.length;
-                            const avgRel = totalRel / votes.length;
-
-                            let category = "Luego";
-                            if (avgImp >= 3 && avgRel >= 3) category = "Urgente";
-                            else if (avgRel >= 3 && avgImp < 3) category = "Semana";
-                            else if (avgImp >= 3 && avgRel < 3) category = "Estrategico";
-
-                            processed.push({
-                                id: n.id,
-                                title: n.title,
-                                avgImpact: Number(avgImp.toFixed(1)),
-                                avgRelevance: Number(avgRel.toFixed(1)),
-                                category: category,
-                                newsItem: n,
-                                hasExecutiveVote: false // Initialize
-                            });
-                        }
-                    }
-                }
-                setChartData(processed);
+            const res = await fetch(`${API_BASE_URL}/council/board`);
+            if (res.ok) {
+                const board: CouncilBoardItem[] = await res.json();
+                // Means and quadrant come precomputed; items without votes stay off the matrix
+                setChartData(board.filter(item => item.vote_count > 0).map(item => ({
+                    id: item.id,
+                    title: item.title,
+                    avgImpact: Number((item.impact_mean ?? 0).toFixed(1)),
+                    avgRelevance: Number((item.relevance_mean ?? 0).toFixed(1)),
+                    category: item.quadrant || "Luego",
+                    newsItem: item,
+                    hasExecutiveVote: false // Initialize
+                })));
             }
         } catch (error) {
             console.error(error);
@@ -2,7 +2,7 @@
 
 import { useUser } from '@/context/UserContext';
 import { useState, useEffect } from 'react';
-import { News } from '@/types';
+import { News, CouncilBoardItem } from '@/types';
 import VoteCard from '@/components/VoteCard';
 import Link from 'next/link';
 import API_BASE_URL from '@/config/api';
@@ -10,6 +10,8 @@ import API_BASE_URL from '@/config/api';
 export default function CouncilPage() {
     const { currentUser } = useUser();
     const [news, setNews] = useState<News[]>([]);
+    // News on the board, with their active votes (VoteCard needs them to know who already voted)
+    const [board, setBoard] = useState<CouncilBoardItem[]>([]);
     const [loading, setLoading] = useState(true);
 
     const isAdmin = currentUser?.role === 'Admin' || currentUser?.role === 'Administrador';
@@ -20,12 +22,18 @@ export default function CouncilPage() {
 
     const fetchNews = async () => {
         try {
-            const res = await fetch(`${API_BASE_URL}/news/`);
-            if (res.ok) {
-                const data = await res.json();
+            const [newsRes, boardRes] = await Promise.all([
+                fetch(`${API_BASE_URL}/news/summary`),
+                fetch(`${API_BASE_URL}/council/board`)
+            ]);
+            if (newsRes.ok) {
+                const data = await newsRes.json();
                 // Filter news that are either In Council OR (if Admin) allow selecting new ones
                 setNews(data);
             }
+            if (boardRes.ok) {
+                setBoard(await boardRes.json());
+            }
         } catch (error) {
             console.error(error);
         } finally {
@@ -39,8 +47,8 @@ export default function CouncilPage() {
                 method: 'PUT'
             });
             if (res.ok) {
-                // Update local state
-                setNews(prev => prev.map(n => n.id === newsId ? { ...n, in_council: !currentStatus } : n));
+                // Reload both lists: the board comes with its votes
+                fetchNews();
             }
         } catch (error) {
             console.error(error);
@@ -49,8 +57,8 @@ export default function CouncilPage() {
 
     if (loading) return <div className="p-6">Cargando consejo...</div>;
 
-    // Filter news actively in council
-    const activeCouncilNews = news.filter(n => n.in_council);
+    // News actively in council
+    const activeCouncilNews = board;
     // Filter news pending to be added (only for Admin view)
     const pendingNews = news.filter(n => !n.in_council && n.status === 'Identificado');
 
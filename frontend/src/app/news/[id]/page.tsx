@@ -3,7 +3,7 @@
 import { useEffect, useState } from 'react';
 import { useParams, useRouter } from 'next/navigation';
 import { useUser } from '@/context/UserContext';
-import { News } from '@/types';
+import { News, RelatedNews } from '@/types';
 import Link from 'next/link';
 import TagInput from '@/components/TagInput'; // Reusing for display if we want, or simple pills
 import ProductManager from '@/components/ProductManager';
@@ -15,6 +15,7 @@ export default function NewsDetailPage() {
     const router = useRouter();
     const [news, setNews] = useState<News | null>(null);
     const [loading, setLoading] = useState(true);
+    const [related, setRelated] = useState<RelatedNews[]>([]);
 
     useEffect(() => {
         const fetchNews = async () => {
@@ -36,6 +37,18 @@ export default function NewsDetailPage() {
         if (id) fetchNews();
     }, [id, router]);
 
+    useEffect(() => {
+        const fetchRelated = async () => {
+            try {
+                const res = await fetch(`${API_BASE_URL}/news/${id}/related?limit=5`);
+                if (res.ok) setRelated(await res.json());
+            } catch (error) {
+                console.error("Failed to fetch related news", error);
+            }
+        };
+        if (id) fetchRelated();
+    }, [id]);
+
     const handleTogglePriority = async () => {
         if (!news || !currentUser) return;
 
@@ -165,6 +178,22 @@ export default function NewsDetailPage() {
                         </div>
                     </div>
 
+                    {related.length > 0 && (
+                        <div>
+                            <h3 className="text-md font-semibold text-gray-600 mb-2">Noticias Relacionadas</h3>
+                            <ul className="space-y-1">
+                                {related.map(item => (
+                                    <li key={item.id} className="text-sm">
+                                        <Link href={`/news/${item.id}`} className="text-rutan-blue hover:underline">
+                                            {item.title || `Noticia #${item.id}`}
+                                        </Link>
+                                        <span className="ml-2 text-gray-400">{item.status} · {item.detection_date}</span>
+                                    </li>
+                                ))}
+                            </ul>
+                        </div>
+                    )}
+
                     {/* Product Management Section - Visible to everyone, editable for assigned */}
                     {news.id && currentUser && (
                         <ProductManager
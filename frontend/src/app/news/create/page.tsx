@@ -171,12 +171,23 @@ export default function CreateNewsPage() {
                     </div>
                 </div>
             ) : (
-                <AIAnalysisResult
-                    analysis={analysis}
-                    onSave={handleSave}
-                    onCancel={() => setAnalysis(null)}
-                    isSaving={isSaving}
-                />
+                <>
+                    {analysis?.duplicates && analysis.duplicates.length > 0 && (
+                        <div className="mt-8">
+                            <WarningMessage
+                                message={`Esta novedad parece duplicar noticias ya registradas: ${analysis.duplicates
+                                    .map(d => `#${d.news_id} "${d.title}" (${Math.round(d.similarity * 100)}% similar)`)
+                                    .join(", ")}`}
+                            />
+                        </div>
+                    )}
+                    <AIAnalysisResult
+                        analysis={analysis}
+                        onSave={handleSave}
+                        onCancel={() => setAnalysis(null)}
+                        isSaving={isSaving}
+                    />
+                </>
             )}
 
         </div>
@@ -13,6 +13,7 @@ export default function Home() {
   const [searchTerm, setSearchTerm] = useState("");
   const [showArchived, setShowArchived] = useState(false);
   const [currentPage, setCurrentPage] = useState(1);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const itemsPerPage = 10;
 
   // Helper for highlighting search terms
@@ -30,26 +31,33 @@ export default function Home() {
     );
   };
 
-  const fetchNews = async (query = "", archivedOnly = false) => {
+  // Search headlines come from the API with matches wrapped in <mark>; rendered as text, never as HTML
+  const renderHeadline = (headline: string) => (
+    <>
+      {headline.split(/(<mark>.*?<\/mark>)/g).map((part, i) =>
+        part.startsWith('<mark>') ?
+          <span key={i} className="bg-yellow-200 font-bold px-0.5 rounded text-gray-900">{part.slice(6, -7)}</span> :
+          part
+      )}
+    </>
+  );
+
+  const fetchNews = async (query = "", archivedOnly = false, cursor: string | null = null) => {
     setLoadingNews(true);
-    setCurrentPage(1); // Reset on new search
+    if (!cursor) setCurrentPage(1); // Reset on new search
     try {
-      // Always include archived in API call, filter in frontend for cleaner UX
-      let url = `${API_BASE_URL}/news/?include_archived=true`;
+      // The API filters archived/active; listings come newest first and continue with the cursor
+      let url = archivedOnly
+        ? `${API_BASE_URL}/news/summary?include_archived=true&status=${encodeURIComponent('Archivado')}`
+        : `${API_BASE_URL}/news/summary?include_archived=false`;
       if (query) url += `&q=${encodeURIComponent(query)}`;
+      if (cursor) url += `&cursor=${encodeURIComponent(cursor)}`;
       const res = await fetch(url);
       if (res.ok) {
-        let data = await res.json();
-        // Filter based on archivedOnly mode
-        if (archivedOnly) {
-          data = data.filter((n: News) => n.status === 'Archivado');
-        } else {
-          data = data.filter((n: News) => n.status !== 'Archivado');
-        }
-        // Sort by detection date descending
-        setNews(data.sort((a: News, b: News) =>
-          new Date(b.detection_date).getTime() - new Date(a.detection_date).getTime()
-        ));
+        const data = await res.json();
+        // Search results keep the API relevance order
+        setNews(prev => cursor ? [...prev, ...data] : data);
+        setNextCursor(res.headers.get('X-Next-Cursor'));
       }
     } catch (error) {
       console.error("Failed to fetch news", error);
@@ -329,6 +337,11 @@ export default function Home() {
                           <div className="text-sm font-medium text-gray-900 line-clamp-1 max-w-md hover:text-rutan-blue transition-colors cursor-help" title={item.title}>
                             {highlightText(item.title, searchTerm)}
                           </div>
+                          {item.headline && (
+                            <div className="text-xs text-gray-500 line-clamp-2 max-w-md mt-1">
+                              {renderHeadline(item.headline)}
+                            </div>
+                          )}
                           {/* Rich Tooltip - Prioritizing Impact */}
                           <div className="tooltip-content p-4 bg-gray-900 text-white text-xs rounded-lg shadow-2xl border border-gray-700 mb-2 pointer-events-none">
                             <div className="font-bold border-b border-gray-700 pb-1 mb-2 text-rutan-secondary flex items-center">
@@ -511,6 +524,18 @@ export default function Home() {
             </div>
           </div>
         )}
+
+        {nextCursor && (
+          <div className="bg-white px-4 py-3 flex justify-center border-t border-gray-200">
+            <button
+              onClick={() => fetchNews(searchTerm, showArchived, nextCursor)}
+              disabled={loadingNews}
+              className="px-4 py-2 border border-gray-300 text-sm font-medium rounded-md text-gray-700 bg-white hover:bg-gray-50 disabled:opacity-50"
+            >
+              Cargar más noticias
+            </button>
+          </div>
+        )}
       </div>
     </div>
   );
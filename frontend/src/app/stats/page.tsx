@@ -10,6 +10,9 @@ interface UserStat {
     postulations: number;
     prioritized: number;
     assigned: number;
+    olfato_editorial?: number;  // prioritized / postulations (0-1)
+    delivered: number;
+    avg_days_to_product?: number;
 }
 
 export default function AnalyticsPage() {
@@ -67,6 +70,8 @@ export default function AnalyticsPage() {
                             <th className="px-6 py-4 text-center font-semibold text-rutan-secondary">Postuladas</th>
                             <th className="px-6 py-4 text-center font-semibold text-rutan-tertiary">Priorizadas</th>
                             <th className="px-6 py-4 text-center font-semibold text-rutan-blue">Asignadas (En Curso)</th>
+                            <th className="px-6 py-4 text-center font-semibold text-rutan-secondary">Olfato Editorial</th>
+                            <th className="px-6 py-4 text-center font-semibold text-rutan-tertiary">Días a Producto</th>
                         </tr>
                     </thead>
                     <tbody className="divide-y divide-gray-100">
@@ -76,6 +81,12 @@ export default function AnalyticsPage() {
                                 <td className="px-6 py-4 text-center bg-gray-50 font-mono">{user.postulations}</td>
                                 <td className="px-6 py-4 text-center bg-white font-mono text-green-600 font-bold">{user.prioritized}</td>
                                 <td className="px-6 py-4 text-center bg-gray-50 font-mono text-blue-600 font-bold">{user.assigned}</td>
+                                <td className="px-6 py-4 text-center bg-white font-mono">
+                                    {user.olfato_editorial != null ? `${Math.round(user.olfato_editorial * 100)}%` : "—"}
+                                </td>
+                                <td className="px-6 py-4 text-center bg-gray-50 font-mono" title={`${user.delivered} noticias con producto`}>
+                                    {user.avg_days_to_product != null ? user.avg_days_to_product : "—"}
+                                </td>
                             </tr>
                         ))}
                     </tbody>
@@ -86,7 +97,7 @@ export default function AnalyticsPage() {
                 <svg className="w-5 h-5 mr-3 mt-0.5" fill="none" stroke="currentColor" viewBox="0 0 24 24"><path strokeLinecap="round" strokeLinejoin="round" strokeWidth="2" d="M13 16h-1v-4h-1m1-4h.01M21 12a9 9 0 11-18 0 9 9 0 0118 0z"></path></svg>
                 <div>
                     <p className="font-bold mb-1">Nota sobre efectividad:</p>
-                    <p>La columna "Priorizadas" refleja cuántas de las noticias postuladas por el usuario llegaron a ganar el consenso del consejo (Cuadrante Urgente/Estratégico).</p>
+                    <p>La columna "Priorizadas" refleja cuántas de las noticias postuladas por el usuario llegaron a ganar el consenso del consejo (Cuadrante Urgente/Estratégico). "Olfato Editorial" es la proporción de sus postuladas que fueron priorizadas y "Días a Producto" el promedio de días entre la detección de una noticia asignada y su primer producto.</p>
                 </div>
             </div>
         </div>
@@ -1,13 +1,13 @@
 "use client";
 
 import { useState } from 'react';
-import { News } from '@/types';
+import { CouncilBoardItem } from '@/types';
 import { useUser } from '@/context/UserContext';
 import TagInput from './TagInput'; // Wait, tag input is for arrays, we need a single select for category or free text
 import API_BASE_URL from '@/config/api';
 
 interface VoteCardProps {
-    newsItem: News;
+    newsItem: CouncilBoardItem; // from /council/board: its votes are the active ones
     onVote: () => void; // Callback to refresh or remove from view
 }
 
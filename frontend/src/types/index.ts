@@ -22,6 +22,43 @@ export interface News {
     assignees?: User[];
     votes?: any[];
     category?: string;
+    duplicates?: DuplicateMatch[];  // Only in /news/analyze and POST /news/ responses
+    headline?: string;  // Search matches (with <mark>), only in GET /news/?q=...
+}
+
+export interface RelatedNews {
+    id: number;
+    title?: string;
+    status: string;
+    detection_date: string;
+    similarity: number;
+}
+
+export interface CouncilBoardItem {
+    id: number;
+    title: string;
+    status: string;
+    category?: string;
+    classifications?: any;
+    in_council: boolean;
+    is_prioritized: boolean;
+    editorial_focus?: string;
+    assignees: User[];
+    votes: any[];  // Active votes only
+    vote_count: number;
+    impact_mean?: number;  // Means and stddevs are null until the first vote
+    relevance_mean?: number;
+    impact_stddev?: number;
+    relevance_stddev?: number;
+    quadrant?: 'Urgente' | 'Semana' | 'Estrategico' | 'Luego';
+    category_counts: Record<string, number>;
+}
+
+export interface DuplicateMatch {
+    news_id: number;
+    title?: string;
+    status?: string;
+    similarity: number;
 }
 
 export interface User {